@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+.side 回放引擎基准: selenium (chromedriver) 对比 playwright (共享浏览器 + 每次运行独立 context)
+
+在本地 HTTP 服务上回放 benchmarks/fixtures 下的 .side 脚本 (fast 档位，无头)，
+每个引擎对每个脚本运行 N 次，统计首次运行 (含浏览器启动) 与后续运行的耗时，以及浏览器进程树的内存。
+需要 Chrome，在容器内运行:
+
+    docker exec -it <container> python3 /app/benchmarks/side_engines.py --runs 10
+    docker exec -it <container> python3 /app/benchmarks/side_engines.py --engines selenium --selenium-pool
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.append(ROOT)
+# 基准使用独立的定位器缓存，不影响正式任务
+os.environ['LOCATOR_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='side-bench-'), 'locator_cache.json')
+
+from scripts.speed_profiles import get_profile
+from scripts.proc_stats import process_tree, read_rss
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures(port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), functools.partial(QuietHandler, directory=FIXTURES))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prepare_fixtures(port):
+    """把 .side 的项目 url 改为实际端口，写到临时目录；返回 {脚本名: 路径}"""
+    target = tempfile.mkdtemp(prefix='side-bench-fixtures-')
+    paths = {}
+    for name in sorted(os.listdir(FIXTURES)):
+        if not name.endswith('.side'):
+            continue
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            project = json.load(f)
+        project['url'] = f'http://127.0.0.1:{port}'
+        paths[name] = os.path.join(target, name)
+        with open(paths[name], 'w', encoding='utf-8') as f:
+            json.dump(project, f)
+    return paths
+
+
+def tree_rss_mb():
+    """本进程之外的子进程树 (chromedriver / Playwright driver / Chrome) 的 RSS 合计"""
+    total = 0
+    for pid in process_tree(os.getpid())[1:]:
+        try:
+            total += read_rss(pid)
+        except OSError:
+            pass
+    return total / 1024 / 1024
+
+
+def selenium_runner(use_pool):
+    from scripts.task_executor import SeleniumIDEExecutor, get_driver_pool, shutdown_driver_pool
+    if use_pool:
+        os.environ['CHROME_POOL_SIZE'] = '1'
+    pool = get_driver_pool(headless=True) if use_pool else None
+
+    def run(path):
+        executor = SeleniumIDEExecutor(path, driver_pool=pool, profile=get_profile('fast'), headless=True, timeout=120)
+        return executor.execute()
+    return run, shutdown_driver_pool
+
+
+def playwright_runner():
+    from scripts.playwright_side import PlaywrightSideExecutor, BrowserHost
+    host = BrowserHost()
+
+    def run(path):
+        executor = PlaywrightSideExecutor(path, profile=get_profile('fast'), headless=True, timeout=120, host=host)
+        return executor.execute()
+    return run, host.shutdown
+
+
+def bench(engine, run, fixtures, runs):
+    rows = []
+    for name, path in fixtures.items():
+        durations, failures, peak_rss = [], [], 0
+        for _ in range(runs):
+            started = time.monotonic()
+            success, message = run(path)
+            durations.append(time.monotonic() - started)
+            peak_rss = max(peak_rss, tree_rss_mb())
+            if not success:
+                failures.append(message)
+        warm = durations[1:] or durations
+        rows.append({
+            'engine': engine,
+            'fixture': name,
+            'first': durations[0],
+            'median': statistics.median(warm),
+            'p95': sorted(warm)[max(int(len(warm) * 0.95) - 1, 0)],
+            'rss': peak_rss,
+            'failures': failures
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark .side playback engines')
+    parser.add_argument('--runs', type=int, default=5, help='每个引擎、每个脚本的运行次数')
+    parser.add_argument('--engines', default='selenium,playwright')
+    parser.add_argument('--selenium-pool', action='store_true', help='selenium 使用 1 个预热会话 (CHROME_POOL_SIZE=1)')
+    parser.add_argument('--port', type=int, default=8765, help='本地 HTTP 服务端口 (.side 的 url 随之改写)')
+    args = parser.parse_args()
+
+    fixtures = prepare_fixtures(args.port)
+    server = serve_fixtures(args.port)
+    rows = []
+    try:
+        for engine in [e.strip() for e in args.engines.split(',') if e.strip()]:
+            if engine == 'selenium':
+                run, shutdown = selenium_runner(args.selenium_pool)
+            elif engine == 'playwright':
+                run, shutdown = playwright_runner()
+            else:
+                parser.error(f'Unknown engine: {engine}')
+            try:
+                rows.extend(bench(engine, run, fixtures, args.runs))
+            finally:
+                shutdown()
+    finally:
+        server.shutdown()
+
+    print(f"\n{'engine':<12}{'fixture':<16}{'first (s)':>10}{'median (s)':>12}{'p95 (s)':>10}{'RSS (MB)':>10}  failures")
+    for row in rows:
+        print(f"{row['engine']:<12}{row['fixture']:<16}{row['first']:>10.2f}{row['median']:>12.2f}{row['p95']:>10.2f}"
+              f"{row['rss']:>10.0f}  {len(row['failures'])}/{args.runs}")
+        for message in dict.fromkeys(row['failures']):
+            print(f"    ❌ {message}")
+    sys.exit(1 if any(row['failures'] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
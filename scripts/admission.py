@@ -0,0 +1,130 @@
+"""
+内存压力准入控制
+
+在 1GB 内存 + swap 的 PaaS 上，多个浏览器任务同时启动会把机器推入 swap 抖动。
+出队前检查 /proc/meminfo 的 MemAvailable 与 PSI (/proc/pressure/memory)：
+内存不足时推迟指定类别 (默认 browser) 的任务，其他任务照常出队，内存恢复后自动放行。
+刚放行的浏览器任务在 Chrome 真正占用内存之前先按预估值预留，避免同一时刻的多个触发一起通过。
+"""
+
+import os
+import time
+import logging
+import threading
+
+from scripts.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_DEFERRALS = REGISTRY.counter('automation_admission_deferrals', 'Runs deferred by memory admission control',
+                                       ['resource_class'])
+
+
+def read_mem_available_mb():
+    """读取失败时返回 None (不做内存准入判断)"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def read_memory_psi():
+    """返回 some avg10 (%)；内核未启用 PSI 时返回 None"""
+    try:
+        with open('/proc/pressure/memory', 'r') as f:
+            for line in f:
+                if line.startswith('some '):
+                    fields = dict(item.split('=') for item in line.split()[1:])
+                    return float(fields['avg10'])
+    except (OSError, KeyError, ValueError):
+        return None
+    return None
+
+
+class MemoryAdmission:
+    def __init__(self, min_available_mb=300, max_psi=20.0, classes=('browser',), max_defer=600,
+                 reserve_mb=250, reserve_seconds=20):
+        self.min_available_mb = min_available_mb
+        self.max_psi = max_psi
+        self.classes = set(classes)
+        self.max_defer = max_defer              # 最长推迟秒数，超过后强制放行，避免饿死
+        self.reserve_mb = reserve_mb            # 刚放行任务的预估内存
+        self.reserve_seconds = reserve_seconds  # 预留持续时间 (Chrome 启动完成前)
+        self._reservations = []                 # 预留到期时间
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0
+
+    def pressure(self):
+        """当前 (可用内存 MB, PSI avg10)，缓存 1 秒"""
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached_at >= 1.0:
+                self._cached = (read_mem_available_mb(), read_memory_psi())
+                self._cached_at = now
+            return self._cached
+
+    def _reserved_mb(self, now):
+        self._reservations = [expires for expires in self._reservations if expires > now]
+        return len(self._reservations) * self.reserve_mb
+
+    def check(self, item):
+        """返回 None 表示放行，否则返回推迟原因"""
+        if item.resource_class not in self.classes:
+            return None
+        available, psi = self.pressure()
+        now = time.monotonic()
+        with self._lock:
+            reason = None
+            if available is not None:
+                effective = available - self._reserved_mb(now)
+                if effective < self.min_available_mb:
+                    reason = f"MemAvailable {effective:.0f}MB < {self.min_available_mb}MB"
+            if reason is None and psi is not None and self.max_psi and psi > self.max_psi:
+                reason = f"memory PSI avg10 {psi:.1f}% > {self.max_psi}%"
+            if reason is not None and item.deferred_since is not None and \
+                    time.time() - item.deferred_since >= self.max_defer:
+                logger.warning(f"⚠️ Task {item.task_id} deferred for {self.max_defer}s, admitting despite {reason}")
+                reason = None
+            if reason is None:
+                self._reservations.append(now + self.reserve_seconds)
+            return reason
+
+    def defer(self, item, reason):
+        """记录推迟 (只在首次推迟时打日志)"""
+        if item.deferred_since is None:
+            item.deferred_since = time.time()
+            ADMISSION_DEFERRALS.inc(resource_class=item.resource_class)
+            logger.info(f"⏸️ Deferring task {item.task_id} ({item.resource_class}): {reason}")
+        item.defer_reason = reason
+
+    def stats(self):
+        available, psi = self.pressure()
+        with self._lock:
+            reserved = self._reserved_mb(time.monotonic())
+        return {
+            'mem_available_mb': round(available) if available is not None else None,
+            'psi_some_avg10': psi,
+            'reserved_mb': reserved,
+            'min_available_mb': self.min_available_mb,
+            'max_psi': self.max_psi,
+            'classes': sorted(self.classes)
+        }
+
+
+def admission_from_env():
+    """ADMISSION_MIN_AVAILABLE_MB=0 时关闭准入控制"""
+    min_available = int(os.environ.get('ADMISSION_MIN_AVAILABLE_MB', '300'))
+    if min_available <= 0:
+        return None
+    return MemoryAdmission(
+        min_available_mb=min_available,
+        max_psi=float(os.environ.get('ADMISSION_MAX_PSI', '20')),
+        classes=[c.strip() for c in os.environ.get('ADMISSION_CLASSES', 'browser').split(',') if c.strip()],
+        max_defer=int(os.environ.get('ADMISSION_MAX_DEFER', '600')),
+        reserve_mb=int(os.environ.get('ADMISSION_RESERVE_MB', '250'))
+    )
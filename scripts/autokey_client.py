@@ -0,0 +1,127 @@
+"""
+AutoKey D-Bus 客户端
+
+保持一个长连接直接调用 AutoKey 服务 (org.autokey.Service /AppService)，
+替代每次启动一个 autokey-run 解释器：存活检查 (NameHasOwner)、触发脚本都在毫秒级完成。
+脚本名解析结果 (完整文件名 / 去后缀) 会被缓存。
+dbus-python 不可用时 available() 返回 False，调用方退回 autokey-run CLI。
+"""
+
+import time
+import logging
+import threading
+from pathlib import Path
+
+try:
+    import dbus
+except ImportError:  # 非镜像环境
+    dbus = None
+
+logger = logging.getLogger(__name__)
+
+AUTOKEY_SERVICE = 'org.autokey.Service'
+AUTOKEY_PATH = '/AppService'
+CALL_TIMEOUT = 10
+
+
+class AutoKeyUnavailable(Exception):
+    """AutoKey 服务不在总线上"""
+
+
+class AutoKeyClient:
+    def __init__(self, env_provider):
+        self.env_provider = env_provider     # 返回包含 DBUS_SESSION_BUS_ADDRESS 的环境变量
+        self._bus = None
+        self._address = None
+        self._lock = threading.RLock()
+        self._resolved = {}                  # 脚本文件名 -> AutoKey 中实际注册的名称
+
+    def available(self):
+        if dbus is None:
+            return False
+        try:
+            self._connection()
+            return True
+        except Exception as e:
+            logger.debug(f"AutoKey D-Bus unavailable: {e}")
+            return False
+
+    def _connection(self):
+        address = self.env_provider().get('DBUS_SESSION_BUS_ADDRESS')
+        if not address:
+            raise AutoKeyUnavailable('DBUS_SESSION_BUS_ADDRESS not set')
+        with self._lock:
+            # VNC 桌面重启后会话总线地址会变化，需重连
+            if self._bus is None or address != self._address:
+                self.close()
+                self._bus = dbus.bus.BusConnection(address)
+                self._address = address
+            return self._bus
+
+    def close(self):
+        with self._lock:
+            if self._bus is not None:
+                try:
+                    self._bus.close()
+                except Exception:
+                    pass
+            self._bus = None
+
+    def alive(self):
+        """AutoKey 服务是否已在会话总线上注册"""
+        try:
+            with self._lock:
+                return bool(self._connection().name_has_owner(AUTOKEY_SERVICE))
+        except Exception:
+            self.close()
+            return False
+
+    def wait_ready(self, timeout=10, process=None):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.alive():
+                return True
+            if process is not None and process.poll() is not None:
+                return False
+            time.sleep(0.1)
+        return False
+
+    def _run_script(self, name):
+        with self._lock:
+            service = self._connection().get_object(AUTOKEY_SERVICE, AUTOKEY_PATH, introspect=False)
+            service.run_script(name, dbus_interface=AUTOKEY_SERVICE, timeout=CALL_TIMEOUT)
+
+    def run(self, script_name):
+        """
+        触发脚本；依次尝试缓存的名称、完整文件名、去后缀名。
+        返回 (实际使用的名称, None) 或 (None, 错误信息)
+        """
+        if not self.alive():
+            raise AutoKeyUnavailable('AutoKey service is not on the session bus')
+
+        candidates = [self._resolved.get(script_name), script_name]
+        if script_name.endswith('.py'):
+            candidates.append(Path(script_name).stem)
+        errors = []
+        for name in dict.fromkeys(c for c in candidates if c):
+            try:
+                self._run_script(name)
+                self._resolved[script_name] = name
+                return name, None
+            except dbus.exceptions.DBusException as e:
+                errors.append(f"{name}: {e.get_dbus_message() or e.get_dbus_name()}")
+                if not self.alive():
+                    raise AutoKeyUnavailable('AutoKey service went away')
+        self._resolved.pop(script_name, None)
+        return None, '; '.join(errors)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_autokey_client(env_provider):
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AutoKeyClient(env_provider)
+        return _client
@@ -0,0 +1,276 @@
+"""
+AutoKey 运行输出分流
+
+AutoKey 把所有脚本的 print 输出写到同一个 stdout (启动方式不同，去向也不同)。为了把输出准确归属到某次运行：
+1. 每次运行写一个请求文件，然后触发 AutoKey 中的包装脚本 _automation_runner；
+2. 包装脚本领取请求，把当前线程的 stdout / stderr 切到该运行自己的输出文件 <令牌>.log，
+   在 engine.run_script(目标) 前后写入 BEGIN / END 标记；
+3. 后台 follower 线程跟随每个登记中的输出文件，实时转发给对应运行，看到 END 即结束。
+输出按执行线程分流，并发运行互不混入；目标脚本自行创建的子线程的输出仍写到 AutoKey 的 stdout，不会被收集。
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DIR = '/tmp/automation-autokey'
+RUNNER_NAME = '_automation_runner'
+RUNNER_FOLDER = 'Automation'
+
+_MARKER = re.compile(r'^<<<AUTOMATION-RUN ([0-9a-f]{32}) (BEGIN|END)(?: (\w+))?>>>$')
+
+# 在 AutoKey 进程内执行 (engine 由 AutoKey 注入)
+RUNNER_SOURCE = '''# 由 automation-aio 自动生成，请勿修改
+import os, sys, json, threading, traceback
+
+REQUEST_DIR = %r
+
+
+class _ThreadRoutedStream:
+    """按线程分流的 stdout / stderr：登记过的线程写入各自运行的输出文件，其余线程写原来的流"""
+
+    def __init__(self, stream, targets):
+        self._automation_stream = stream
+        self._automation_targets = targets
+
+    def write(self, data):
+        target = self._automation_targets.get(threading.get_ident())
+        return (target or self._automation_stream).write(data)
+
+    def flush(self):
+        target = self._automation_targets.get(threading.get_ident())
+        (target or self._automation_stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self._automation_stream, name)
+
+
+# 每次触发都会重新执行本脚本，分流器只安装一次
+targets = getattr(sys.stdout, '_automation_targets', None)
+if targets is None:
+    targets = {}
+    sys.stdout = _ThreadRoutedStream(sys.stdout, targets)
+    sys.stderr = _ThreadRoutedStream(sys.stderr, targets)
+
+claimed = None
+for name in sorted(os.listdir(REQUEST_DIR)):
+    if name.endswith('.json'):
+        path = os.path.join(REQUEST_DIR, name)
+        try:
+            os.rename(path, path + '.claimed')
+            claimed = path + '.claimed'
+            break
+        except OSError:
+            continue
+
+if claimed:
+    with open(claimed) as f:
+        request = json.load(f)
+    os.remove(claimed)
+    token = request['token']
+    output = open(os.path.join(REQUEST_DIR, token + '.log'), 'a', buffering=1, encoding='utf-8')
+    targets[threading.get_ident()] = output
+    try:
+        output.write('<<<AUTOMATION-RUN %%s BEGIN>>>\\n' %% token)
+        status = 'missing'
+        for candidate in request['candidates']:
+            try:
+                engine.run_script(candidate)
+                status = 'ok'
+                break
+            except Exception as e:
+                if str(e).startswith('No script with'):
+                    continue
+                traceback.print_exc(file=output)
+                status = 'error'
+                break
+        if status == 'missing':
+            output.write('Script not found in AutoKey: %%s\\n' %% ', '.join(request['candidates']))
+        output.write('<<<AUTOMATION-RUN %%s END %%s>>>\\n' %% (token, status))
+    finally:
+        targets.pop(threading.get_ident(), None)
+        output.close()
+''' % REQUEST_DIR
+
+
+def ensure_request_dir():
+    """
+    创建请求目录 (仅当前用户可读写)；已存在但属于其他用户时尝试修正，
+    无法修正则抛出 PermissionError，而不是让每次运行都在写请求文件时失败
+    """
+    os.makedirs(REQUEST_DIR, mode=0o700, exist_ok=True)
+    st = os.stat(REQUEST_DIR)
+    if st.st_uid == os.geteuid():
+        return
+    try:
+        os.chown(REQUEST_DIR, os.geteuid(), os.getegid())
+        os.chmod(REQUEST_DIR, 0o700)
+    except OSError as e:
+        raise PermissionError(f"{REQUEST_DIR} is owned by uid {st.st_uid}, not {os.geteuid()}; "
+                              f"remove it and restart: {e}")
+
+
+def install_runner(data_dir):
+    """写入包装脚本 (内容变化时返回 True，调用方需重载 AutoKey)"""
+    folder = os.path.join(data_dir, RUNNER_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    script_path = os.path.join(folder, f'{RUNNER_NAME}.py')
+    try:
+        with open(script_path, 'r', encoding='utf-8') as f:
+            if f.read() == RUNNER_SOURCE:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write(RUNNER_SOURCE)
+    metadata = {
+        "type": "script", "description": RUNNER_NAME, "store": {}, "modes": [3], "usageCount": 0,
+        "prompt": False, "omitTrigger": False, "showInTrayMenu": False, "filter": None,
+        "hotkey": {"hotKey": None, "modifiers": []}
+    }
+    with open(os.path.join(folder, f'{RUNNER_NAME}.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
+    logger.info(f"📝 Installed AutoKey runner script in {folder}")
+    return True
+
+
+class AutoKeyRun:
+    """一次 AutoKey 运行的输出订阅"""
+
+    def __init__(self, token, buffer):
+        self.token = token
+        self.buffer = buffer
+        self.output_path = os.path.join(REQUEST_DIR, f'{token}.log')
+        self.request_path = None
+        self.begun = threading.Event()
+        self.finished = threading.Event()
+        self.status = None
+        self._file = None
+        self._partial = b''
+        self._io_lock = threading.Lock()
+
+    def wait(self, start_timeout, timeout):
+        """等待 END 标记；返回状态 ok / error / missing，超时返回 None"""
+        if not self.begun.wait(start_timeout):
+            return None
+        self.finished.wait(timeout)
+        return self.status
+
+    def _dispatch(self, line):
+        match = _MARKER.match(line)
+        if match and match.group(1) == self.token:
+            if match.group(2) == 'BEGIN':
+                self.begun.set()
+            else:
+                self.status = match.group(3)
+                self.finished.set()
+            return
+        self.buffer.write(line)
+
+    def poll(self):
+        """读取输出文件中新增的完整行；返回是否读到数据"""
+        with self._io_lock:
+            return self._read_lines()
+
+    def _read_lines(self):
+        if self.finished.is_set():
+            return False
+        if self._file is None:
+            try:
+                self._file = open(self.output_path, 'rb')
+            except FileNotFoundError:
+                return False
+        data = self._file.read()
+        if not data:
+            return False
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._dispatch(line.decode('utf-8', 'replace'))
+        return True
+
+    def close(self):
+        with self._io_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        for path in (self.output_path, self.request_path):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class AutoKeyOutputFollower:
+    """跟随所有登记中运行的输出文件 (一个后台线程)"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._follow, name='autokey-output-follower', daemon=True)
+                self._thread.start()
+
+    def submit(self, candidates, buffer):
+        """登记订阅并写入请求文件；之后由调用方触发 RUNNER_NAME"""
+        ensure_request_dir()
+        self.start()
+        run = AutoKeyRun(uuid.uuid4().hex, buffer)
+        with self._lock:
+            self._runs[run.token] = run
+        # 文件名以时间戳开头，包装脚本按先进先出领取
+        request_path = os.path.join(REQUEST_DIR, f"{time.time_ns()}-{run.token}.json")
+        with open(request_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'token': run.token, 'candidates': candidates}, f)
+        os.replace(request_path + '.tmp', request_path)
+        run.request_path = request_path
+        self._wakeup.set()
+        return run
+
+    def cancel(self, run):
+        with self._lock:
+            self._runs.pop(run.token, None)
+        run.close()
+
+    def _follow(self):
+        while True:
+            with self._lock:
+                runs = list(self._runs.values())
+            if not runs:
+                self._wakeup.wait(1)
+                self._wakeup.clear()
+                continue
+            for run in runs:
+                try:
+                    run.poll()
+                except Exception as e:
+                    logger.error(f"AutoKey output follower error ({run.token}): {e}")
+                if run.finished.is_set():
+                    with self._lock:
+                        self._runs.pop(run.token, None)
+                    run.close()
+            time.sleep(self.interval)
+
+
+_follower = None
+_follower_lock = threading.Lock()
+
+def get_autokey_tailer():
+    global _follower
+    with _follower_lock:
+        if _follower is None:
+            _follower = AutoKeyOutputFollower()
+        return _follower
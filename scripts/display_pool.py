@@ -0,0 +1,188 @@
+"""
+Xvfb 虚拟显示器池
+
+GUI 任务各自租用一个独立的 Xvfb 显示器 (独立 DISPLAY + XAUTHORITY)，
+并发运行时不会争抢 VNC 桌面 :1 的焦点与鼠标。
+显示器按需启动，空闲超过 idle_timeout 后自动关闭。
+"""
+
+import os
+import time
+import shutil
+import secrets
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_POOL_DIR = '/tmp/automation-displays'
+STARTUP_TIMEOUT = 10
+
+
+class VirtualDisplay:
+    def __init__(self, number, geometry):
+        self.number = number
+        self.geometry = geometry
+        self.display = f':{number}'
+        self.xauthority = os.path.join(DISPLAY_POOL_DIR, f'Xauthority.{number}')
+        self.process = None
+        self.in_use = False
+        self.last_released = time.monotonic()
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def env(self):
+        return {'DISPLAY': self.display, 'XAUTHORITY': self.xauthority}
+
+    def start(self):
+        os.makedirs(DISPLAY_POOL_DIR, mode=0o700, exist_ok=True)
+        # 每个显示器独立的 MIT-MAGIC-COOKIE
+        open(self.xauthority, 'wb').close()
+        subprocess.run(['xauth', '-f', self.xauthority, 'add', self.display, '.', secrets.token_hex(16)],
+                       check=True, capture_output=True, timeout=10)
+        # 清理上次异常退出留下的锁文件
+        for stale in (f'/tmp/.X{self.number}-lock', f'/tmp/.X11-unix/X{self.number}'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+        self.process = subprocess.Popen(
+            ['Xvfb', self.display, '-screen', '0', f'{self.geometry}x24', '-auth', self.xauthority,
+             '-nolisten', 'tcp', '-noreset'],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        socket_path = f'/tmp/.X11-unix/X{self.number}'
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'Xvfb {self.display} exited with code {self.process.returncode}')
+            if os.path.exists(socket_path):
+                logger.info(f"🖥️ Xvfb {self.display} started ({self.geometry})")
+                return
+            time.sleep(0.05)
+        self.stop()
+        raise RuntimeError(f'Xvfb {self.display} did not start within {STARTUP_TIMEOUT}s')
+
+    def stop(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+            self.process = None
+            logger.info(f"💤 Xvfb {self.display} stopped")
+
+
+class DisplayPool:
+    def __init__(self, size, base=100, geometry='1920x1080', idle_timeout=300):
+        self.displays = [VirtualDisplay(base + i, geometry) for i in range(size)]
+        self.idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._reap_idle, name='display-pool-reaper', daemon=True).start()
+
+    @staticmethod
+    def available():
+        return shutil.which('Xvfb') is not None and shutil.which('xauth') is not None
+
+    def lease(self, timeout=None):
+        """租用一个显示器 (必要时启动 Xvfb)；超时返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                # 优先复用已在运行的显示器，避免冷启动
+                free = [d for d in self.displays if not d.in_use]
+                if free:
+                    display = next((d for d in free if d.running), free[0])
+                    display.in_use = True
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(timeout=remaining)
+
+        try:
+            if not display.running:
+                display.start()
+            return display
+        except Exception:
+            self.release(display)
+            raise
+
+    def release(self, display):
+        with self._cond:
+            display.in_use = False
+            display.last_released = time.monotonic()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': len(self.displays),
+                'running': sum(1 for d in self.displays if d.running),
+                'in_use': sum(1 for d in self.displays if d.in_use)
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for display in self.displays:
+            display.stop()
+
+    def _reap_idle(self):
+        while not self._closed:
+            time.sleep(min(30, max(self.idle_timeout / 2, 1)))
+            now = time.monotonic()
+            with self._cond:
+                idle = [d for d in self.displays
+                        if not d.in_use and d.running and now - d.last_released > self.idle_timeout]
+                # 关闭期间占用，防止被同时租出
+                for display in idle:
+                    display.in_use = True
+            for display in idle:
+                display.stop()
+                self.release(display)
+
+
+_pool = None
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+def get_display_pool():
+    """DISPLAY_POOL_SIZE=0 (默认) 或缺少 Xvfb 时返回 None，任务继续使用 VNC 桌面 :1"""
+    global _pool, _pool_unavailable
+    size = int(os.environ.get('DISPLAY_POOL_SIZE', '0') or 0)
+    if size <= 0 or _pool_unavailable:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if not DisplayPool.available():
+                logger.warning("DISPLAY_POOL_SIZE is set but Xvfb/xauth is not installed, using shared display :1")
+                _pool_unavailable = True
+                return None
+            _pool = DisplayPool(
+                size,
+                base=int(os.environ.get('DISPLAY_POOL_BASE', '100')),
+                geometry=os.environ.get('DISPLAY_POOL_GEOMETRY', '1920x1080'),
+                idle_timeout=int(os.environ.get('DISPLAY_POOL_IDLE', '300'))
+            )
+            logger.info(f"🖥️ Display pool enabled (size={size})")
+        return _pool
+
+def shutdown_display_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.shutdown()
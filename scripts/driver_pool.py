@@ -0,0 +1,226 @@
+"""
+Chrome WebDriver 预热池
+
+预先启动少量 Chrome 会话，任务运行时租借 (lease)、结束后归还 (release)。
+每次租借在独立的 CDP 浏览器上下文 (Target.createBrowserContext) 中运行，归还时整体销毁，
+本次访问过的所有源 (含跳转、已关闭的标签页、iframe) 的 Cookie / Storage / IndexedDB / Service Worker 都不会留给下一个任务；
+无法创建独立上下文时该会话用完即回收重建。另按使用次数与存活时间回收。
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """池中的一个 Chrome 会话"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.home_handle = None     # 默认上下文中的空白标签页 (不用于运行)
+        self.context_id = None      # 本次租借的浏览器上下文
+        self.isolated = False
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created_at
+
+
+class ChromeDriverPool:
+    def __init__(self, factory, size=1, max_uses=20, max_age=1800, lease_timeout=120, page_setup=None):
+        self.factory = factory
+        self.page_setup = page_setup     # 新标签页的初始化 (如反检测脚本)，factory 只作用于首个标签页
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self.max_age = max(60, int(max_age))
+        self.lease_timeout = lease_timeout
+
+        self._idle = []
+        self._total = 0          # 已创建 + 正在创建的会话数
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # --- 生命周期 ---
+    def start(self):
+        """后台预热，不阻塞调用方"""
+        threading.Thread(target=self._fill, name='chrome-pool-warmup', daemon=True).start()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'total': self._total, 'idle': len(self._idle)}
+
+    # --- 租借 / 归还 ---
+    def lease(self, timeout=None):
+        deadline = time.monotonic() + (timeout or self.lease_timeout)
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError('Driver pool is shut down')
+                pooled = self._idle.pop() if self._idle else None
+                create = pooled is None and self._total < self.size
+                if create:
+                    self._total += 1
+                elif pooled is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError('Timed out waiting for a pooled Chrome session')
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                pooled = self._create()
+                if pooled is None:
+                    raise RuntimeError('Chrome Init Failed')
+            elif not self._healthy(pooled):
+                logger.warning("♻️ Pooled Chrome session failed health check, replacing")
+                self._discard(pooled)
+                continue
+
+            pooled.uses += 1
+            pooled.isolated = self._open_context(pooled)
+            return pooled
+
+    def release(self, pooled, broken=False):
+        recycle = broken or pooled.uses >= self.max_uses or pooled.age >= self.max_age
+        if not recycle and not self._reset(pooled):
+            recycle = True
+
+        if recycle:
+            logger.info(f"♻️ Recycling Chrome session (uses={pooled.uses}, age={int(pooled.age)}s, broken={broken})")
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(pooled)
+                self._cond.notify()
+        if closed:
+            self._quit(pooled)
+
+    @contextmanager
+    def session(self, timeout=None):
+        pooled = self.lease(timeout)
+        broken = False
+        try:
+            yield pooled.driver
+        except Exception:
+            broken = not self._healthy(pooled)
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    # --- 内部实现 ---
+    def _create(self):
+        try:
+            return PooledDriver(self.factory())
+        except Exception as e:
+            logger.error(f"Chrome pool: failed to launch session: {e}")
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            return None
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            pooled = self._create()
+            if pooled is None:
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+            logger.info(f"🔥 Chrome pool warmed ({self._total}/{self.size})")
+
+    def _discard(self, pooled):
+        self._quit(pooled)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        # 异步补位，保证下一次租借仍是热会话
+        self.start()
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def _healthy(self, pooled):
+        if pooled.age >= self.max_age:
+            return False
+        try:
+            return bool(pooled.driver.window_handles)
+        except Exception:
+            return False
+
+    def _open_context(self, pooled):
+        """为本次租借创建独立的浏览器上下文并切换过去；失败返回 False (归还时回收会话)"""
+        driver = pooled.driver
+        try:
+            pooled.home_handle = driver.current_window_handle
+            size = driver.get_window_size()
+            pooled.context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            target_id = driver.execute_cdp_cmd('Target.createTarget', {
+                'url': 'about:blank', 'browserContextId': pooled.context_id
+            })['targetId']
+            # chromedriver 的窗口句柄即 DevTools target id
+            driver.switch_to.window(target_id)
+            driver.set_window_size(size['width'], size['height'])
+            if self.page_setup is not None:
+                self.page_setup(driver)
+            return True
+        except Exception as e:
+            logger.warning(f"Chrome pool: isolated browser context unavailable, session will be recycled after use: {e}")
+            try:
+                if pooled.home_handle:
+                    driver.switch_to.window(pooled.home_handle)
+            except Exception:
+                pass
+            return False
+
+    def _reset(self, pooled):
+        """销毁本次租借的浏览器上下文 (其中所有标签页与站点数据一并删除)，清理默认上下文；失败返回 False"""
+        driver = pooled.driver
+        if not pooled.isolated or pooled.context_id is None:
+            # 不知道本次运行在默认上下文里访问过哪些源，无法保证清理干净
+            return False
+        try:
+            driver.switch_to.window(pooled.home_handle)
+            driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': pooled.context_id})
+            pooled.context_id, pooled.isolated = None, False
+            # 默认上下文中不应有其他标签页，有则关闭
+            for handle in driver.window_handles:
+                if handle != pooled.home_handle:
+                    try:
+                        driver.switch_to.window(handle)
+                        driver.close()
+                    except Exception:
+                        pass
+            driver.switch_to.window(pooled.home_handle)
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            driver.get('about:blank')
+            driver.implicitly_wait(0)
+            return True
+        except Exception as e:
+            logger.warning(f"Chrome pool: state reset failed: {e}")
+            return False
@@ -56,6 +56,9 @@ mkdir -p "/home/headless/.config/autokey/data/Sample Scripts"
 mkdir -p "/home/headless/.config/autokey/data/MyScripts"
 chown -R headless:headless /home/headless/.config
 
+# 上次运行遗留的 AutoKey 请求 / 输出文件 (目录由调度进程以 headless 用户重新创建)
+rm -rf /tmp/automation-autokey
+
 # 4. DB Init (系统 Python)
 echo "Init DB..."
 cd /app/web-app
@@ -0,0 +1,78 @@
+"""
+定位器学习缓存
+
+记录每个 脚本 + 命令 最近一次成功的定位器 (target 或 targets 中的备选)，
+下次运行优先尝试，避免失效的主定位器每次都耗满等待时间。
+"""
+
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+LOCATOR_CACHE_PATH = os.environ.get('LOCATOR_CACHE_PATH', '/app/data/locator_cache.json')
+
+
+class LocatorCache:
+    def __init__(self, path=LOCATOR_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Locator cache unreadable, starting fresh: {e}")
+            return {}
+
+    @staticmethod
+    def key(script_path, command):
+        return f"{script_path}::{command.id or f'{command.test}/{command.name}/{command.target.raw}'}"
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def remember(self, key, locator):
+        with self._lock:
+            if self._entries.get(key) != locator:
+                self._entries[key] = locator
+                self._dirty = True
+
+    def forget(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def flush(self):
+        """原子写回磁盘 (每次运行结束调用一次)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._entries, ensure_ascii=False, indent=1)
+            self._dirty = False
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Locator cache save failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_locator_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LocatorCache()
+        return _cache
@@ -0,0 +1,206 @@
+"""
+Prometheus 文本格式指标 (无第三方依赖)
+
+每个进程有一个全局 REGISTRY；collect() 产出可 JSON 序列化的快照，
+Web 层通过 IPC 取回守护进程的快照，与本进程的合并后统一输出到 /metrics。
+"""
+
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f'Expected labels {labelnames}, got {tuple(labels)}')
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def collect(self):
+        return {'name': self.name, 'type': self.type, 'help': self.documentation, 'samples': self._samples()}
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [[f'{self.name}_total', dict(zip(self.labelnames, key)), value] for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self.callback = callback      # 采集时调用，返回 {标签值元组: 数值}
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """进入时 +1，退出时 -1 (进行中的数量)"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self):
+        values = self.callback() if self.callback else None
+        with self._lock:
+            if values is None:
+                values = dict(self._values)
+        return [[self.name, dict(zip(self.labelnames, key)), value] for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}             # 标签 -> [各桶计数, 总和, 总数]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append([f'{self.name}_bucket', dict(labels, le=_format_value(bound)), cumulative])
+                samples.append([f'{self.name}_bucket', dict(labels, le='+Inf'), count])
+                samples.append([f'{self.name}_sum', labels, total])
+                samples.append([f'{self.name}_count', labels, count])
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # 模块被重复导入时复用已注册的实例
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, **const_labels):
+        """快照 (可 JSON 序列化)；const_labels 附加到每个样本，如 role=web"""
+        families = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            try:
+                family = metric.collect()
+            except Exception:
+                continue    # 回调失败 (如守护进程尚未就绪) 不影响其他指标
+            for sample in family['samples']:
+                sample[1] = dict(const_labels, **sample[1])
+            families.append(family)
+        return families
+
+
+REGISTRY = Registry()
+
+
+def merge(*snapshots):
+    """合并多个进程的快照，同名指标只输出一次 HELP/TYPE"""
+    merged = {}
+    for families in snapshots:
+        for family in families:
+            target = merged.setdefault(family['name'], dict(family, samples=[]))
+            target['samples'].extend(family['samples'])
+    return list(merged.values())
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if math.isnan(value):
+            return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(families):
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family['samples']:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text else f"{name} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
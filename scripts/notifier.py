@@ -0,0 +1,370 @@
+"""
+异步通知派发 (Outbox 模式)
+
+任务线程只把通知写入持久化的 SQLite Outbox 后立即返回；
+后台派发线程复用 SMTP 连接与 requests.Session 发送，失败按指数退避重试，
+短时间内大量任务结束时合并为一条摘要 (digest)。
+"""
+
+import os
+import html
+import time
+import sqlite3
+import logging
+import smtplib
+import threading
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.header import Header
+
+import requests
+
+from scripts.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH = os.environ.get('NOTIFY_OUTBOX_PATH', '/app/data/notify_outbox.db')
+COALESCE_SECONDS = float(os.environ.get('NOTIFY_COALESCE_SECONDS', '5'))
+MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '8'))
+SMTP_IDLE_SECONDS = 60
+# Telegram 单条消息上限 4096 字符，留出余量
+TELEGRAM_MAX_CHARS = 4000
+
+NOTIFY_LATENCY = REGISTRY.histogram('automation_notification_latency_seconds',
+                                    'Time from enqueue to successful delivery', ['channel'],
+                                    buckets=(1, 2.5, 5, 10, 30, 60, 300, 900, 3600, 21600))
+NOTIFY_FAILURES = REGISTRY.counter('automation_notification_failures', 'Failed notification delivery attempts', ['channel'])
+
+
+class PermanentDeliveryError(Exception):
+    """消息被服务端拒绝 (4xx，429 除外)，原样重试不会成功"""
+
+
+# --- 配置与消息格式 ---
+def get_email_config():
+    return {
+        'enabled': os.environ.get('ENABLE_EMAIL_NOTIFY', 'false').lower() == 'true',
+        'host': os.environ.get('SMTP_HOST'),
+        'port': int(os.environ.get('SMTP_PORT', 587)),
+        'user': os.environ.get('SMTP_USER'),
+        'password': os.environ.get('SMTP_PASSWORD'),
+        'from_addr': os.environ.get('EMAIL_FROM'),
+        'to_addr': os.environ.get('EMAIL_TO')
+    }
+
+def email_enabled(config=None):
+    config = config or get_email_config()
+    return config['enabled'] and all([config['host'], config['user']])
+
+def get_telegram_config():
+    return os.environ.get('TELEGRAM_BOT_TOKEN'), os.environ.get('TELEGRAM_CHAT_ID')
+
+def _public_domain():
+    return os.environ.get('APP_PUBLIC_DOMAIN', '').rstrip('/')
+
+def format_email(script_name, success, message, sent_at=None):
+    status_text = '✅ 执行成功' if success else '❌ 执行失败'
+    subject = f"[{status_text}] 任务通知: {script_name}"
+    public_domain = _public_domain()
+    link_html = f'<p><a href="{public_domain}">View Dashboard</a></p>' if public_domain else ''
+    body = f"<h3>任务报告</h3><p><b>任务:</b> {script_name}</p><p><b>状态:</b> {status_text}</p><p><b>时间:</b> {sent_at or datetime.now()}</p>{link_html}<hr><pre>{message}</pre>"
+    return subject, body
+
+def format_telegram(script_name, success, message, sent_at=None):
+    status_emoji = '✅' if success else '❌'
+    public_domain = _public_domain()
+    link_text = f"\n<a href='{public_domain}'>Open Dashboard</a>" if public_domain else ""
+    return (f"<b>{status_emoji} 任务通知</b>\n\n<b>任务:</b> {html.escape(script_name)}\n<b>时间:</b> {sent_at or datetime.now()}"
+            f"{link_text}\n<pre>{escaped_tail(message, 2000) if message else 'No Log'}</pre>")
+
+def escaped_tail(text, limit):
+    """取文本末尾，HTML 转义后不超过 limit 个字符 (不会截断实体)"""
+    tail = text[-limit:]
+    escaped = html.escape(tail)
+    while len(escaped) > limit:
+        # 每个字符转义后最多 6 个字符，按此逐步缩短，不会多截
+        tail = tail[max((len(escaped) - limit) // 6, 1):]
+        escaped = html.escape(tail)
+    return escaped
+
+def format_email_digest(items):
+    failed = sum(1 for item in items if not item['success'])
+    subject = f"[任务汇总] {len(items)} 个任务完成，{failed} 个失败"
+    rows = ''.join(
+        f"<h4>{'✅' if item['success'] else '❌'} {html.escape(item['title'])} <small>{item['created_at']}</small></h4>"
+        f"<pre>{html.escape((item['message'] or '')[-2000:])}</pre>"
+        for item in items
+    )
+    public_domain = _public_domain()
+    link_html = f'<p><a href="{public_domain}">View Dashboard</a></p>' if public_domain else ''
+    return subject, f"<h3>任务汇总报告</h3>{link_html}<hr>{rows}"
+
+def format_telegram_digest(items):
+    """按整条截断：超出长度的条目合并为「另有 N 条」，失败详情与链接始终保留"""
+    header = f"<b>📦 任务通知汇总 ({len(items)})</b>\n"
+    footer = []
+    failures = [item for item in items if not item['success']]
+    if failures:
+        last = failures[-1]
+        footer.append(f"\n<b>最近失败:</b> {html.escape(last['title'][:200])}\n"
+                      f"<pre>{escaped_tail(last['message'] or 'No Log', 1500)}</pre>")
+    public_domain = _public_domain()
+    if public_domain:
+        footer.append(f"<a href='{public_domain}'>Open Dashboard</a>")
+
+    budget = TELEGRAM_MAX_CHARS - len('\n'.join([header] + footer)) - 40    # 40: 「另有 N 条」
+    lines = [header]
+    for index, item in enumerate(items):
+        line = f"{'✅' if item['success'] else '❌'} {html.escape(item['title'][:200])} <i>{item['created_at'][11:19]}</i>"
+        budget -= len(line) + 1
+        if budget < 0:
+            lines.append(f"<i>… 另有 {len(items) - index} 条</i>")
+            break
+        lines.append(line)
+    return '\n'.join(lines + footer)
+
+
+# --- 发送通道 (连接复用) ---
+class TelegramTransport:
+    def __init__(self):
+        self.session = requests.Session()
+
+    def available(self):
+        bot_token, chat_id = get_telegram_config()
+        return bool(bot_token and chat_id)
+
+    def send(self, text, bot_token=None, chat_id=None):
+        if not bot_token or not chat_id:
+            bot_token, chat_id = get_telegram_config()
+        resp = self.session.post(
+            f'https://api.telegram.org/bot{bot_token}/sendMessage',
+            data={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'},
+            timeout=10
+        )
+        if 400 <= resp.status_code < 500 and resp.status_code != 429:
+            raise PermanentDeliveryError(f'Telegram rejected message ({resp.status_code}): {resp.text[:200]}')
+        resp.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class EmailTransport:
+    def __init__(self):
+        self._server = None
+        self._last_used = 0
+
+    def available(self):
+        return email_enabled()
+
+    def _connect(self, config):
+        server = smtplib.SMTP_SSL(config['host'], config['port'], timeout=30) if config['port'] == 465 \
+            else smtplib.SMTP(config['host'], config['port'], timeout=30)
+        if config['port'] != 465: server.starttls()
+        server.login(config['user'], config['password'])
+        return server
+
+    def _alive(self):
+        try:
+            return self._server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def send(self, subject, body):
+        config = get_email_config()
+        msg = MIMEMultipart()
+        msg['From'] = config['from_addr'] or config['user']
+        msg['To'] = config['to_addr']
+        msg['Subject'] = Header(subject, 'utf-8')
+        msg.attach(MIMEText(body, 'html', 'utf-8'))
+
+        if self._server is None or not self._alive():
+            self.close()
+            self._server = self._connect(config)
+        try:
+            self._server.sendmail(msg['From'], config['to_addr'], msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # 连接被服务端关闭，重连一次
+            self._server = self._connect(config)
+            self._server.sendmail(msg['From'], config['to_addr'], msg.as_string())
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+# --- Outbox + 派发线程 ---
+class NotificationDispatcher:
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self.transports = {'telegram': TelegramTransport(), 'email': EmailTransport()}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                title TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                message TEXT,
+                created_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (channel, next_attempt_at)')
+
+    def enqueue(self, title, success, message):
+        """写入 Outbox 后立即返回，由派发线程异步发送"""
+        channels = [name for name, transport in self.transports.items() if transport.available()]
+        if not channels:
+            return
+        now = time.time()
+        created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO outbox (channel, title, success, message, created_at, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?)',
+                [(channel, title, int(bool(success)), message, created_at, now) for channel in channels]
+            )
+        self._wakeup.set()
+
+    def pending(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='notify-dispatch', daemon=True)
+            self._thread.start()
+            # 进程重启后补发 Outbox 中的遗留消息
+            self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=15)
+        for transport in self.transports.values():
+            transport.close()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self._seconds_until_due())
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            # 合并窗口：让同一波结束的任务一起发送
+            if COALESCE_SECONDS > 0:
+                self._stop.wait(COALESCE_SECONDS)
+            try:
+                for channel in self.transports:
+                    self._dispatch(channel)
+            except Exception as e:
+                logger.error(f"Notification dispatch error: {e}")
+            self.transports['email'].close_if_idle()
+
+    def _seconds_until_due(self):
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT MIN(next_attempt_at) FROM outbox').fetchone()
+        except sqlite3.Error:
+            return 30
+        if row[0] is None:
+            return SMTP_IDLE_SECONDS
+        return min(max(row[0] - time.time(), 0.5), SMTP_IDLE_SECONDS)
+
+    def _dispatch(self, channel):
+        with self._connect() as conn:
+            rows = [dict(r) for r in conn.execute(
+                'SELECT * FROM outbox WHERE channel = ? AND next_attempt_at <= ? ORDER BY id',
+                (channel, time.time())
+            )]
+        if not rows:
+            return
+
+        transport = self.transports[channel]
+        try:
+            if not transport.available():
+                raise RuntimeError(f'{channel} notification is no longer configured')
+            if len(rows) == 1:
+                item = rows[0]
+                if channel == 'telegram':
+                    transport.send(format_telegram(item['title'], item['success'], item['message'], item['created_at']))
+                else:
+                    transport.send(*format_email(item['title'], item['success'], item['message'], item['created_at']))
+            else:
+                if channel == 'telegram':
+                    transport.send(format_telegram_digest(rows))
+                else:
+                    transport.send(*format_email_digest(rows))
+                logger.info(f"📦 Sent {channel} digest for {len(rows)} notifications")
+        except Exception as e:
+            NOTIFY_FAILURES.inc(channel=channel)
+            self._retry(rows, e)
+            return
+
+        with self._connect() as conn:
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(r['id'],) for r in rows])
+        now = time.time()
+        for row in rows:
+            enqueued = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S').timestamp()
+            NOTIFY_LATENCY.observe(max(now - enqueued, 0), channel=channel)
+
+    def _retry(self, rows, error):
+        now = time.time()
+        retried = 0
+        with self._connect() as conn:
+            for row in rows:
+                attempts = row['attempts'] + 1
+                if attempts >= MAX_ATTEMPTS or isinstance(error, PermanentDeliveryError):
+                    logger.error(f"Dropping {row['channel']} notification for '{row['title']}' after {attempts} attempts: {error}")
+                    conn.execute('DELETE FROM outbox WHERE id = ?', (row['id'],))
+                    continue
+                delay = min(10 * (2 ** row['attempts']), 3600)
+                conn.execute(
+                    'UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                    (attempts, now + delay, str(error)[:500], row['id'])
+                )
+                retried += 1
+        if retried:
+            logger.warning(f"{rows[0]['channel']} notification failed ({error}), will retry")
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+            _dispatcher.start()
+        return _dispatcher
+
+def notify(title, success, message):
+    """任务结束通知入口 (非阻塞)"""
+    try:
+        get_dispatcher().enqueue(title, success, message)
+    except Exception as e:
+        logger.error(f"Notification enqueue failed: {e}")
@@ -0,0 +1,424 @@
+"""
+Selenium IDE (.side) 的 Playwright 回放引擎
+
+与 SeleniumIDEExecutor 回放同一份编译计划 (side_compiler)，区别在于：
+- 不经过 chromedriver，Playwright 直接通过 CDP 驱动 Chrome
+- 常驻一个浏览器进程 (按 有头/无头 + 显示器区分)，每次运行只新建一个 BrowserContext，
+  Cookie / 存储互相隔离，创建开销为毫秒级；空闲 PLAYWRIGHT_IDLE_SECONDS 后关闭浏览器释放内存
+- 定位器自带自动等待 (可见 / 可用 / 稳定)，不再轮询 DOM
+
+Playwright 对象绑定创建它的线程，所有浏览器操作都在一个专用的事件循环线程上执行，
+执行器线程提交协程后等待结果，多个运行可以并发共用同一个浏览器。
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from selenium.webdriver.common.by import By
+
+from scripts.side_compiler import Template, load_plan, parse_locator
+from scripts.locator_cache import get_locator_cache
+from scripts.speed_profiles import get_profile
+
+logger = logging.getLogger(__name__)
+
+PLAYWRIGHT_IDLE_SECONDS = int(os.environ.get('PLAYWRIGHT_IDLE_SECONDS', '300'))
+# 镜像内的 Chrome 启动包装脚本；不存在时使用 Playwright 自带的 Chromium
+CHROME_BINARY = os.environ.get('CHROME_BINARY', '/usr/bin/google-chrome-stable')
+HEADLESS_WINDOW_SIZE = os.environ.get('CHROME_HEADLESS_WINDOW', '1920,1080')
+NAVIGATION_TIMEOUT = 60
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+CHROME_ARGS = ['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--disable-infobars',
+               '--disable-blink-features=AutomationControlled']
+
+
+def to_selector(by, value):
+    """side_compiler.parse_locator 的 (By, 值) 转为 Playwright 选择器"""
+    if by == By.ID:
+        return f'id={value}'
+    if by == By.NAME:
+        return f'css=[name={json.dumps(value)}]'
+    if by == By.XPATH:
+        return f'xpath={value}'
+    if by == By.LINK_TEXT:
+        return f'css=a:text-is({json.dumps(value)})'
+    if by == By.PARTIAL_LINK_TEXT:
+        return f'css=a:has-text({json.dumps(value)})'
+    return f'css={value}'
+
+
+class BrowserHost:
+    """事件循环线程 + 按 (headless, 显示器) 共享的浏览器进程"""
+
+    def __init__(self, idle_seconds=PLAYWRIGHT_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.launches = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._playwright = None
+        self._launch_lock = None
+        self._browsers = {}       # key -> Browser
+        self._active = {}         # key -> 使用中的 context 数
+        self._idle_timers = {}    # key -> 空闲关闭定时器
+
+    def submit(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='playwright-host', daemon=True).start()
+            return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _browser(self, key, headless, display_env):
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            browser = self._browsers.get(key)
+            if browser is not None and browser.is_connected():
+                return browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            options = {
+                'headless': headless,
+                'args': CHROME_ARGS + ([] if headless else ['--start-maximized']),
+                'ignore_default_args': ['--enable-automation'],
+                'env': {**os.environ, 'DISPLAY': os.environ.get('DISPLAY', ':1'), **(display_env or {})}
+            }
+            if CHROME_BINARY and os.path.exists(CHROME_BINARY):
+                options['executable_path'] = CHROME_BINARY
+            started = time.monotonic()
+            browser = await self._playwright.chromium.launch(**options)
+            self._browsers[key] = browser
+            self.launches += 1
+            logger.info(f"🎭 Playwright browser launched in {time.monotonic() - started:.1f}s "
+                        f"(headless={headless}, display={(display_env or {}).get('DISPLAY', ':1')})")
+            return browser
+
+    async def new_context(self, headless=False, display_env=None):
+        key = (headless, tuple(sorted((display_env or {}).items())))
+        timer = self._idle_timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._active[key] = self._active.get(key, 0) + 1
+        try:
+            browser = await self._browser(key, headless, display_env)
+            if headless:
+                width, height = (int(v) for v in HEADLESS_WINDOW_SIZE.split(','))
+                context = await browser.new_context(user_agent=USER_AGENT, viewport={'width': width, 'height': height})
+            else:
+                context = await browser.new_context(user_agent=USER_AGENT, no_viewport=True)
+            await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined});")
+            return key, context
+        except BaseException:
+            self._released(key)
+            raise
+
+    async def release_context(self, key, context):
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Context close failed: {e}")
+        finally:
+            self._released(key)
+
+    def _released(self, key):
+        self._active[key] -= 1
+        if self._active[key] == 0 and key in self._browsers:
+            loop = asyncio.get_running_loop()
+            self._idle_timers[key] = loop.call_later(
+                self.idle_seconds, lambda: asyncio.ensure_future(self._close_idle(key)))
+
+    async def _close_idle(self, key):
+        self._idle_timers.pop(key, None)
+        if self._active.get(key):
+            return
+        browser = self._browsers.pop(key, None)
+        if browser is not None:
+            logger.info(f"🎭 Closing idle Playwright browser after {self.idle_seconds}s")
+            await browser.close()
+
+    async def _close_all(self):
+        for timer in self._idle_timers.values():
+            timer.cancel()
+        self._idle_timers.clear()
+        browsers, self._browsers = list(self._browsers.values()), {}
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.debug(f"Browser close failed: {e}")
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def shutdown(self, timeout=15):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_all(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Playwright shutdown incomplete: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_host = None
+_host_lock = threading.Lock()
+
+def get_browser_host():
+    global _host
+    with _host_lock:
+        if _host is None:
+            _host = BrowserHost()
+        return _host
+
+def shutdown_browser_host():
+    global _host
+    with _host_lock:
+        host, _host = _host, None
+    if host is not None:
+        host.shutdown()
+
+
+class PlaywrightSideExecutor:
+    """与 SeleniumIDEExecutor 相同的接口: execute() -> (success, message)，locator_stats / resource_usage"""
+
+    def __init__(self, script_path, output=None, profile=None, locator_cache=None, headless=False,
+                 display_env=None, timeout=None, run_id=None, host=None):
+        self.script_path = script_path
+        self.output = output
+        self.profile = profile or get_profile()
+        self.locator_cache = locator_cache or get_locator_cache()
+        self.locator_stats = {'hits': 0, 'misses': 0, 'fallbacks': 0}
+        # 浏览器进程由多个运行共享，无法按运行统计 CPU / 内存
+        self.resource_usage = None
+        self.headless = headless
+        self.display_env = display_env
+        self.timeout = timeout
+        self.deadline = None
+        self.run_id = run_id
+        self.host = host
+        self.slept = 0.0
+        self.waited = 0.0
+        self.page = None
+        self.variables = {}
+        self.base_url = ''
+        self.plan = None
+        self.handlers = {
+            'open': self.cmd_open,
+            'click': self.cmd_click,
+            'type': self.cmd_type,
+            'sendKeys': self.cmd_send_keys,
+            'select': self.cmd_select,
+            'pause': self.cmd_pause,
+            'store': self.cmd_store,
+            'storeText': self.cmd_store_text,
+            'executeScript': self.cmd_execute_script,
+        }
+
+    def log(self, message, level=logging.INFO):
+        logger.log(level, message)
+        if self.output is not None:
+            self.output.write(message)
+
+    def load_script(self):
+        try:
+            self.plan = load_plan(self.script_path)
+            self.base_url = self.plan.url
+            return self.plan
+        except Exception as e:
+            self.log(f"Load script failed: {e}", logging.ERROR)
+            return None
+
+    def execute(self):
+        # 读取 / 编译脚本在调用线程完成，不占用共享的事件循环线程
+        plan = self.load_script()
+        if not plan: return False, "Load script failed"
+        host = self.host or get_browser_host()
+        future = host.submit(self._run(host, plan))
+        try:
+            # 命令之间已检查时限，这里只兜底浏览器本身卡死的情况
+            return future.result(timeout=self.timeout + 30 if self.timeout else None)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.log(f"⏱ Timeout: playback did not stop within {self.timeout}s, cancelled", logging.ERROR)
+            return False, f"Timeout after {self.timeout}s"
+
+    async def _run(self, host, plan):
+        started = time.monotonic()
+        if self.timeout:
+            self.deadline = started + self.timeout
+        try:
+            key, context = await host.new_context(self.headless, self.display_env)
+        except Exception as e:
+            logger.error(f"Playwright Init Failed: {e}")
+            return False, "Browser init failed"
+        try:
+            self.page = await context.new_page()
+            self.log(f"⚙️ Speed profile: {self.profile.describe()}, engine playwright")
+            for command in plan.commands:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    self.log(f"⏱ Timeout: stopped after {int(time.monotonic() - started)}s")
+                    return False, f"Timeout after {self.timeout}s"
+                if not await self.execute_command(command): return False, f"Failed at {command.name}"
+            return True, "Finished"
+        except Exception as e:
+            return False, str(e)
+        finally:
+            self.log(f"⏱ {self.profile.name}: slept {self.slept:.1f}s, waited {self.waited:.1f}s, "
+                     f"total {time.monotonic() - started:.1f}s")
+            stats = self.locator_stats
+            if any(stats.values()):
+                self.log(f"🎯 Locators: {stats['hits']} cache hits, {stats['misses']} misses, {stats['fallbacks']} fallbacks")
+            try:
+                # 定位器缓存落盘是阻塞的文件 I/O，放到线程池，避免卡住其他并发运行
+                await asyncio.get_running_loop().run_in_executor(None, self.locator_cache.flush)
+            finally:
+                await host.release_context(key, context)
+
+    async def sleep(self, seconds):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+            self.slept += seconds
+
+    def timeout_ms(self, seconds=None):
+        """单步等待上限 (毫秒)，不超出整个运行的剩余时间"""
+        seconds = seconds or self.profile.wait_timeout
+        if self.deadline is not None:
+            seconds = max(min(seconds, self.deadline - time.monotonic()), 0.1)
+        return seconds * 1000
+
+    async def waiting(self, awaitable):
+        """自动等待 + 动作耗时计入 waited"""
+        started = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.waited += time.monotonic() - started
+
+    async def execute_command(self, command):
+        cmd = command.name
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            self.log(f"Skip unsupported command: {cmd}", logging.WARNING)
+            return True
+
+        target = command.target.render(self.variables)
+        value = command.value.render(self.variables)
+        try:
+            await self.sleep(self.profile.command_pause())
+            self.log(f"CMD: {cmd} | {target} | {value}")
+            await handler(command, target, value)
+            return True
+        except Exception as e:
+            self.log(f"Exec Fail: {cmd} - {e}", logging.ERROR)
+            return False
+
+    # --- 命令实现 ---
+    async def cmd_open(self, command, target, value):
+        url = target if target.startswith('http') else (self.base_url.rstrip('/') + target)
+        wait_until = 'load' if self.profile.page_ready == 'complete' else 'domcontentloaded'
+        await self.waiting(self.page.goto(url, wait_until=wait_until, timeout=self.timeout_ms(NAVIGATION_TIMEOUT)))
+        if self.profile.network_idle:
+            try:
+                await self.waiting(self.page.wait_for_load_state('networkidle', timeout=self.timeout_ms()))
+            except PlaywrightTimeoutError:
+                self.log("Network did not go idle, continuing", logging.WARNING)
+
+    async def cmd_click(self, command, target, value):
+        locator = await self.find_element(command, target, visible=True)
+        if self.profile.scroll_delay:
+            await self.waiting(locator.scroll_into_view_if_needed(timeout=self.timeout_ms()))
+            await self.sleep(self.profile.scroll_delay)
+        if self.profile.smooth_scroll:
+            await self.waiting(locator.hover(timeout=self.timeout_ms()))
+            await self.sleep(0.2)
+        await self.waiting(locator.click(timeout=self.timeout_ms()))
+
+    async def cmd_type(self, command, target, value):
+        locator = await self.find_element(command, target)
+        if not self.profile.typing_delay:
+            await self.waiting(locator.fill(value, timeout=self.timeout_ms()))
+            return
+        await self.waiting(locator.fill('', timeout=self.timeout_ms()))
+        for char in value:
+            await locator.press_sequentially(char, timeout=self.timeout_ms())
+            await self.sleep(self.profile.typing_pause())
+
+    async def cmd_send_keys(self, command, target, value):
+        locator = await self.find_element(command, target)
+        if command.value.raw == '${KEY_ENTER}':
+            await self.waiting(locator.press('Enter', timeout=self.timeout_ms()))
+        else:
+            await self.waiting(locator.press_sequentially(value, timeout=self.timeout_ms()))
+
+    async def cmd_select(self, command, target, value):
+        locator = await self.find_element(command, target)
+        if value.startswith('value='):
+            option = {'value': value[6:]}
+        else:
+            option = {'label': value[6:] if value.startswith('label=') else value}
+        await self.waiting(locator.select_option(timeout=self.timeout_ms(), **option))
+
+    async def cmd_pause(self, command, target, value):
+        # 脚本中显式写的 pause 属于业务需要，所有档位都保留
+        await self.sleep(int(value) / 1000)
+
+    async def cmd_store(self, command, target, value):
+        self.variables[value] = target
+
+    async def cmd_store_text(self, command, target, value):
+        locator = await self.find_element(command, target)
+        self.variables[value] = await self.waiting(locator.inner_text(timeout=self.timeout_ms()))
+
+    async def cmd_execute_script(self, command, target, value):
+        # Selenium IDE 的脚本是函数体 (可含 return)
+        await self.page.evaluate(f"() => {{ {target} }}")
+
+    async def find_element(self, command, target, visible=False):
+        if not command.targets:
+            # 无备选定位器：直接交给动作本身的自动等待
+            locator = command.locator or parse_locator(target)
+            return self.page.locator(to_selector(*locator)).first
+
+        # 候选顺序: 上次成功的定位器 -> target -> targets 备选
+        cache_key = self.locator_cache.key(self.script_path, command)
+        cached = self.locator_cache.get(cache_key)
+        candidates = list(dict.fromkeys(c for c in (cached, command.target.raw, *command.targets) if c))
+        locators = [(raw, self.page.locator(to_selector(*self.resolve_locator(raw))).first) for raw in candidates]
+        combined = locators[0][1]
+        for _, locator in locators[1:]:
+            combined = combined.or_(locator)
+
+        winner, el = None, None
+        try:
+            # 任一候选出现即返回，再按顺序确定命中的是哪一个
+            await self.waiting(combined.first.wait_for(state='visible' if visible else 'attached', timeout=self.timeout_ms()))
+            for raw, locator in locators:
+                if await (locator.is_visible() if visible else locator.count()):
+                    winner, el = raw, locator
+                    break
+        except PlaywrightTimeoutError:
+            pass
+        if winner is None:
+            self.locator_stats['misses'] += 1
+            if cached:
+                self.locator_cache.forget(cache_key)
+            raise PlaywrightTimeoutError(f"No locator matched: {', '.join(candidates)}")
+
+        self.locator_stats['hits' if winner == cached else 'misses'] += 1
+        if winner != command.target.raw:
+            self.locator_stats['fallbacks'] += 1
+            self.log(f"🎯 Fallback locator used: {winner}")
+        self.locator_cache.remember(cache_key, winner)
+        return el
+
+    def resolve_locator(self, raw):
+        return parse_locator(Template(raw).render(self.variables) if '${' in raw else raw)
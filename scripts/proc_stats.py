@@ -0,0 +1,125 @@
+"""
+进程树资源统计
+
+采样线程定期遍历 /proc，统计根进程及其全部子孙进程 (含 Selenium / Playwright 拉起的 Chrome)
+的 CPU 时间与常驻内存 (RSS) 之和的峰值。
+子进程结束并被父进程回收后，其 CPU 时间计入父进程的 cutime/cstime，因此总量不会丢失；
+由 wait4 回收的根进程再用内核 rusage 校正 CPU 时间。
+"""
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = float(os.environ.get('PROC_SAMPLE_INTERVAL', '0.5'))
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def read_stat(pid):
+    """返回 (ppid, user 秒, sys 秒)；user/sys 含已回收子进程的时间"""
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        data = f.read()
+    # comm 字段可能包含空格和括号，从最后一个 ')' 之后解析
+    fields = data[data.rindex(b')') + 2:].split()
+    ppid = int(fields[1])
+    utime, stime, cutime, cstime = (int(v) for v in fields[11:15])
+    return ppid, (utime + cutime) / CLK_TCK, (stime + cstime) / CLK_TCK
+
+
+def read_rss(pid):
+    with open(f'/proc/{pid}/statm', 'rb') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def child_pids(pid):
+    """直接子进程 (/proc/<pid>/task/<tid>/children)"""
+    children = []
+    try:
+        for tid in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{tid}/children', 'rb') as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def process_tree(root_pid):
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(child_pids(pid))
+    return pids
+
+
+class ProcessTreeSampler:
+    """后台采样一个进程树；stop() 返回本次运行的资源用量"""
+
+    def __init__(self, root_pid, interval=SAMPLE_INTERVAL):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_procs = 0
+        self._baseline = None       # 开始时的 (user, sys)，复用的进程 (预热的 Chrome) 只统计增量
+        self._cpu = (0.0, 0.0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._loop, name=f'proc-sampler-{self.root_pid}', daemon=True)
+        self._thread.start()
+        return self
+
+    def sample(self):
+        user = system = 0.0
+        rss = procs = 0
+        for pid in process_tree(self.root_pid):
+            try:
+                _, u, s = read_stat(pid)
+                rss += read_rss(pid)
+            except (OSError, ValueError, IndexError):
+                continue    # 进程已退出
+            user += u
+            system += s
+            procs += 1
+        if procs == 0:
+            return
+        if self._baseline is None:
+            self._baseline = (user, system)
+        # 孤儿进程被 init 回收时总量会回落，保留最大值
+        self._cpu = (max(self._cpu[0], user - self._baseline[0]), max(self._cpu[1], system - self._baseline[1]))
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_procs = max(self.peak_procs, procs)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Process sampling failed for {self.root_pid}: {e}")
+
+    def stop(self, rusage=None):
+        """rusage: 根进程被 wait4 回收时得到的内核统计 (含其回收的全部子孙)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        cpu_user, cpu_sys = self._cpu
+        if rusage is not None:
+            cpu_user = max(cpu_user, rusage.ru_utime)
+            cpu_sys = max(cpu_sys, rusage.ru_stime)
+            # 不使用 ru_maxrss：它包含 fork 后 exec 前继承自父进程 (gunicorn / 守护进程) 的内存
+        return {
+            'cpu_user': round(cpu_user, 3),
+            'cpu_sys': round(cpu_sys, 3),
+            'peak_rss_kb': self.peak_rss // 1024,
+            'peak_procs': self.peak_procs
+        }
+
+
+def describe_usage(usage):
+    return (f"📊 CPU {usage['cpu_user']:.2f}s user / {usage['cpu_sys']:.2f}s sys, "
+            f"peak RSS {usage['peak_rss_kb'] / 1024:.0f} MB, {usage['peak_procs']} processes")
@@ -0,0 +1,264 @@
+"""
+子进程流式执行与有界输出缓冲
+
+脚本输出逐行写入固定容量的环形缓冲区，既能被 SSE 实时订阅，
+又保证输出量很大的脚本也不会让内存无限增长。
+"""
+
+import os
+import time
+import shutil
+import signal
+import logging
+import resource
+import threading
+import subprocess
+from collections import deque
+
+from scripts.proc_stats import ProcessTreeSampler
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER_LINES = 2000
+MAX_LINE_CHARS = 4000
+# 超时后 SIGTERM 到 SIGKILL 的宽限期
+KILL_GRACE_SECONDS = float(os.environ.get('KILL_GRACE_SECONDS', '10'))
+
+
+class RunOutputBuffer:
+    """单次运行的有界输出缓冲 (按行编号，便于断点续订)"""
+
+    def __init__(self, max_lines=MAX_BUFFER_LINES, max_line_chars=MAX_LINE_CHARS):
+        self.max_line_chars = max_line_chars
+        self._lines = deque(maxlen=max_lines)
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def write(self, line):
+        line = line.rstrip('\r\n')
+        if len(line) > self.max_line_chars:
+            line = line[:self.max_line_chars] + ' ...[line truncated]'
+        with self._cond:
+            self._seq += 1
+            self._lines.append((self._seq, line))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read_since(self, seq, timeout=None):
+        """返回 (编号大于 seq 的行, 是否已结束)；没有新行时最多等待 timeout 秒"""
+        with self._cond:
+            if self._seq <= seq and not self._closed and timeout:
+                self._cond.wait(timeout)
+            return [item for item in self._lines if item[0] > seq], self._closed
+
+    def text(self):
+        with self._cond:
+            lines = list(self._lines)
+            dropped = lines[0][0] - 1 if lines else 0
+        body = '\n'.join(line for _, line in lines)
+        if dropped:
+            body = f'...[{dropped} earlier lines dropped]\n' + body
+        return body
+
+
+def _pump(stream, buffer):
+    try:
+        # 限长读取，避免没有换行的超长输出一次性进入内存
+        for chunk in iter(lambda: stream.readline(MAX_LINE_CHARS), ''):
+            buffer.write(chunk)
+    except Exception as e:
+        logger.warning(f"Output pump stopped: {e}")
+    finally:
+        stream.close()
+
+
+def background_priority(cmd, nice):
+    """后台运行降级：CPU nice + I/O best-effort 最低优先级 (用命令前缀，避免线程中使用 preexec_fn)"""
+    if not nice or nice <= 0:
+        return list(cmd)
+    prefix = ['nice', '-n', str(int(nice))]
+    if shutil.which('ionice'):
+        prefix = ['ionice', '-c', '2', '-n', '7'] + prefix
+    return prefix + list(cmd)
+
+
+def group_members(pgid):
+    """进程组内仍存在的进程 (不含僵尸)"""
+    members = []
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry.name}/stat', 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        fields = data[data.rindex(b')') + 2:].split()
+        if int(fields[2]) == pgid and fields[0] != b'Z':
+            members.append(int(entry.name))
+    return members
+
+
+def terminate_group(pgid, grace=KILL_GRACE_SECONDS):
+    """向整个进程组发送 SIGTERM，grace 秒后仍未退出则 SIGKILL；返回被结束的进程数"""
+    members = group_members(pgid)
+    if not members:
+        return 0
+    try:
+        os.killpg(pgid, signal.SIGTERM)
+    except ProcessLookupError:
+        return 0
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        if not group_members(pgid):
+            return len(members)
+        time.sleep(0.2)
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    return len(members)
+
+
+def apply_memory_limit(pid, limit_mb):
+    """RLIMIT_AS (虚拟地址空间) 上限，子进程继承"""
+    if not limit_mb or limit_mb <= 0:
+        return
+    limit = int(limit_mb) * 1024 * 1024
+    try:
+        resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not apply memory limit to {pid}: {e}")
+
+
+def run_streamed(cmd, env=None, timeout=300, buffer=None, cwd=None, nice=None, usage=None, memory_limit_mb=None):
+    """
+    执行命令并把 stdout/stderr 合并流式写入 buffer，返回退出码。
+    命令在独立的会话/进程组中运行，超时与残留子进程的处理见 supervise()。
+    nice > 0 时以后台优先级运行。usage 为 dict 时写入整个进程树的 CPU 时间与内存峰值 (见 proc_stats)。
+    """
+    buffer = buffer if buffer is not None else RunOutputBuffer()
+    proc = subprocess.Popen(
+        background_priority(cmd, nice),
+        env=env,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        bufsize=1,
+        start_new_session=True      # setsid：进程组 ID = proc.pid
+    )
+    apply_memory_limit(proc.pid, memory_limit_mb)
+
+    def _wait():
+        # 用 wait4 回收，顺带拿到内核统计的 rusage (含已回收的子孙进程)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode, rusage
+
+    return supervise(proc.pid, proc.stdout, _wait, buffer, timeout=timeout, usage=usage)
+
+
+def supervise(pid, stream, wait, buffer, timeout=300, usage=None):
+    """
+    监管一个已启动的进程组 (pid = 组长，输出来自 stream)，返回退出码。
+    wait() 阻塞到组长退出，返回 (退出码, rusage 或 None)。
+    超时时整个进程组先 SIGTERM、宽限期后 SIGKILL，返回 -9；
+    组长退出后残留在组内的子进程 (如未关闭的 Chrome) 同样被清理。
+    """
+    pump = threading.Thread(target=_pump, args=(stream, buffer), daemon=True)
+    pump.start()
+    sampler = ProcessTreeSampler(pid).start() if usage is not None else None
+
+    started = time.monotonic()
+    timed_out = threading.Event()
+
+    def _expire():
+        timed_out.set()
+        buffer.write(f'⏱ Timeout: terminating process group after {int(time.monotonic() - started)}s')
+        terminate_group(pid)
+
+    timer = threading.Timer(timeout, _expire) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    returncode, rusage = wait()
+    if timer:
+        timer.cancel()
+        timer.join()
+    if timed_out.is_set():
+        returncode = -9
+
+    # 组长已退出，清理仍留在进程组内的子进程
+    leftover = terminate_group(pid, grace=min(KILL_GRACE_SECONDS, 3))
+    if leftover:
+        buffer.write(f'🧹 Terminated {leftover} leftover child process(es)')
+    pump.join(timeout=5)
+    if sampler is not None:
+        usage.update(sampler.stop(rusage))
+    return returncode
+
+
+# --- 孤儿浏览器进程清理 ---
+RUN_MARKER_ENV = 'AUTOMATION_RUN_ID'
+BROWSER_PROCESS_PREFIXES = ('chrome', 'chromium', 'headless_shell', 'nacl_helper')
+
+
+def _run_marker(pid):
+    with open(f'/proc/{pid}/environ', 'rb') as f:
+        for item in f.read().split(b'\0'):
+            if item.startswith(RUN_MARKER_ENV.encode() + b'='):
+                return item.split(b'=', 1)[1].decode()
+    return None
+
+
+def reap_orphans(active_run_ids, grace=KILL_GRACE_SECONDS):
+    """
+    结束不属于任何运行中任务的 chrome / chromedriver 进程。
+    只处理环境变量带有 AUTOMATION_RUN_ID 的进程 (由任务启动)，桌面上手动打开的浏览器与预热池不受影响。
+    """
+    active = {str(run_id) for run_id in active_run_ids}
+    orphans = []
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        try:
+            with open(f'/proc/{pid}/comm', 'r') as f:
+                if not f.read().strip().startswith(BROWSER_PROCESS_PREFIXES):
+                    continue
+            marker = _run_marker(pid)
+        except OSError:
+            continue
+        if marker is not None and marker not in active:
+            orphans.append(pid)
+    if not orphans:
+        return 0
+
+    for pid in orphans:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline and any(os.path.exists(f'/proc/{pid}') for pid in orphans):
+        time.sleep(0.2)
+    for pid in orphans:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    logger.warning(f"🧹 Reaped {len(orphans)} orphaned browser process(es)")
+    return len(orphans)
@@ -0,0 +1,267 @@
+"""
+脚本目录索引
+
+启动时扫描一次脚本目录，之后由 inotify 增量维护 (ctypes 调用 libc，无额外依赖)；
+inotify 不可用或事件队列溢出时退化为定期全量重扫。
+/dashboard 与 /api/scripts 直接读取内存索引，不再每次 rglob。
+"""
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_EXTENSIONS = ('.side', '.py', '.autokey')
+RESCAN_INTERVAL = int(os.environ.get('SCRIPT_INDEX_RESCAN', '300'))
+FALLBACK_RESCAN_INTERVAL = 30     # 无 inotify 时的重扫间隔
+
+# inotify 常量 (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_script_file(name):
+    return not name.startswith('.') and name.lower().endswith(SCRIPT_EXTENSIONS)
+
+
+class _Inotify:
+    """最小化的 inotify 封装"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f'inotify_add_watch failed: {os.strerror(err)}', path)
+        return wd
+
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ScriptIndex:
+    def __init__(self, base_dirs):
+        self.base_dirs = {key: str(path) for key, path in base_dirs.items()}
+        self._entries = {}        # 绝对路径 -> 目录 key
+        self._watches = {}        # wd -> 目录路径
+        self._lock = threading.Lock()
+        self._snapshot = None     # (scripts, etag)
+        self._inotify = None
+        self._stop = threading.Event()
+        self._rescan_requested = False
+        self._thread = None
+
+    # --- 对外接口 ---
+    def start(self):
+        try:
+            self._inotify = _Inotify()
+        except Exception as e:
+            logger.warning(f"inotify unavailable, script index falls back to polling: {e}")
+            self._inotify = None
+        self.rescan()
+        self._thread = threading.Thread(target=self._loop, name='script-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """返回 (脚本列表, ETag)"""
+        with self._lock:
+            if self._snapshot is None:
+                scripts = sorted(
+                    ({'name': f"[{key}] {os.path.basename(path)}", 'path': path} for path, key in self._entries.items()),
+                    key=lambda item: (item['name'].lower(), item['path'])
+                )
+                digest = hashlib.sha1('\n'.join(item['path'] for item in scripts).encode('utf-8')).hexdigest()[:16]
+                self._snapshot = (scripts, digest)
+            return self._snapshot
+
+    def scripts(self):
+        return self.snapshot()[0]
+
+    def touch(self, path):
+        """应用自身写入/删除文件后立即更新，不依赖事件到达"""
+        path = os.path.abspath(str(path))
+        key = self._key_for(path)
+        if key is None:
+            return
+        with self._lock:
+            if os.path.isfile(path) and is_script_file(os.path.basename(path)):
+                self._set(path, key)
+            else:
+                self._discard(path)
+
+    def rescan(self):
+        started = time.monotonic()
+        entries = {}
+        # 重建 wd -> 路径映射 (同一目录重复 add_watch 返回相同 wd，目录移动后路径随之更新)
+        self._watches = {}
+        for key, base in self.base_dirs.items():
+            if not os.path.isdir(base):
+                continue
+            for dirpath, _dirnames, filenames in os.walk(base):
+                self._watch(dirpath)
+                for name in filenames:
+                    if is_script_file(name):
+                        entries[os.path.join(dirpath, name)] = key
+        with self._lock:
+            if entries != self._entries:
+                self._entries = entries
+                self._snapshot = None
+        logger.info(f"📇 Script index rescanned: {len(entries)} scripts in {time.monotonic() - started:.2f}s")
+
+    # --- 内部实现 ---
+    def _key_for(self, path):
+        for key, base in self.base_dirs.items():
+            if path == base or path.startswith(base.rstrip('/') + '/'):
+                return key
+        return None
+
+    def _set(self, path, key):
+        if self._entries.get(path) != key:
+            self._entries[path] = key
+            self._snapshot = None
+
+    def _discard(self, path):
+        if self._entries.pop(path, None) is not None:
+            self._snapshot = None
+
+    def _discard_tree(self, directory):
+        prefix = directory.rstrip('/') + '/'
+        stale = [path for path in self._entries if path.startswith(prefix)]
+        for path in stale:
+            del self._entries[path]
+        if stale:
+            self._snapshot = None
+
+    def _watch(self, directory):
+        if self._inotify is None:
+            return
+        try:
+            self._watches[self._inotify.add_watch(directory)] = directory
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                # 超出 max_user_watches，退化为轮询
+                logger.warning("inotify watch limit reached, script index falls back to polling")
+                self._inotify.close()
+                self._inotify, self._watches = None, {}
+            elif e.errno != errno.ENOENT:
+                logger.warning(f"Cannot watch {directory}: {e}")
+
+    def _loop(self):
+        last_rescan = time.monotonic()
+        while not self._stop.is_set():
+            interval = RESCAN_INTERVAL if self._inotify else FALLBACK_RESCAN_INTERVAL
+            if self._inotify is None:
+                self._stop.wait(1.0)
+            else:
+                try:
+                    self._handle(self._inotify.read_events(timeout=1.0))
+                except Exception as e:
+                    logger.error(f"Script index watcher error: {e}")
+                    self._rescan_requested = True
+            if self._rescan_requested or time.monotonic() - last_rescan >= interval:
+                self._rescan_requested = False
+                last_rescan = time.monotonic()
+                try:
+                    self.rescan()
+                except Exception as e:
+                    logger.error(f"Script index rescan failed: {e}")
+
+    def _handle(self, events):
+        for wd, mask, name in events:
+            if (mask & IN_Q_OVERFLOW) or \
+               (mask & (IN_DELETE_SELF | IN_MOVE_SELF) and self._watches.get(wd) in self.base_dirs.values()):
+                self._rescan_requested = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            key = self._key_for(path)
+            if key is None:
+                continue
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # 新目录: 补建监听并扫描其中已有的文件
+                    for dirpath, _dirnames, filenames in os.walk(path):
+                        self._watch(dirpath)
+                        with self._lock:
+                            for filename in filenames:
+                                if is_script_file(filename):
+                                    self._set(os.path.join(dirpath, filename), key)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    with self._lock:
+                        self._discard_tree(path)
+                if mask & (IN_MOVED_FROM | IN_MOVED_TO):
+                    # 已有子目录的监听仍指向旧路径，重扫以刷新映射
+                    self._rescan_requested = True
+                continue
+
+            if not is_script_file(name):
+                continue
+            with self._lock:
+                if mask & (IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE):
+                    self._set(path, key)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._discard(path)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_script_index(base_dirs):
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ScriptIndex(base_dirs)
+            _index.start()
+        return _index
@@ -0,0 +1,150 @@
+"""
+Selenium IDE (.side) 脚本编译与缓存
+
+.side 文件只在内容变化时解析一次，编译为执行计划：
+- 命令名预先映射到处理函数
+- 定位器 (id= / css= / xpath= ...) 预先解析
+- ${var} 模板预先切分，运行时只做拼接
+计划按 路径 + mtime + size 缓存，重复的定时运行直接复用。
+"""
+
+import os
+import re
+import json
+import threading
+from functools import lru_cache
+
+from selenium.webdriver.common.by import By
+
+# 执行器已实现的命令
+SUPPORTED_COMMANDS = {
+    'open', 'click', 'type', 'sendKeys', 'select', 'pause',
+    'store', 'storeText', 'executeScript'
+}
+# 录制时常见、回放时可以安全跳过的命令
+IGNORED_COMMANDS = {'setWindowSize', 'mouseOver', 'mouseOut', 'mouseMove', 'echo'}
+
+LOCATOR_PREFIXES = (
+    ('id=', By.ID),
+    ('name=', By.NAME),
+    ('css=', By.CSS_SELECTOR),
+    ('xpath=', By.XPATH),
+    ('linkText=', By.LINK_TEXT),
+    ('partialLinkText=', By.PARTIAL_LINK_TEXT),
+)
+
+_VAR_PATTERN = re.compile(r'\$\{([^}]+)\}')
+
+
+class Template:
+    """预切分的 ${var} 模板"""
+
+    __slots__ = ('raw', 'parts')
+
+    def __init__(self, raw):
+        self.raw = raw or ''
+        parts, pos = [], 0
+        for match in _VAR_PATTERN.finditer(self.raw):
+            if match.start() > pos:
+                parts.append((False, self.raw[pos:match.start()]))
+            parts.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(self.raw):
+            parts.append((False, self.raw[pos:]))
+        self.parts = parts
+
+    @property
+    def static(self):
+        return all(not is_var for is_var, _ in self.parts)
+
+    def render(self, variables):
+        if self.static:
+            return self.raw
+        out = []
+        for is_var, text in self.parts:
+            if is_var:
+                # 未定义的变量保持原样 (与旧的字符串替换行为一致)
+                out.append(str(variables[text]) if text in variables else f'${{{text}}}')
+            else:
+                out.append(text)
+        return ''.join(out)
+
+
+@lru_cache(maxsize=1024)
+def parse_locator(target):
+    for prefix, by in LOCATOR_PREFIXES:
+        if target.startswith(prefix):
+            return by, target[len(prefix):]
+    if target.startswith('//'):
+        return By.XPATH, target
+    return By.CSS_SELECTOR, target
+
+
+class CompiledCommand:
+    __slots__ = ('id', 'name', 'target', 'value', 'locator', 'targets', 'test')
+
+    def __init__(self, raw, test):
+        self.id = raw.get('id', '')
+        self.name = raw.get('command', '')
+        self.target = Template(raw.get('target', ''))
+        self.value = Template(raw.get('value', ''))
+        self.test = test
+        # 不含变量的定位器在编译期解析
+        self.locator = parse_locator(self.target.raw) if self.target.static and self.target.raw else None
+        # Selenium IDE 录制的备选定位器: [["css=...", "css:finder"], ...]
+        self.targets = [t[0] for t in raw.get('targets', []) if t and isinstance(t, list) and t[0]]
+
+
+class SidePlan:
+    def __init__(self, path, data):
+        self.path = path
+        self.name = data.get('name', os.path.basename(path))
+        self.url = data.get('url', '')
+        self.commands = []
+        self.unsupported = []
+        self.ignored = []
+        for test in data.get('tests', []):
+            test_name = test.get('name', '')
+            for index, raw in enumerate(test.get('commands', [])):
+                command = CompiledCommand(raw, test_name)
+                if not command.name or command.name.startswith('//'):
+                    continue  # 空命令 / 被注释的命令
+                if command.name in IGNORED_COMMANDS:
+                    self.ignored.append(self._describe(command, index))
+                elif command.name not in SUPPORTED_COMMANDS:
+                    self.unsupported.append(self._describe(command, index))
+                self.commands.append(command)
+
+    @staticmethod
+    def _describe(command, index):
+        return {'test': command.test, 'index': index, 'command': command.name, 'target': command.target.raw}
+
+    def report(self):
+        return {
+            'valid': not self.unsupported,
+            'name': self.name,
+            'url': self.url,
+            'commands': len(self.commands),
+            'unsupported': self.unsupported,
+            'ignored': self.ignored
+        }
+
+
+_plan_cache = {}
+_plan_cache_lock = threading.Lock()
+
+def load_plan(path):
+    """读取编译后的执行计划 (文件未变化时直接命中缓存)"""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = SidePlan(path, json.load(f))
+
+    with _plan_cache_lock:
+        _plan_cache[path] = (key, plan)
+    return plan
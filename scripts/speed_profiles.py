@@ -0,0 +1,50 @@
+"""
+Selenium 执行速度档位
+
+- stealth: 模拟真人节奏 (逐字输入、平滑滚动、命令间随机停顿)，用于有反爬检测的站点
+- normal:  短暂停顿 + 显式等待 (元素可点击 / DOM 就绪 / 网络空闲)
+- fast:    无人为停顿，仅依赖显式等待，适合内部系统
+"""
+
+import os
+import random
+
+
+class SpeedProfile:
+    def __init__(self, name, command_delay, typing_delay, scroll_delay, wait_timeout,
+                 page_ready='complete', network_idle=False, smooth_scroll=False):
+        self.name = name
+        self.command_delay = command_delay    # (min, max) 秒，每条命令前
+        self.typing_delay = typing_delay      # (min, max) 秒，每个字符；None = 一次性输入
+        self.scroll_delay = scroll_delay      # 滚动到元素后的停顿
+        self.wait_timeout = wait_timeout      # 显式等待上限 (元素 / 页面)
+        self.page_ready = page_ready          # 'complete' 或 'interactive' (DOM 就绪即可)
+        self.network_idle = network_idle      # 打开页面后等待网络请求平稳
+        self.smooth_scroll = smooth_scroll
+
+    def command_pause(self):
+        low, high = self.command_delay
+        return random.uniform(low, high) if high > 0 else 0
+
+    def typing_pause(self):
+        return random.uniform(*self.typing_delay) if self.typing_delay else 0
+
+    def describe(self):
+        low, high = self.command_delay
+        typing = f"{self.typing_delay[0]}-{self.typing_delay[1]}s/char" if self.typing_delay else 'instant'
+        extras = ' + network idle' if self.network_idle else ''
+        return (f"{self.name} (command delay {low}-{high}s, typing {typing}, scroll {self.scroll_delay}s, "
+                f"wait ≤{self.wait_timeout}s, page ready={self.page_ready}{extras})")
+
+
+SPEED_PROFILES = {
+    'stealth': SpeedProfile('stealth', (0.5, 2.0), (0.05, 0.15), 0.5, 10, page_ready='complete', smooth_scroll=True),
+    'normal': SpeedProfile('normal', (0.1, 0.3), None, 0.1, 10, page_ready='interactive', network_idle=True),
+    'fast': SpeedProfile('fast', (0, 0), None, 0, 5, page_ready='interactive'),
+}
+
+DEFAULT_SPEED_PROFILE = os.environ.get('SELENIUM_SPEED_PROFILE', 'normal')
+
+
+def get_profile(name=None):
+    return SPEED_PROFILES.get(name or DEFAULT_SPEED_PROFILE) or SPEED_PROFILES['normal']
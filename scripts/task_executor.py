@@ -4,18 +4,12 @@ Selenium IDE 任务执行器 (Chrome Only Edition)
 """
 
 import sys
-import json
 import time
-import random
 import logging
 import os
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
+import threading
+import functools
 from pathlib import Path
-from datetime import datetime
 
 # Selenium Imports
 from selenium import webdriver
@@ -25,11 +19,23 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.support.select import Select
 
 # Driver Manager (Only Chrome)
 from webdriver_manager.chrome import ChromeDriverManager
 
+# 支持直接以 CLI 方式运行 (python scripts/task_executor.py ...)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.driver_pool import ChromeDriverPool
+from scripts.side_compiler import Template, load_plan, parse_locator
+from scripts.locator_cache import get_locator_cache
+from scripts.speed_profiles import get_profile
+from scripts.proc_stats import ProcessTreeSampler, describe_usage
+from scripts.process_runner import RUN_MARKER_ENV
+from scripts.notifier import EmailTransport, TelegramTransport, email_enabled, format_email, format_telegram
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -41,198 +47,380 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 人类化操作配置
-HUMAN_LIKE_DELAYS = {
-    'min_command_delay': 0.5, 'max_command_delay': 2.0,
-    'min_typing_delay': 0.05, 'max_typing_delay': 0.15,
-    'scroll_delay': 0.5, 'click_delay': 0.3
-}
-
-# --- 通知函数保持不变 ---
-def get_email_config():
-    return {
-        'enabled': os.environ.get('ENABLE_EMAIL_NOTIFY', 'false').lower() == 'true',
-        'host': os.environ.get('SMTP_HOST'),
-        'port': int(os.environ.get('SMTP_PORT', 587)),
-        'user': os.environ.get('SMTP_USER'),
-        'password': os.environ.get('SMTP_PASSWORD'),
-        'from_addr': os.environ.get('EMAIL_FROM'),
-        'to_addr': os.environ.get('EMAIL_TO')
-    }
+# 网络空闲判定: 资源请求数在该时间内不再增长
+NETWORK_IDLE_WINDOW = 0.5
 
+# --- 同步通知 (CLI 模式使用；Web 调度走 scripts.notifier 的异步 Outbox) ---
 def send_email_notification(script_name, success, message):
-    config = get_email_config()
-    if not config['enabled'] or not all([config['host'], config['user']]): return
-    
-    status_text = '✅ 执行成功' if success else '❌ 执行失败'
-    subject = f"[{status_text}] 任务通知: {script_name}"
-    public_domain = os.environ.get('APP_PUBLIC_DOMAIN', '').rstrip('/')
-    link_html = f'<p><a href="{public_domain}">View Dashboard</a></p>' if public_domain else ''
-    
-    body = f"<h3>任务报告</h3><p><b>任务:</b> {script_name}</p><p><b>状态:</b> {status_text}</p><p><b>时间:</b> {datetime.now()}</p>{link_html}<hr><pre>{message}</pre>"
-    
-    msg = MIMEMultipart()
-    msg['From'] = config['from_addr'] or config['user']
-    msg['To'] = config['to_addr']
-    msg['Subject'] = Header(subject, 'utf-8')
-    msg.attach(MIMEText(body, 'html', 'utf-8'))
-    
+    if not email_enabled(): return
+    transport = EmailTransport()
     try:
-        server = smtplib.SMTP_SSL(config['host'], config['port']) if config['port'] == 465 else smtplib.SMTP(config['host'], config['port'])
-        if config['port'] != 465: server.starttls()
-        server.login(config['user'], config['password'])
-        server.sendmail(msg['From'], config['to_addr'], msg.as_string())
-        server.quit()
+        transport.send(*format_email(script_name, success, message))
     except Exception as e: logger.error(f"Email fail: {e}")
+    finally: transport.close()
 
 def send_telegram_notification(script_name, success, message, bot_token, chat_id):
     if not bot_token or not chat_id: return
-    status_emoji = '✅' if success else '❌'
-    public_domain = os.environ.get('APP_PUBLIC_DOMAIN', '').rstrip('/')
-    link_text = f"\n<a href='{public_domain}'>Open Dashboard</a>" if public_domain else ""
-    
-    text = f"<b>{status_emoji} 任务通知</b>\n\n<b>任务:</b> {script_name}\n<b>时间:</b> {datetime.now()}{link_text}\n<pre>{message[-2000:] if message else 'No Log'}</pre>"
+    transport = TelegramTransport()
     try:
-        requests.post(f'https://api.telegram.org/bot{bot_token}/sendMessage', data={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}, timeout=10)
+        transport.send(format_telegram(script_name, success, message), bot_token, chat_id)
     except Exception as e: logger.error(f"Telegram fail: {e}")
+    finally: transport.close()
+
+# 无头模式窗口尺寸 (宽,高)
+HEADLESS_WINDOW_SIZE = os.environ.get('CHROME_HEADLESS_WINDOW', '1920,1080')
+
+# --- Chrome 启动 ---
+def create_chrome_driver(headless=False, display_env=None, run_id=None):
+    """
+    display_env: 独立 Xvfb 显示器的 DISPLAY/XAUTHORITY；为空时使用进程环境 (:1)
+    run_id: 写入 chromedriver/Chrome 环境 (AUTOMATION_RUN_ID)，运行结束后残留的进程可被回收；预热池会话不设置
+    """
+    options = Options()
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if headless:
+        # 不依赖 X 显示器 / VNC，固定窗口尺寸保证布局与有头模式一致
+        options.add_argument('--headless=new')
+        options.add_argument(f'--window-size={HEADLESS_WINDOW_SIZE}')
+    else:
+        if display_env is None:
+            os.environ['DISPLAY'] = os.environ.get('DISPLAY', ':1')
+        options.add_argument('--start-maximized')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-infobars')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    options.add_experimental_option('useAutomationExtension', False)
+    # 不等待图片等子资源；页面就绪程度由速度档位的显式等待决定
+    options.page_load_strategy = 'eager'
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    
+    # 优先使用系统预装的 chromedriver，避免每次下载
+    chromedriver_path = '/usr/bin/chromedriver'
+    extra_env = dict(display_env or {})
+    if run_id is not None:
+        extra_env[RUN_MARKER_ENV] = str(run_id)
+    service_env = {**os.environ, **extra_env} if extra_env else None
+    if os.path.exists(chromedriver_path):
+        logger.info(f"Using system chromedriver: {chromedriver_path}")
+        service = Service(chromedriver_path, env=service_env)
+    else:
+        # Fallback: 使用 webdriver-manager，启用本地缓存
+        logger.info("System chromedriver not found, using webdriver-manager...")
+        os.environ['WDM_LOCAL'] = '1'
+        os.environ['WDM_LOG_LEVEL'] = '0'
+        service = Service(ChromeDriverManager().install(), env=service_env)
+    driver = webdriver.Chrome(service=service, options=options)
+    if not headless:
+        driver.maximize_window()
+    
+    apply_page_setup(driver)
+    return driver
+
+def apply_page_setup(driver):
+    """Anti-detection CDP (作用于当前标签页，预热池为每次租借的新标签页重新设置)"""
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+        'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
+    })
+
+# --- Driver 预热池 (CHROME_POOL_SIZE=0 时关闭；有头 / 无头各一个池) ---
+_driver_pools = {}
+_driver_pool_lock = threading.Lock()
+
+def get_driver_pool(headless=False):
+    size = int(os.environ.get('CHROME_POOL_SIZE', '0') or 0)
+    if size <= 0:
+        return None
+    with _driver_pool_lock:
+        pool = _driver_pools.get(headless)
+        if pool is None:
+            pool = ChromeDriverPool(
+                functools.partial(create_chrome_driver, headless=headless),
+                size=size,
+                max_uses=int(os.environ.get('CHROME_POOL_MAX_USES', '20')),
+                max_age=int(os.environ.get('CHROME_POOL_MAX_AGE', '1800')),
+                page_setup=apply_page_setup
+            )
+            pool.start()
+            _driver_pools[headless] = pool
+            logger.info(f"🔥 Chrome driver pool enabled (size={size}, headless={headless})")
+        return pool
+
+def shutdown_driver_pool():
+    with _driver_pool_lock:
+        pools = list(_driver_pools.values())
+        _driver_pools.clear()
+    for pool in pools:
+        pool.shutdown()
 
 # --- 执行器类 ---
 class SeleniumIDEExecutor:
-    def __init__(self, script_path):
+    def __init__(self, script_path, driver_pool=None, output=None, profile=None, locator_cache=None,
+                 headless=False, display_env=None, timeout=None, run_id=None):
         self.script_path = script_path
+        self.driver_pool = driver_pool
+        self.headless = headless
+        self.display_env = display_env
+        self.timeout = timeout        # 整个运行的时限 (秒)，命令之间检查
+        self.deadline = None
+        self.run_id = run_id
+        self.output = output          # 可选: RunOutputBuffer，用于实时输出
+        self.profile = profile or get_profile()
+        self.slept = 0.0              # 人为停顿累计 (秒)
+        self.waited = 0.0             # 显式等待累计 (秒)
+        self.locator_cache = locator_cache or get_locator_cache()
+        self.locator_stats = {'hits': 0, 'misses': 0, 'fallbacks': 0}
+        self.resource_usage = None    # chromedriver 及其 Chrome 进程树的资源用量
         self.driver = None
+        self._lease = None
+        self._sampler = None
         self.variables = {}
         self.base_url = ''
+        self.plan = None
+        # 命令分发表 (命令名 -> 处理函数)
+        self.handlers = {
+            'open': self.cmd_open,
+            'click': self.cmd_click,
+            'type': self.cmd_type,
+            'sendKeys': self.cmd_send_keys,
+            'select': self.cmd_select,
+            'pause': self.cmd_pause,
+            'store': self.cmd_store,
+            'storeText': self.cmd_store_text,
+            'executeScript': self.cmd_execute_script,
+        }
         
     def setup_driver(self):
         try:
-            os.environ['DISPLAY'] = os.environ.get('DISPLAY', ':1')
-            options = Options()
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--start-maximized')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--disable-infobars')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_experimental_option('excludeSwitches', ['enable-automation'])
-            options.add_experimental_option('useAutomationExtension', False)
-            options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # 优先使用系统预装的 chromedriver，避免每次下载
-            chromedriver_path = '/usr/bin/chromedriver'
-            if os.path.exists(chromedriver_path):
-                logger.info(f"Using system chromedriver: {chromedriver_path}")
-                service = Service(chromedriver_path)
+            if self.driver_pool:
+                self._lease = self.driver_pool.lease()
+                self.driver = self._lease.driver
             else:
-                # Fallback: 使用 webdriver-manager，启用本地缓存
-                logger.info("System chromedriver not found, using webdriver-manager...")
-                os.environ['WDM_LOCAL'] = '1'
-                os.environ['WDM_LOG_LEVEL'] = '0'
-                service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=options)
-            self.driver.maximize_window()
-            self.driver.implicitly_wait(10)
-            
-            # Anti-detection CDP
-            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
-            })
+                self.driver = create_chrome_driver(headless=self.headless, display_env=self.display_env, run_id=self.run_id)
+            # 只用显式等待，避免失效定位器每次都耗满隐式等待
+            self.driver.implicitly_wait(0)
             return True
         except Exception as e:
             logger.error(f"Chrome Init Failed: {e}")
             return False
     
+    def start_sampler(self):
+        """采样 chromedriver 进程树 (复用的预热会话只统计本次增量)"""
+        try:
+            return ProcessTreeSampler(self.driver.service.process.pid).start()
+        except Exception as e:
+            logger.debug(f"Resource sampling unavailable: {e}")
+            return None
+
+    def teardown_driver(self, broken=False):
+        if self._lease:
+            self.driver_pool.release(self._lease, broken=broken)
+            self._lease = None
+        elif self.driver:
+            self.driver.quit()
+        self.driver = None
+    
     def load_script(self):
         try:
-            with open(self.script_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.base_url = data.get('url', '')
-            return data
+            self.plan = load_plan(self.script_path)
+            self.base_url = self.plan.url
+            return self.plan
         except Exception as e:
+            self.log(f"Load script failed: {e}", logging.ERROR)
             return None
     
+    def log(self, message, level=logging.INFO):
+        logger.log(level, message)
+        if self.output is not None:
+            self.output.write(message)
+    
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.slept += seconds
+
     def human_delay(self):
-        time.sleep(random.uniform(HUMAN_LIKE_DELAYS['min_command_delay'], HUMAN_LIKE_DELAYS['max_command_delay']))
+        self.sleep(self.profile.command_pause())
+
+    def wait_until(self, condition, timeout=None):
+        started = time.monotonic()
+        try:
+            timeout = timeout or self.profile.wait_timeout
+            if self.deadline is not None:
+                # 不超出整个运行的剩余时间
+                timeout = max(min(timeout, self.deadline - time.monotonic()), 0.1)
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(condition)
+        finally:
+            self.waited += time.monotonic() - started
+
+    def wait_page_ready(self):
+        ready_states = ('complete',) if self.profile.page_ready == 'complete' else ('interactive', 'complete')
+        self.wait_until(lambda d: d.execute_script('return document.readyState') in ready_states)
+        if self.profile.network_idle:
+            self.wait_network_idle()
+
+    def wait_network_idle(self):
+        """资源请求数在 NETWORK_IDLE_WINDOW 内不再变化即视为空闲；超时不算失败"""
+        state = {'count': -1, 'since': time.monotonic()}
+        def idle(driver):
+            count = driver.execute_script("return performance.getEntriesByType('resource').length")
+            now = time.monotonic()
+            if count != state['count']:
+                state.update(count=count, since=now)
+                return False
+            return now - state['since'] >= NETWORK_IDLE_WINDOW
+        try:
+            self.wait_until(idle)
+        except TimeoutException:
+            self.log("Network did not go idle, continuing", logging.WARNING)
     
     def execute_command(self, command):
-        cmd = command.get('command', '')
-        target = self.replace_variables(command.get('target', ''))
-        value = self.replace_variables(command.get('value', ''))
-        
+        cmd = command.name
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            self.log(f"Skip unsupported command: {cmd}", logging.WARNING)
+            return True
+
+        target = command.target.render(self.variables)
+        value = command.value.render(self.variables)
         try:
             self.human_delay()
-            logger.info(f"CMD: {cmd} | {target} | {value}")
-            
-            if cmd == 'open':
-                url = target if target.startswith('http') else (self.base_url.rstrip('/') + target)
-                self.driver.get(url)
-            elif cmd == 'click':
-                el = self.find_element(target)
-                self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", el)
-                time.sleep(HUMAN_LIKE_DELAYS['scroll_delay'])
-                ActionChains(self.driver).move_to_element(el).pause(0.2).click().perform()
-            elif cmd == 'type':
-                el = self.find_element(target)
-                el.clear()
-                for char in value:
-                    el.send_keys(char)
-                    time.sleep(random.uniform(0.05, 0.15))
-            elif cmd == 'sendKeys':
-                el = self.find_element(target)
-                el.send_keys(Keys.ENTER if value == '${KEY_ENTER}' else value)
-            elif cmd == 'select':
-                from selenium.webdriver.support.select import Select
-                select = Select(self.find_element(target))
-                if value.startswith('label='): select.select_by_visible_text(value[6:])
-                elif value.startswith('value='): select.select_by_value(value[6:])
-                else: select.select_by_visible_text(value)
-            elif cmd == 'pause':
-                time.sleep(int(value) / 1000)
-            elif cmd == 'store':
-                self.variables[value] = target
-            elif cmd == 'storeText':
-                self.variables[value] = self.find_element(target).text
-            elif cmd == 'executeScript':
-                self.driver.execute_script(target)
-            
+            self.log(f"CMD: {cmd} | {target} | {value}")
+            handler(command, target, value)
             return True
         except Exception as e:
-            logger.error(f"Exec Fail: {cmd} - {e}")
+            self.log(f"Exec Fail: {cmd} - {e}", logging.ERROR)
             return False
+
+    # --- 命令实现 ---
+    def cmd_open(self, command, target, value):
+        url = target if target.startswith('http') else (self.base_url.rstrip('/') + target)
+        self.driver.get(url)
+        self.wait_page_ready()
+
+    def cmd_click(self, command, target, value):
+        el = self.find_element(command, target, clickable=True)
+        behavior = 'smooth' if self.profile.smooth_scroll else 'instant'
+        self.driver.execute_script(f"arguments[0].scrollIntoView({{behavior: '{behavior}', block: 'center'}});", el)
+        self.sleep(self.profile.scroll_delay)
+        actions = ActionChains(self.driver).move_to_element(el)
+        if self.profile.smooth_scroll:
+            actions = actions.pause(0.2)
+            self.slept += 0.2
+        actions.click().perform()
+
+    def cmd_type(self, command, target, value):
+        el = self.find_element(command, target)
+        el.clear()
+        if not self.profile.typing_delay:
+            el.send_keys(value)
+            return
+        for char in value:
+            el.send_keys(char)
+            self.sleep(self.profile.typing_pause())
+
+    def cmd_send_keys(self, command, target, value):
+        el = self.find_element(command, target)
+        el.send_keys(Keys.ENTER if command.value.raw == '${KEY_ENTER}' else value)
+
+    def cmd_select(self, command, target, value):
+        select = Select(self.find_element(command, target))
+        if value.startswith('label='): select.select_by_visible_text(value[6:])
+        elif value.startswith('value='): select.select_by_value(value[6:])
+        else: select.select_by_visible_text(value)
+
+    def cmd_pause(self, command, target, value):
+        # 脚本中显式写的 pause 属于业务需要，所有档位都保留
+        self.sleep(int(value) / 1000)
+
+    def cmd_store(self, command, target, value):
+        self.variables[value] = target
+
+    def cmd_store_text(self, command, target, value):
+        self.variables[value] = self.find_element(command, target).text
+
+    def cmd_execute_script(self, command, target, value):
+        self.driver.execute_script(target)
     
-    def find_element(self, target):
-        if target.startswith('id='): by, val = By.ID, target[3:]
-        elif target.startswith('name='): by, val = By.NAME, target[5:]
-        elif target.startswith('css='): by, val = By.CSS_SELECTOR, target[4:]
-        elif target.startswith('xpath='): by, val = By.XPATH, target[6:]
-        elif target.startswith('//'): by, val = By.XPATH, target
-        else: by, val = By.CSS_SELECTOR, target
-        return self.driver.find_element(by, val)
-    
-    def replace_variables(self, text):
-        for k, v in self.variables.items():
-            text = text.replace(f'${{{k}}}', str(v))
-        return text
+    def find_element(self, command, target, clickable=False):
+        if not command.targets:
+            # 无备选定位器；无变量的定位器已在编译期解析
+            locator = command.locator or parse_locator(target)
+            condition = EC.element_to_be_clickable(locator) if clickable else EC.presence_of_element_located(locator)
+            return self.wait_until(condition)
+
+        # 候选顺序: 上次成功的定位器 -> target -> targets 备选
+        cache_key = self.locator_cache.key(self.script_path, command)
+        cached = self.locator_cache.get(cache_key)
+        candidates = list(dict.fromkeys(c for c in (cached, command.target.raw, *command.targets) if c))
+        resolved = [(raw, self.resolve_locator(raw)) for raw in candidates]
+
+        def first_match(driver):
+            # 隐式等待为 0，每轮轮询对所有候选各做一次即时查找
+            for raw, (by, val) in resolved:
+                for el in driver.find_elements(by, val):
+                    if not clickable or (el.is_displayed() and el.is_enabled()):
+                        return raw, el
+            return False
+
+        try:
+            winner, el = self.wait_until(first_match)
+        except TimeoutException:
+            self.locator_stats['misses'] += 1
+            if cached:
+                self.locator_cache.forget(cache_key)
+            raise TimeoutException(f"No locator matched: {', '.join(candidates)}")
+
+        self.locator_stats['hits' if winner == cached else 'misses'] += 1
+        if winner != command.target.raw:
+            self.locator_stats['fallbacks'] += 1
+            self.log(f"🎯 Fallback locator used: {winner}")
+        self.locator_cache.remember(cache_key, winner)
+        return el
+
+    def resolve_locator(self, raw):
+        return parse_locator(Template(raw).render(self.variables) if '${' in raw else raw)
     
     def execute(self):
+        broken = False
+        started = time.monotonic()
+        if self.timeout:
+            self.deadline = started + self.timeout
         try:
-            data = self.load_script()
-            if not data: return False, "Load script failed"
+            plan = self.load_script()
+            if not plan: return False, "Load script failed"
             if not self.setup_driver(): return False, "Driver init failed"
+            self._sampler = self.start_sampler()
+            self.log(f"⚙️ Speed profile: {self.profile.describe()}")
             
-            for test in data.get('tests', []):
-                for cmd in test.get('commands', []):
-                    if not self.execute_command(cmd): return False, f"Failed at {cmd.get('command')}"
+            for command in plan.commands:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    self.log(f"⏱ Timeout: stopped after {int(time.monotonic() - started)}s")
+                    return False, f"Timeout after {self.timeout}s"
+                if not self.execute_command(command): return False, f"Failed at {command.name}"
             
             return True, "Finished"
         except Exception as e:
+            broken = True
             return False, str(e)
         finally:
-            if self.driver: self.driver.quit()
+            if self.driver:
+                self.log(f"⏱ {self.profile.name}: slept {self.slept:.1f}s, waited {self.waited:.1f}s, "
+                         f"total {time.monotonic() - started:.1f}s")
+                stats = self.locator_stats
+                if any(stats.values()):
+                    self.log(f"🎯 Locators: {stats['hits']} cache hits, {stats['misses']} misses, {stats['fallbacks']} fallbacks")
+                if self._sampler is not None:
+                    self.resource_usage = self._sampler.stop()
+                    self._sampler = None
+                    self.log(describe_usage(self.resource_usage))
+                self.locator_cache.flush()
+                self.teardown_driver(broken=broken)
 
 if __name__ == '__main__':
     if len(sys.argv) < 2: sys.exit(1)
-    executor = SeleniumIDEExecutor(sys.argv[1])
+    executor = SeleniumIDEExecutor(sys.argv[1], headless=os.environ.get('AUTOMATION_HEADLESS') == '1')
     success, msg = executor.execute()
     
     # 获取 Telegram 配置 (优先使用命令行参数，否则读取环境变量)
@@ -0,0 +1,188 @@
+"""
+资源感知的任务队列
+
+任务按资源类别 (display / browser / light) 分别限制并发：
+- display: 抢占 X 显示器的 GUI 脚本 / AutoKey
+- browser: 启动 Chrome 的 Selenium / Playwright 任务 (内存大户)
+- light:   普通轻量脚本
+队列按优先级出队，同时遵守单任务并发上限，并对排队中的重复触发去重。
+可选的准入控制 (admission) 在内存紧张时推迟指定类别的任务，其他任务不受影响。
+"""
+
+import time
+import logging
+import itertools
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_CLASSES = ('display', 'browser', 'light')
+
+
+class QueuedRun:
+    """队列中的一次运行请求"""
+
+    def __init__(self, task_id, trigger, resource_class, priority=0, max_concurrency=1, nice=None):
+        self.task_id = task_id
+        self.trigger = trigger
+        self.resource_class = resource_class
+        self.priority = priority
+        self.max_concurrency = max(1, max_concurrency or 1)
+        self.nice = nice
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.deferred_since = None      # 首次被准入控制推迟的时间
+        self.defer_reason = None
+
+    @property
+    def wait_seconds(self):
+        return (self.started_at or time.time()) - self.enqueued_at
+
+    @property
+    def deferred_seconds(self):
+        if self.deferred_since is None:
+            return 0.0
+        return (self.started_at or time.time()) - self.deferred_since
+
+    def to_dict(self):
+        return {
+            'task_id': self.task_id,
+            'trigger': self.trigger,
+            'resource_class': self.resource_class,
+            'priority': self.priority,
+            'waited': round(self.wait_seconds, 1),
+            'deferred': self.defer_reason
+        }
+
+
+class ResourceQueue:
+    def __init__(self, runner, limits, admission=None):
+        self.runner = runner
+        self.admission = admission         # 可选: MemoryAdmission
+        self.limits = {cls: max(1, int(limits.get(cls, 1))) for cls in RESOURCE_CLASSES}
+
+        self._waiting = []
+        self._seq = itertools.count()
+        self._running = Counter()          # resource_class -> 运行数
+        self._running_tasks = Counter()    # task_id -> 运行数
+        self._recent_waits = deque(maxlen=100)
+        self._closed = False
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=sum(self.limits.values()), thread_name_prefix='task-run')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='task-queue-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, item):
+        """入队；同一任务已在排队时返回 False (去重)"""
+        if item.resource_class not in self.limits:
+            item.resource_class = 'light'
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Task queue is shut down')
+            if any(queued.task_id == item.task_id for _, _, queued in self._waiting):
+                logger.info(f"⏭️ Task {item.task_id} already queued, skipping duplicate ({item.trigger})")
+                return False
+            self._waiting.append((-item.priority, next(self._seq), item))
+            self._waiting.sort(key=lambda entry: entry[:2])
+            self._cond.notify_all()
+        return True
+
+    def stats(self):
+        with self._cond:
+            now = time.time()
+            waiting = [entry[2] for entry in self._waiting]
+            return {
+                'depth': len(waiting),
+                'classes': {
+                    cls: {
+                        'limit': self.limits[cls],
+                        'running': self._running[cls],
+                        'queued': sum(1 for item in waiting if item.resource_class == cls)
+                    } for cls in RESOURCE_CLASSES
+                },
+                'oldest_wait': round(max((now - item.enqueued_at for item in waiting), default=0), 1),
+                'avg_wait': round(sum(self._recent_waits) / len(self._recent_waits), 1) if self._recent_waits else 0,
+                'queued': [item.to_dict() for item in waiting],
+                'admission': self.admission.stats() if self.admission else None
+            }
+
+    def alive(self):
+        """调度循环线程是否在运行 (已关闭的队列视为正常)"""
+        return self._closed or self._dispatcher.is_alive()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._closed = True
+            dropped = len(self._waiting)
+            self._waiting = []
+            self._cond.notify_all()
+        if dropped:
+            logger.warning(f"Task queue shut down with {dropped} queued runs dropped")
+        self._pool.shutdown(wait=wait)
+
+    # --- 内部实现 ---
+    def _eligible(self, item):
+        return self._running[item.resource_class] < self.limits[item.resource_class] and \
+            self._running_tasks[item.task_id] < item.max_concurrency
+
+    def _take_next(self):
+        for index, (_, _, item) in enumerate(self._waiting):
+            if not self._eligible(item):
+                continue
+            if self.admission is not None:
+                reason = self.admission.check(item)
+                if reason is not None:
+                    # 内存不足：留在队列中，调度循环每秒重新检查
+                    self.admission.defer(item, reason)
+                    continue
+            del self._waiting[index]
+            return item
+        return None
+
+    def _dispatch_loop(self):
+        errors = 0
+        while True:
+            try:
+                self._dispatch_once()
+                errors = 0
+            except Exception as e:
+                # 调度循环只有一个线程，异常不能让它退出，否则之后提交的运行都会永远排队
+                errors += 1
+                delay = min(2 ** errors, 30)
+                logger.exception(f"❌ Task queue dispatch error, retrying in {delay}s: {e}")
+                time.sleep(delay)
+            if self._closed:
+                return
+
+    def _dispatch_once(self):
+        with self._cond:
+            if self._closed:
+                return
+            item = self._take_next()
+            if item is None:
+                self._cond.wait(timeout=1.0)
+                return
+            item.started_at = time.time()
+            self._running[item.resource_class] += 1
+            self._running_tasks[item.task_id] += 1
+            self._recent_waits.append(item.wait_seconds)
+        try:
+            self._pool.submit(self._run, item)
+        except Exception:
+            with self._cond:
+                self._running[item.resource_class] -= 1
+                self._running_tasks[item.task_id] -= 1
+            raise
+
+    def _run(self, item):
+        try:
+            self.runner(item)
+        except Exception as e:
+            logger.error(f"Queued run for task {item.task_id} crashed: {e}")
+        finally:
+            with self._cond:
+                self._running[item.resource_class] -= 1
+                self._running_tasks[item.task_id] -= 1
+                self._cond.notify_all()
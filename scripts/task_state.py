@@ -0,0 +1,97 @@
+"""
+任务运行状态的写回缓存 (write-behind)
+
+执行线程在运行开始 / 结束时只更新内存 (last_run / last_status)，立即返回；
+后台线程每隔 interval 秒把变化的任务合并到一个事务中写回数据库，
+避免每次运行都单独提交与看板读取争抢 SQLite 锁。看板与 /api/tasks 直接读取内存中的最新状态。
+写回失败的变更会保留到下一轮重试，stop() 时保证最后一次写回。
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStateCache:
+    def __init__(self, writer, interval=2.0):
+        self.writer = writer          # writer({task_id: {字段: 值}})，在一个事务内写回
+        self.interval = interval
+        self._states = {}             # task_id -> 最新状态 (含已写回的)
+        self._dirty = {}              # task_id -> 尚未写回的字段
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_at = None
+
+    def update(self, task_id, **fields):
+        with self._lock:
+            self._states.setdefault(task_id, {}).update(fields)
+            self._dirty.setdefault(task_id, {}).update(fields)
+
+    def get(self, task_id):
+        with self._lock:
+            state = self._states.get(task_id)
+            return dict(state) if state else None
+
+    def snapshot(self):
+        with self._lock:
+            return {task_id: dict(state) for task_id, state in self._states.items()}
+
+    def forget(self, task_id):
+        """任务被删除时丢弃其状态与未写回的变更"""
+        with self._lock:
+            self._states.pop(task_id, None)
+            self._dirty.pop(task_id, None)
+
+    def flush(self):
+        """写回所有未写回的变更；失败时放回队列 (不覆盖期间更新的字段)"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return 0
+            try:
+                self.writer(pending)
+            except Exception as e:
+                with self._lock:
+                    for task_id, fields in pending.items():
+                        if task_id in self._states:
+                            self._dirty[task_id] = {**fields, **self._dirty.get(task_id, {})}
+                    self.failures += 1
+                logger.warning(f"⚠️ Task state flush failed ({len(pending)} tasks), will retry: {e}")
+                return 0
+            self.flushes += 1
+            self.last_flush_at = time.time()
+            return len(pending)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='task-state-flush', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=15)
+            self._thread = None
+        # 最后一次写回 (运行中的任务已结束时调用)
+        self.flush()
+        with self._lock:
+            if self._dirty:
+                logger.error(f"❌ {len(self._dirty)} task states could not be written on shutdown")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+        return {'pending': pending, 'flushes': self.flushes, 'failures': self.failures,
+                'last_flush_at': self.last_flush_at}
@@ -0,0 +1,69 @@
+"""
+数据版本监视 (长轮询)
+
+看板通过 /api/tasks?since=<version>&wait=N 等待变化。同一进程内的所有等待请求共享一个监视线程：
+只在有等待者时每 interval 秒读取一次全局版本号 (一条单行查询)，与打开的看板数量无关；
+本进程内的提交通过 notify() 立即唤醒。等待者数量有上限，避免占满 Web Worker 线程。
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class VersionWatcher:
+    def __init__(self, reader, interval=1.0, max_waiters=4):
+        self.reader = reader            # reader() -> 当前版本号
+        self.interval = interval
+        self.max_waiters = max_waiters
+        self._cond = threading.Condition()
+        self._version = None
+        self._waiters = 0
+        self._thread = None
+
+    def notify(self, version):
+        with self._cond:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._cond.notify_all()
+
+    def wait(self, since, timeout):
+        """
+        等待版本号超过 since：返回 True (有变化) / False (超时)；
+        等待者已满时立即返回 None，由客户端稍后重试
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._waiters >= self.max_waiters:
+                return None
+            self._waiters += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='version-watch', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            try:
+                while self._version is None or self._version <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._waiters -= 1
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._waiters == 0:
+                    self._cond.wait()
+            try:
+                self.notify(self.reader())
+            except Exception as e:
+                logger.debug(f"Version poll failed: {e}")
+            time.sleep(self.interval)
+
+    def stats(self):
+        with self._cond:
+            return {'waiters': self._waiters, 'version': self._version}
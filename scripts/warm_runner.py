@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+预热的 Python 脚本运行器 (forkserver)
+
+常驻进程启动时预先导入常用模块 (selenium / playwright / requests ...)，
+每次运行 fork 一个子进程执行脚本，省去解释器启动与导入的 1~2 秒。
+子进程拥有独立的会话/进程组、环境变量、工作目录与 argv，输出经由
+SCM_RIGHTS 传过来的管道直接写回执行器，超时/清理与普通运行一致 (见 process_runner.supervise)。
+
+服务端保持单线程 (fork 前不能有其他线程持有锁)，用 select 循环接收请求并回收子进程。
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import socket
+import logging
+import resource
+import selectors
+import importlib
+import threading
+from types import SimpleNamespace
+
+# 支持直接以脚本方式运行 (python3 /app/scripts/warm_runner.py)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.process_runner import supervise
+
+logger = logging.getLogger(__name__)
+
+WARM_RUNNER_SOCKET = os.environ.get('WARM_RUNNER_SOCKET', '/tmp/automation-warm.sock')
+WARM_PRELOAD = os.environ.get('WARM_PRELOAD', 'requests,selenium.webdriver,playwright.sync_api')
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class WarmRunnerUnavailable(Exception):
+    """预热运行器未启动或无响应，调用方退回普通子进程"""
+
+
+# --- 客户端 (执行器侧) ---
+def warm_runner_available():
+    return os.path.exists(WARM_RUNNER_SOCKET)
+
+
+def run_warm(script_path, env=None, timeout=300, buffer=None, cwd=None, nice=None, usage=None, memory_limit_mb=None):
+    """与 run_streamed 相同的语义，由预热进程 fork 执行 script_path"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(5)
+    try:
+        sock.connect(WARM_RUNNER_SOCKET)
+    except OSError as e:
+        sock.close()
+        raise WarmRunnerUnavailable(f'Warm runner unavailable: {e}')
+
+    read_fd, write_fd = os.pipe()
+    try:
+        request = {
+            'script': script_path,
+            'argv': [script_path],
+            'cwd': cwd or os.path.dirname(os.path.abspath(script_path)),
+            'env': dict(env if env is not None else os.environ),
+            'nice': nice or 0,
+            'memory_limit_mb': memory_limit_mb or 0
+        }
+        socket.send_fds(sock, [json.dumps(request).encode('utf-8') + b'\n'], [write_fd])
+        os.close(write_fd)
+        write_fd = None
+        reader = sock.makefile('rb')
+        reply = json.loads(reader.readline() or b'{}')
+        if 'pid' not in reply:
+            raise WarmRunnerUnavailable(reply.get('error', 'Warm runner closed the connection'))
+    except (OSError, ValueError) as e:
+        sock.close()
+        os.close(read_fd)
+        raise WarmRunnerUnavailable(f'Warm runner request failed: {e}')
+    finally:
+        if write_fd is not None:
+            os.close(write_fd)
+
+    def _wait():
+        # 子进程由预热进程回收，退出码与 rusage 通过同一连接回传
+        sock.settimeout(None)
+        try:
+            result = json.loads(reader.readline() or b'{}')
+        except (OSError, ValueError):
+            result = {}
+        finally:
+            reader.close()
+            sock.close()
+        if 'exit' not in result:
+            buffer.write('⚠️ Warm runner connection lost, exit status unknown')
+            return -1, None
+        return result['exit'], SimpleNamespace(ru_utime=result.get('ru_utime', 0), ru_stime=result.get('ru_stime', 0))
+
+    stream = os.fdopen(read_fd, 'r', encoding='utf-8', errors='replace')
+    return supervise(reply['pid'], stream, _wait, buffer, timeout=timeout, usage=usage)
+
+
+# --- 服务端 ---
+def preload(modules):
+    started = time.monotonic()
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception as e:
+            logger.warning(f"Preload of {name} failed: {e}")
+    logger.info(f"🔥 Preloaded {', '.join(loaded) or 'nothing'} in {time.monotonic() - started:.1f}s")
+
+
+def _read_request(conn):
+    conn.settimeout(5)
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 1)
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(65536)
+        if not chunk or len(data) > MAX_REQUEST_BYTES:
+            for fd in fds:
+                os.close(fd)
+            raise ValueError('Incomplete request')
+        data += chunk
+    if len(fds) != 1:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError('Expected exactly one output fd')
+    return json.loads(data), fds[0]
+
+
+def _child_main(request, output_fd):
+    """fork 出的子进程：建立独立环境后以 __main__ 身份执行脚本，不返回"""
+    code = 1
+    try:
+        os.setsid()
+        for sig in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT, signal.SIGPIPE):
+            signal.signal(sig, signal.SIG_DFL)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(output_fd, 1)
+        os.dup2(output_fd, 2)
+        os.close(devnull)
+        os.close(output_fd)
+        # 逐行写出，等效 PYTHONUNBUFFERED
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', encoding='utf-8', errors='replace', buffering=1, closefd=False)
+        sys.stderr = open(2, 'w', encoding='utf-8', errors='replace', buffering=1, closefd=False)
+
+        os.environ.clear()
+        os.environ.update(request['env'])
+        os.chdir(request['cwd'])
+        if request.get('nice'):
+            os.nice(int(request['nice']))
+        if request.get('memory_limit_mb'):
+            limit = int(request['memory_limit_mb']) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+        script = request['script']
+        sys.argv = list(request['argv'])
+        sys.path[0:0] = [os.path.dirname(os.path.abspath(script))]
+        import runpy
+        runpy.run_path(script, run_name='__main__')
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            import atexit
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF)
+
+
+def serve(path=WARM_RUNNER_SOCKET, modules=None):
+    preload(modules if modules is not None else [m.strip() for m in WARM_PRELOAD.split(',') if m.strip()])
+    if threading.active_count() > 1:
+        logger.warning("Preloaded modules started threads; forked children only keep the main thread")
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o600)
+    server.listen(16)
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    children = {}       # pid -> 等待退出结果的连接
+
+    # SIGCHLD / SIGTERM 通过 wakeup fd 立即唤醒 select，子进程退出后马上回传结果
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    logger.info(f"🔥 Warm runner listening on {path}")
+
+    try:
+        while not stopping:
+            selector.select(timeout=5)
+            try:
+                while os.read(wakeup_r, 512):
+                    pass
+            except BlockingIOError:
+                pass
+            # 接收新请求
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except (BlockingIOError, InterruptedError):
+                    break
+                conn.setblocking(True)
+                try:
+                    request, output_fd = _read_request(conn)
+                except Exception as e:
+                    logger.warning(f"Bad warm run request: {e}")
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    signal.set_wakeup_fd(-1)
+                    os.close(wakeup_r)
+                    os.close(wakeup_w)
+                    selector.close()
+                    server.close()
+                    conn.close()
+                    for other in children.values():
+                        other.close()
+                    _child_main(request, output_fd)
+                os.close(output_fd)
+                children[pid] = conn
+                try:
+                    conn.sendall(json.dumps({'pid': pid}).encode('utf-8') + b'\n')
+                except OSError:
+                    pass
+                logger.info(f"▶️ Forked {pid} for {request['script']}")
+
+            # 回收退出的子进程并回传结果
+            while children:
+                try:
+                    pid, status, rusage = os.wait4(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                conn = children.pop(pid, None)
+                if conn is None:
+                    continue
+                result = {'exit': os.waitstatus_to_exitcode(status),
+                          'ru_utime': rusage.ru_utime, 'ru_stime': rusage.ru_stime}
+                try:
+                    conn.sendall(json.dumps(result).encode('utf-8') + b'\n')
+                except OSError as e:
+                    if e.errno not in (errno.EPIPE, errno.ECONNRESET):
+                        logger.warning(f"Could not report exit of {pid}: {e}")
+                finally:
+                    conn.close()
+    finally:
+        server.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        logger.info("👋 Warm runner stopped")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if os.environ.get('WARM_RUNNER_ENABLED', 'false').lower() != 'true':
+        # 未启用时直接退出 (supervisor 视为正常退出，不重启)
+        print("Warm runner disabled (WARM_RUNNER_ENABLED != true)")
+        sys.exit(0)
+    serve()
@@ -1,27 +1,53 @@
 import os
 import sys
 import json
+import base64
+import hashlib
 import logging
+import socket
 import subprocess
 import time
+import threading
+import atexit
 from datetime import datetime, timedelta
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 # 引入 pytz 处理时区
 import pytz
 
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, flash, send_from_directory, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text, inspect
+from sqlalchemy import text, inspect, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_MISSED
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
 # 确保脚本目录在路径中
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from scripts.process_runner import RunOutputBuffer, run_streamed, reap_orphans, RUN_MARKER_ENV
+from scripts.warm_runner import run_warm, warm_runner_available, WarmRunnerUnavailable
+from scripts.proc_stats import describe_usage
+from scripts.metrics import REGISTRY, merge as merge_metrics, render as render_metrics
+from scripts.task_queue import ResourceQueue, QueuedRun, RESOURCE_CLASSES
+from scripts.admission import admission_from_env
+from scripts.task_state import TaskStateCache
+from scripts.version_watch import VersionWatcher
+from scripts.notifier import notify, get_dispatcher
+from scripts.side_compiler import load_plan
+from scripts.speed_profiles import SPEED_PROFILES, get_profile
+from scripts.script_index import get_script_index
+from scripts.display_pool import get_display_pool
+from scripts.autokey_client import AutoKeyUnavailable, get_autokey_client
+from scripts.autokey_runner import RUNNER_NAME as AUTOKEY_RUNNER_NAME, get_autokey_tailer, install_runner, \
+    ensure_request_dir as ensure_autokey_request_dir
+import executor_ipc
+import db_profiles
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-this')
@@ -52,12 +78,23 @@ def get_database_uri():
 
 app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 按后端区分: SQLite WAL + busy_timeout，MariaDB 连接池 + pre_ping / recycle (见 db_profiles)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_profiles.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 db = SQLAlchemy(app)
+with app.app_context():
+    db_profiles.configure_engine(db.engine)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# --- 进程角色 ---
+# all:       单进程模式 (Web + 调度 + 执行，默认，兼容旧部署)
+# web:       仅 Web 层，调度/执行请求通过 IPC 转发给守护进程
+# scheduler: 调度/执行守护进程 (scheduler_daemon.py)
+APP_ROLE = os.environ.get('AUTOMATION_ROLE', 'all')
+RUNS_EXECUTOR = APP_ROLE in ('all', 'scheduler')
+
 # --- 调度器配置 ---
 SYSTEM_TZ_STR = os.environ.get('TZ', 'Asia/Shanghai')
 SYSTEM_TZ = pytz.timezone(SYSTEM_TZ_STR)
@@ -67,10 +104,91 @@ job_defaults = {
     'coalesce': True,
     'max_instances': 3
 }
-scheduler = BackgroundScheduler(timezone=SYSTEM_TZ, job_defaults=job_defaults)
-scheduler.start()
 
-task_executor_pool = ThreadPoolExecutor(max_workers=5)
+# 定时 (后台) 运行的默认 nice 值，手动运行不降级
+BACKGROUND_NICE = int(os.environ.get('BACKGROUND_NICE', '10'))
+
+# 显示器池 (DISPLAY_POOL_SIZE > 0) 下租用独立显示器的最长等待；
+# 仍在 VNC 桌面 :1 上运行的 GUI 任务 (AutoKey / 实时观看) 通过 SHARED_DESKTOP_LOCK 串行
+DISPLAY_LEASE_TIMEOUT = int(os.environ.get('DISPLAY_LEASE_TIMEOUT', '60'))
+SHARED_DESKTOP_LOCK = threading.Lock()
+# 等待共享桌面的上限 (秒)，避免一个卡住的 GUI 运行阻塞之后所有 display 类任务
+SHARED_DESKTOP_TIMEOUT = int(os.environ.get('SHARED_DESKTOP_TIMEOUT', '600'))
+
+# AutoKey 包装脚本开始执行 (BEGIN 标记出现) 与整体运行的最长等待
+AUTOKEY_START_TIMEOUT = int(os.environ.get('AUTOKEY_START_TIMEOUT', '15'))
+AUTOKEY_RUN_TIMEOUT = int(os.environ.get('AUTOKEY_RUN_TIMEOUT', '300'))
+
+# 任务未单独设置时限时的默认值 (Python / Selenium)
+MAX_SCRIPT_TIMEOUT = int(os.environ.get('MAX_SCRIPT_TIMEOUT', '300'))
+# 脚本进程的 RLIMIT_AS (MB)，0 = 不限制；Chrome 会预留大量虚拟地址空间，需留足余量
+SCRIPT_MEMORY_LIMIT_MB = int(os.environ.get('SCRIPT_MEMORY_LIMIT_MB', '0'))
+# 孤儿 chrome / chromedriver 回收间隔 (秒)，0 = 关闭
+ORPHAN_REAPER_INTERVAL = int(os.environ.get('ORPHAN_REAPER_INTERVAL', '300'))
+# .side 回放引擎：selenium (chromedriver) 或 playwright (共享浏览器 + 每次运行独立 context)
+SIDE_ENGINES = ('selenium', 'playwright')
+SIDE_ENGINE = os.environ.get('SIDE_ENGINE', 'selenium')
+
+scheduler = None
+task_queue = None
+if RUNS_EXECUTOR:
+    # 持久化 Job Store：进程重启后任务不丢失，错过的触发按 misfire_grace_time 补跑
+    jobstores = {}
+    if os.environ.get('SCHEDULER_JOBSTORE', 'sqlalchemy') == 'sqlalchemy':
+        with app.app_context():
+            jobstores['default'] = SQLAlchemyJobStore(engine=db.engine, tablename='apscheduler_jobs')
+    scheduler = BackgroundScheduler(timezone=SYSTEM_TZ, job_defaults=job_defaults, jobstores=jobstores)
+    scheduler.start()
+
+    # 各资源类别的并发上限：单个 X 显示器、1GB 内存下的 Chrome 数量
+    task_queue = ResourceQueue(
+        runner=lambda item: run_task_with_context(app, item.task_id, item.trigger, item),
+        limits={
+            'display': int(os.environ.get('QUEUE_LIMIT_DISPLAY', '1')),
+            'browser': int(os.environ.get('QUEUE_LIMIT_BROWSER', '1')),
+            'light': int(os.environ.get('QUEUE_LIMIT_LIGHT', '3'))
+        },
+        # 内存不足时推迟浏览器任务 (ADMISSION_MIN_AVAILABLE_MB=0 关闭)
+        admission=admission_from_env()
+    )
+
+# --- 运行指标 (/metrics) ---
+SCHEDULER_LAG = REGISTRY.histogram('automation_scheduler_lag_seconds', 'Delay between planned and actual job fire time',
+                                   buckets=(0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600))
+SCHEDULER_MISSED = REGISTRY.counter('automation_scheduler_missed_jobs', 'Job fires skipped after exceeding misfire_grace_time')
+def _queue_depth():
+    if task_queue is None:
+        return {}
+    return {(cls, ): item['queued'] for cls, item in task_queue.stats()['classes'].items()}
+
+QUEUE_DEPTH = REGISTRY.gauge('automation_queue_depth', 'Runs waiting in the execution queue', ['resource_class'],
+                             callback=_queue_depth)
+QUEUE_WAIT = REGISTRY.histogram('automation_queue_wait_seconds', 'Time runs spent queued before starting', ['resource_class'])
+ACTIVE_RUNS = REGISTRY.gauge('automation_active_runs', 'Runs currently executing', ['executor'])
+RUN_DURATION = REGISTRY.histogram('automation_run_duration_seconds', 'Run wall time', ['executor', 'status'])
+DB_QUERY_SECONDS = REGISTRY.histogram('automation_db_query_seconds', 'Database statement latency',
+                                      buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('query_started')
+    if stack:
+        DB_QUERY_SECONDS.observe(time.perf_counter() - stack.pop())
+
+def _on_job_event(job_event):
+    if job_event.code == EVENT_JOB_MISSED:
+        SCHEDULER_MISSED.inc()
+        return
+    now = datetime.now(SYSTEM_TZ)
+    for planned in job_event.scheduled_run_times:
+        SCHEDULER_LAG.observe(max((now - planned).total_seconds(), 0))
+
+if scheduler is not None:
+    scheduler.add_listener(_on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED)
 
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -120,6 +238,248 @@ class Task(db.Model):
     random_start = db.Column(db.String(10), nullable=True)   
     random_end = db.Column(db.String(10), nullable=True)     
 
+    # 执行队列选项
+    resource_class = db.Column(db.String(20), nullable=True)  # display / browser / light，空 = 自动识别
+    priority = db.Column(db.Integer, default=0)               # 越大越优先
+    max_concurrency = db.Column(db.Integer, default=1)        # 同一任务最多并行实例数
+    nice_level = db.Column(db.Integer, nullable=True)         # 定时运行的 nice 值，空 = BACKGROUND_NICE
+    speed_profile = db.Column(db.String(20), nullable=True)   # Selenium 速度档位，空 = SELENIUM_SPEED_PROFILE
+    headless = db.Column(db.Boolean, default=False)           # 无头 Chrome，不占用 X 显示器
+    watch_live = db.Column(db.Boolean, default=False)         # 在 VNC 桌面 :1 上运行 (可实时观看)，否则使用独立 Xvfb
+    timeout_seconds = db.Column(db.Integer, nullable=True)    # 单次运行时限，空 = MAX_SCRIPT_TIMEOUT
+    warm_start = db.Column(db.Boolean, default=False)         # Python 脚本由预热运行器 fork 执行 (WARM_RUNNER_ENABLED)
+    side_engine = db.Column(db.String(20), nullable=True)     # .side 回放引擎，空 = SIDE_ENGINE
+    version = db.Column(db.BigInteger, default=0, index=True)  # 最后一次变更的全局版本号 (增量同步)
+
+    def to_dict(self, state=None):
+        """state: TASK_STATE 中的最新运行状态 (尚未写回数据库时以其为准)"""
+        last_run = (state or {}).get('last_run') or self.last_run
+        return {
+            'id': self.id,
+            'name': self.name,
+            'script_path': self.script_path,
+            'cron_expression': self.cron_expression,
+            'enabled': self.enabled,
+            'last_run': last_run.isoformat() if last_run else None,
+            'last_status': (state or {}).get('last_status') or self.last_status,
+            'schedule_type': getattr(self, 'schedule_type', 'cron'),
+            'random_start': getattr(self, 'random_start', ''),
+            'random_end': getattr(self, 'random_end', ''),
+            'resource_class': self.resource_class,
+            'priority': self.priority or 0,
+            'max_concurrency': self.max_concurrency or 1,
+            'nice_level': self.nice_level,
+            'speed_profile': self.speed_profile,
+            'headless': bool(self.headless),
+            'watch_live': bool(self.watch_live),
+            'timeout_seconds': self.timeout_seconds,
+            'warm_start': bool(self.warm_start),
+            'side_engine': self.side_engine,
+            'version': self.version or 0
+        }
+
+class TaskRun(db.Model):
+    """单次运行记录 (执行历史)"""
+    __tablename__ = 'task_run'
+    __table_args__ = (db.Index('ix_task_run_task_started', 'task_id', 'started_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)                 # 秒
+    exit_code = db.Column(db.Integer)
+    status = db.Column(db.String(50))
+    executor = db.Column(db.String(20))            # python / selenium / playwright / autokey
+    trigger = db.Column(db.String(20))             # schedule / manual
+    resource_class = db.Column(db.String(20))
+    wait_seconds = db.Column(db.Float)             # 排队等待时间
+    deferred_seconds = db.Column(db.Float)         # 其中因内存不足被准入控制推迟的时间
+    defer_reason = db.Column(db.String(200))
+    locator_hits = db.Column(db.Integer)           # Selenium 定位器缓存命中数
+    locator_misses = db.Column(db.Integer)
+    cpu_user = db.Column(db.Float)                 # 进程树 CPU 时间 (秒)
+    cpu_sys = db.Column(db.Float)
+    peak_rss_kb = db.Column(db.Integer)            # 进程树常驻内存峰值 (KB)
+    output = db.Column(db.Text)                    # 截断后的输出
+    version = db.Column(db.BigInteger, default=0, index=True)  # 最后一次变更的全局版本号
+
+    def to_dict(self, include_output=False):
+        data = {
+            'id': self.id,
+            'task_id': self.task_id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration': self.duration,
+            'exit_code': self.exit_code,
+            'status': self.status,
+            'executor': self.executor,
+            'trigger': self.trigger,
+            'resource_class': self.resource_class,
+            'wait_seconds': self.wait_seconds,
+            'deferred_seconds': self.deferred_seconds,
+            'defer_reason': self.defer_reason,
+            'locator_hits': self.locator_hits,
+            'locator_misses': self.locator_misses,
+            'cpu_user': self.cpu_user,
+            'cpu_sys': self.cpu_sys,
+            'peak_rss_kb': self.peak_rss_kb,
+            'version': self.version or 0
+        }
+        if include_output:
+            data['output'] = self.output
+        return data
+
+class SyncState(db.Model):
+    """全局变更版本号 (单行)：任务 / 运行记录每次变更在同一事务内递增"""
+    __tablename__ = 'sync_state'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class TaskTombstone(db.Model):
+    """已删除任务的记录，增量同步据此通知客户端移除"""
+    __tablename__ = 'task_tombstone'
+    task_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime)
+
+# --- 增量同步版本号 ---
+# 递增 sync_state 会持有写锁直到提交 (SQLite 单写者 / InnoDB 行锁)，
+# 因此版本号的提交顺序与分配顺序一致，客户端按 since 拉取不会漏掉变更
+LONGPOLL_MAX_WAIT = int(os.environ.get('LONGPOLL_MAX_WAIT', '25'))
+LONGPOLL_MAX_WAITERS = int(os.environ.get('LONGPOLL_MAX_WAITERS', '4'))
+
+def next_sync_version(session):
+    if session.execute(text('UPDATE sync_state SET version = version + 1 WHERE id = 1')).rowcount == 0:
+        session.execute(text('INSERT INTO sync_state (id, version) VALUES (1, 1)'))
+    return session.execute(text('SELECT version FROM sync_state WHERE id = 1')).scalar()
+
+def current_sync_version(connection=None):
+    if connection is None:
+        with db.engine.connect() as conn:
+            return current_sync_version(conn)
+    return connection.execute(text('SELECT version FROM sync_state WHERE id = 1')).scalar() or 0
+
+@event.listens_for(OrmSession, 'before_flush')
+def _assign_sync_version(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, (Task, TaskRun))]
+    changed += [obj for obj in session.dirty if isinstance(obj, (Task, TaskRun)) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Task)]
+    if not changed and not deleted:
+        return
+    version = next_sync_version(session)
+    for obj in changed:
+        obj.version = version
+    for task in deleted:
+        session.merge(TaskTombstone(task_id=task.id, version=version,
+                                    deleted_at=datetime.now(SYSTEM_TZ).replace(tzinfo=None)))
+    session.info['sync_version'] = version
+
+@event.listens_for(OrmSession, 'after_commit')
+def _notify_sync_version(session):
+    version = session.info.pop('sync_version', None)
+    if version is not None:
+        VERSION_WATCHER.notify(version)
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _discard_sync_version(session):
+    session.info.pop('sync_version', None)
+
+def _read_sync_version():
+    with app.app_context():
+        return current_sync_version()
+
+VERSION_WATCHER = VersionWatcher(_read_sync_version, interval=float(os.environ.get('LONGPOLL_INTERVAL', '1')),
+                                 max_waiters=LONGPOLL_MAX_WAITERS)
+
+# --- 运行历史保留策略 ---
+RUN_OUTPUT_MAX_CHARS = int(os.environ.get('RUN_OUTPUT_MAX_CHARS', '16000'))
+RUN_HISTORY_KEEP = int(os.environ.get('RUN_HISTORY_KEEP', '200'))      # 每个任务保留条数
+RUN_HISTORY_DAYS = int(os.environ.get('RUN_HISTORY_DAYS', '30'))       # 最长保留天数
+
+def truncate_output(text):
+    if not text or len(text) <= RUN_OUTPUT_MAX_CHARS:
+        return text
+    return '...[truncated]\n' + text[-RUN_OUTPUT_MAX_CHARS:]
+
+def prune_task_runs(task_id):
+    """只保留最近 RUN_HISTORY_KEEP 条记录"""
+    cutoff = TaskRun.query.with_entities(TaskRun.id) \
+        .filter_by(task_id=task_id) \
+        .order_by(TaskRun.started_at.desc(), TaskRun.id.desc()) \
+        .offset(RUN_HISTORY_KEEP).limit(1).first()
+    if cutoff:
+        TaskRun.query.filter(TaskRun.task_id == task_id, TaskRun.id <= cutoff.id) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+def prune_run_history():
+    """定期清理过期记录 (调度器任务)"""
+    with app.app_context():
+        try:
+            expire_before = datetime.now(SYSTEM_TZ).replace(tzinfo=None) - timedelta(days=RUN_HISTORY_DAYS)
+            deleted = TaskRun.query.filter(TaskRun.started_at < expire_before).delete(synchronize_session=False)
+            db.session.commit()
+            if deleted:
+                logger.info(f"🧹 Pruned {deleted} run records older than {RUN_HISTORY_DAYS} days")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Prune run history failed: {e}")
+
+# --- 运行中任务的实时输出 (run_id -> RunOutputBuffer) ---
+RUN_STREAMS = {}
+RUN_STREAMS_LOCK = threading.Lock()
+# 每个 Web Worker 同时跟随运行中输出的 SSE 连接上限 (每个连接占用一个线程直到运行结束)
+STREAM_MAX_FOLLOWERS = int(os.environ.get('STREAM_MAX_FOLLOWERS', '4'))
+STREAM_RETRY_MS = 5000
+RUN_FOLLOWER_SLOTS = threading.BoundedSemaphore(STREAM_MAX_FOLLOWERS)
+
+# --- 任务运行状态 (last_run / last_status) 的写回缓存，只在执行进程中存在 ---
+TASK_STATE_FLUSH_INTERVAL = float(os.environ.get('TASK_STATE_FLUSH_INTERVAL', '2'))
+
+def write_task_states(states):
+    """TaskStateCache 的写回：所有变化的任务在一个事务内更新"""
+    with app.app_context():
+        try:
+            version = next_sync_version(db.session)
+            for task_id, fields in states.items():
+                Task.query.filter_by(id=task_id).update(dict(fields, version=version), synchronize_session=False)
+            db.session.info['sync_version'] = version
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+TASK_STATE = None
+if RUNS_EXECUTOR:
+    TASK_STATE = TaskStateCache(write_task_states, interval=TASK_STATE_FLUSH_INTERVAL)
+    # 进程退出时写回尚未落库的状态 (守护进程在任务排空后也会显式调用)
+    atexit.register(TASK_STATE.stop)
+    REGISTRY.gauge('automation_task_state_pending', 'Task state changes not yet written to the database',
+                   callback=lambda: {(): TASK_STATE.stats()['pending']})
+
+def get_task_states():
+    """task_id -> 最新运行状态；Web 进程从守护进程获取，不可用时返回空 (退回数据库中的值)"""
+    if RUNS_EXECUTOR:
+        return TASK_STATE.snapshot()
+    try:
+        states = executor_ipc.call('task_states', timeout=2).get('states', {})
+    except executor_ipc.ExecutorUnavailable as e:
+        logger.debug(f"Task states unavailable, using database values: {e}")
+        return {}
+    return {int(task_id): {'last_run': datetime.fromisoformat(state['last_run']) if state.get('last_run') else None,
+                           'last_status': state.get('last_status')}
+            for task_id, state in states.items()}
+
+def reap_orphan_processes():
+    """结束不属于任何运行中任务的浏览器进程 (调度器任务)"""
+    with RUN_STREAMS_LOCK:
+        active = list(RUN_STREAMS)
+    try:
+        reap_orphans(active)
+    except Exception as e:
+        logger.error(f"Orphan reaper failed: {e}")
+
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
@@ -152,9 +512,12 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
+    # 先读版本号再读任务，页面上的增量同步从该版本继续，不会漏掉期间的变更
+    sync_version = current_sync_version()
     tasks = Task.query.all()
     scripts = get_available_scripts()
-    return render_template('dashboard.html', tasks=tasks, scripts=scripts)
+    return render_template('dashboard.html', tasks=tasks, scripts=scripts, states=get_task_states(),
+                           sync_version=sync_version)
 
 @app.route('/favicon.ico')
 def favicon():
@@ -164,16 +527,160 @@ def favicon():
 def health():
     return jsonify({'status': 'ok', 'timestamp': datetime.now().isoformat()}), 200
 
+# --- 就绪检查 (/ready) ---
+READY_CACHE_SECONDS = float(os.environ.get('READY_CACHE_SECONDS', '10'))
+# 失败即判定未就绪的检查项；其余只做展示
+READY_REQUIRED = [c.strip() for c in os.environ.get('READY_REQUIRED', 'scheduler,db,display').split(',') if c.strip()]
+
+class CachedProbe:
+    """探测结果缓存 ttl 秒，并发请求只触发一次实际探测"""
+
+    def __init__(self, check, ttl=READY_CACHE_SECONDS):
+        self.check = check
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0
+
+    def result(self):
+        with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.ttl:
+                started = time.monotonic()
+                try:
+                    ok, detail = self.check()
+                except Exception as e:
+                    ok, detail = False, str(e)
+                self._result = {'ok': ok, 'detail': detail, 'latency_ms': round((time.monotonic() - started) * 1000, 1)}
+                self._checked_at = time.monotonic()
+            return dict(self._result, age=round(time.monotonic() - self._checked_at, 1))
+
+def scheduler_alive():
+    """本进程的调度线程与执行队列是否在工作"""
+    thread = getattr(scheduler, '_thread', None)
+    return bool(scheduler is not None and scheduler.running and thread is not None and thread.is_alive()
+                and task_queue is not None and task_queue.alive())
+
+def probe_scheduler():
+    if RUNS_EXECUTOR:
+        return scheduler_alive(), {'jobs': len(scheduler.get_jobs())} if scheduler is not None else 'not started'
+    reply = executor_ipc.call('ping', timeout=3)
+    return bool(reply.get('scheduler_alive')), {'jobs': reply.get('jobs')}
+
+def probe_db():
+    with app.app_context():
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    return True, db.engine.dialect.name
+
+def probe_display():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(2)
+    try:
+        sock.connect('/tmp/.X11-unix/X1')
+        return True, ':1'
+    finally:
+        sock.close()
+
+def probe_autokey():
+    client = get_autokey_client(get_desktop_env)
+    if client.available():
+        return client.alive(), 'dbus'
+    running = subprocess.run(['pgrep', '-f', 'autokey-gtk'], capture_output=True, timeout=3).returncode == 0
+    return running, 'process'
+
+READY_PROBES = {
+    'scheduler': CachedProbe(probe_scheduler),
+    'db': CachedProbe(probe_db),
+    'display': CachedProbe(probe_display),
+    'autokey': CachedProbe(probe_autokey)
+}
+
+@app.route('/ready')
+def ready():
+    checks = {name: probe.result() for name, probe in READY_PROBES.items()}
+    is_ready = all(checks[name]['ok'] for name in READY_REQUIRED if name in checks)
+    return jsonify({'status': 'ready' if is_ready else 'unavailable', 'required': READY_REQUIRED, 'checks': checks}), \
+        200 if is_ready else 503
+
+# --- Prometheus 指标 (/metrics) ---
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def collect_metrics():
+    """本进程快照；供守护进程的 IPC metrics 操作调用"""
+    return REGISTRY.collect(role=APP_ROLE)
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    snapshots = [collect_metrics()]
+    executor_up = 1
+    if not RUNS_EXECUTOR:
+        # 调度/执行指标在守护进程中，通过 IPC 合并
+        try:
+            snapshots.append(executor_ipc.call('metrics', timeout=3)['families'])
+        except (executor_ipc.ExecutorUnavailable, KeyError) as e:
+            logger.warning(f"Executor metrics unavailable: {e}")
+            executor_up = 0
+    probes = [['automation_ready_check', {'check': name}, int(probe.result()['ok'])] for name, probe in READY_PROBES.items()]
+    snapshots.append([
+        {'name': 'automation_executor_up', 'type': 'gauge', 'help': 'Whether the executor daemon answered',
+         'samples': [['automation_executor_up', {}, executor_up]]},
+        {'name': 'automation_ready_check', 'type': 'gauge', 'help': 'Cached readiness probe result (1 = ok)',
+         'samples': probes}
+    ])
+    return Response(render_metrics(merge_metrics(*snapshots)), mimetype='text/plain; version=0.0.4')
+
 # --- 文件管理 API ---
 def get_target_dir(folder_key):
     return BASE_DIRS.get(folder_key, BASE_DIRS['downloads'])
 
+FILE_SORT_KEYS = {
+    'mtime': lambda f: (f['mtime_ns'], f['name']),
+    'name': lambda f: (f['name'].lower(), f['name']),
+    'size': lambda f: (f['size'], f['name']),
+}
+
+def scan_directory(target_dir):
+    """单次 scandir 遍历 (DirEntry 自带缓存的 stat)，返回 (文件列表, 最后修改时间)"""
+    files = []
+    last_modified = target_dir.stat().st_mtime
+    with os.scandir(target_dir) as it:
+        for entry in it:
+            if entry.name == '.DS_Store' or entry.name.endswith('.json'):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue  # 扫描期间被删除
+            last_modified = max(last_modified, st.st_mtime)
+            files.append({'name': entry.name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'path': entry.path})
+    return files, last_modified
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+
 @app.route('/api/files', methods=['GET'])
 @login_required
 def list_files_api():
+    """
+    文件列表 (服务端排序/过滤 + 游标分页 + 条件请求)
+    参数: folder, sort=mtime|name|size, order=desc|asc, q=名称关键字, limit (≤500), cursor
+    """
     folder = request.args.get('folder', 'downloads')
     target_dir = get_target_dir(folder)
-    files = []
+    sort = request.args.get('sort', 'mtime')
+    descending = request.args.get('order', 'desc' if sort == 'mtime' else 'asc') == 'desc'
+    keyword = request.args.get('q', '').strip().lower()
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    cursor = request.args.get('cursor')
+    if sort not in FILE_SORT_KEYS:
+        return jsonify({'error': f'sort must be one of {", ".join(FILE_SORT_KEYS)}'}), 400
     
     if not target_dir.exists():
         try:
@@ -182,20 +689,47 @@ def list_files_api():
             return jsonify({'files': [], 'error': 'Directory not found'}), 404
 
     try:
-        paths = sorted(target_dir.iterdir(), key=os.path.getmtime, reverse=True)
-        for p in paths:
-            if p.is_file() and p.name != '.DS_Store' and not p.name.endswith('.json'):
-                files.append({
-                    'name': p.name,
-                    'size': p.stat().st_size,
-                    'modified': datetime.fromtimestamp(p.stat().st_mtime).strftime('%Y-%m-%d %H:%M'),
-                    'path': str(p)
-                })
+        files, last_modified = scan_directory(target_dir)
     except Exception as e:
         logger.error(f"List files error: {e}")
         return jsonify({'error': str(e)}), 500
-        
-    return jsonify({'files': files, 'current_folder': folder})
+
+    # ETag 覆盖目录内容 + 查询参数；目录未变化时直接 304。
+    # 只按 ETag 判断：Last-Modified 精度为秒，且不反映删除与查询参数，不能用 If-Modified-Since 回退
+    fingerprint = '\n'.join(f"{f['name']}:{f['size']}:{f['mtime_ns']}" for f in sorted(files, key=lambda f: f['name']))
+    etag = hashlib.sha1(f"{fingerprint}|{request.query_string.decode()}".encode('utf-8')).hexdigest()[:16]
+    last_modified = datetime.fromtimestamp(int(last_modified), tz=pytz.utc)
+    if request.if_none_match and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        if keyword:
+            files = [f for f in files if keyword in f['name'].lower()]
+        sort_key = FILE_SORT_KEYS[sort]
+        files.sort(key=sort_key, reverse=descending)
+        total = len(files)
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            files = [f for f in files if (sort_key(f) < after if descending else sort_key(f) > after)]
+        page = files[:limit]
+        next_cursor = encode_cursor(list(sort_key(page[-1]))) if len(files) > limit else None
+        response = jsonify({
+            'files': [{
+                'name': f['name'],
+                'size': f['size'],
+                'modified': datetime.fromtimestamp(f['mtime_ns'] / 1e9).strftime('%Y-%m-%d %H:%M'),
+                'path': f['path']
+            } for f in page],
+            'current_folder': folder,
+            'total': total,
+            'next_cursor': next_cursor
+        })
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/files/content', methods=['GET'])
 @login_required
@@ -232,6 +766,7 @@ def save_file():
     try:
         # 1. 保存脚本文件
         file_path.write_text(content, encoding='utf-8')
+        get_script_index(BASE_DIRS).touch(file_path)
         
         # 2. [AutoKey 特殊处理] 自动生成 .json 定义文件
         if folder == 'autokey' and filename.endswith('.py'):
@@ -272,6 +807,7 @@ def delete_file():
     if file_path.exists():
         try:
             os.remove(file_path)
+            get_script_index(BASE_DIRS).touch(file_path)
             if folder == 'autokey':
                 json_path = file_path.with_suffix('.json')
                 if json_path.exists():
@@ -286,77 +822,102 @@ def delete_file():
 @app.route('/api/scripts', methods=['GET'])
 @login_required
 def list_scripts():
-    scripts = get_available_scripts()
-    return jsonify(scripts)
+    scripts, etag = get_script_index(BASE_DIRS).snapshot()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    response = jsonify(scripts)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/scripts/validate', methods=['GET'])
+@login_required
+def validate_script():
+    """编译 .side 脚本并报告不支持的命令 (不启动浏览器)"""
+    script_path = resolve_script_path(request.args.get('path', ''))
+    resolved = Path(script_path).resolve()
+    if not any(resolved.is_relative_to(d.resolve()) for d in BASE_DIRS.values()):
+        return jsonify({'error': '路径不在脚本目录内'}), 400
+    if resolved.suffix.lower() != '.side':
+        return jsonify({'error': '仅支持校验 .side 脚本'}), 400
+    if not resolved.is_file():
+        return jsonify({'error': '文件不存在'}), 404
+    try:
+        return jsonify(load_plan(str(resolved)).report())
+    except ValueError as e:
+        return jsonify({'valid': False, 'error': f'JSON 解析失败: {e}'})
 
 def get_available_scripts():
-    scripts = []
-    # 瘦身版仅支持 Python, Selenium Side, AutoKey
-    supported_extensions = ['.side', '.py', '.autokey']
-    
-    for key, dir_path in BASE_DIRS.items():
-        if dir_path.exists():
-            try:
-                for file in dir_path.rglob('*'):
-                    if file.is_file() and \
-                       file.suffix.lower() in supported_extensions and \
-                       not file.name.endswith('.json') and \
-                       not file.name.startswith('.'):
-                        
-                        display_name = f"[{key}] {file.name}"
-                        scripts.append({'name': display_name, 'path': str(file)})
-            except Exception as e:
-                logger.error(f"Error scanning dir {dir_path}: {e}")
-                
-    return scripts
+    # 瘦身版仅支持 Python, Selenium Side, AutoKey；由 inotify 维护的内存索引提供
+    return get_script_index(BASE_DIRS).scripts()
 
 @app.route('/api/tasks', methods=['GET', 'POST'])
 @login_required
 def manage_tasks():
     if request.method == 'POST':
         data = request.json
-        schedule_type = data.get('schedule_type', 'cron')
-        random_start = data.get('random_start')
-        random_end = data.get('random_end')
-        cron_expression = data.get('cron_expression')
-
-        if schedule_type == 'random' and random_start:
-            try:
-                hour, minute = random_start.split(':')
-                cron_expression = f"{int(minute)} {int(hour)} * * *"
-            except:
-                pass
-
         task = Task(
             name=data['name'],
             script_path=data['script_path'],
-            cron_expression=cron_expression,
-            enabled=data.get('enabled', True),
-            schedule_type=schedule_type,
-            random_start=random_start,
-            random_end=random_end
+            enabled=data.get('enabled', True)
         )
+        apply_schedule_options(task, data)
+        try:
+            apply_execution_options(task, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         db.session.add(task)
         db.session.commit()
         if task.enabled:
-            schedule_task(task)
+            sync_task_schedule(task.id)
         return jsonify({'success': True, 'task_id': task.id})
     
-    tasks = Task.query.all()
-    return jsonify([
-        {
-            'id': t.id,
-            'name': t.name,
-            'script_path': t.script_path,
-            'cron_expression': t.cron_expression,
-            'enabled': t.enabled,
-            'last_run': t.last_run.isoformat() if t.last_run else None,
-            'last_status': t.last_status,
-            'schedule_type': getattr(t, 'schedule_type', 'cron'),
-            'random_start': getattr(t, 'random_start', ''),
-            'random_end': getattr(t, 'random_end', '')
-        } for t in tasks
-    ])
+    since = request.args.get('since', type=int)
+    if since is None:
+        tasks = Task.query.all()
+        states = get_task_states()
+        return jsonify([t.to_dict(states.get(t.id)) for t in tasks])
+
+    # 增量同步: ?since=<version>[&wait=秒] 长轮询，无变化时阻塞到有变化或超时；
+    # &running=1 (客户端首次同步) 额外返回当前所有运行中的记录
+    include_running = request.args.get('running') == '1'
+    if include_running:
+        return jsonify(get_task_changes(since, include_running=True))
+    wait = min(request.args.get('wait', 0, type=float), LONGPOLL_MAX_WAIT)
+    if wait > 0 and since > 0 and current_sync_version() <= since:
+        db.session.close()      # 等待期间不占用连接池
+        changed = VERSION_WATCHER.wait(since, wait)
+        if not changed:
+            # None = 等待者已满，客户端稍后重试
+            return jsonify({'version': since, 'full': False, 'tasks': [], 'deleted': [], 'runs': [],
+                            'busy': changed is None})
+    return jsonify(get_task_changes(since))
+
+def get_task_changes(since, include_running=False):
+    """
+    since 之后变更的任务 / 已删除的任务 / 运行记录；since=0 返回全部任务与运行中的记录，
+    include_running 时在增量之外附带当前所有运行中的记录
+    """
+    version = current_sync_version()
+    if since > 0:
+        tasks = Task.query.filter(Task.version > since).all()
+        deleted = [t.task_id for t in TaskTombstone.query.filter(TaskTombstone.version > since)]
+        runs = TaskRun.query.filter(TaskRun.version > since).order_by(TaskRun.id.desc()).limit(200).all()
+        if include_running:
+            seen = {r.id for r in runs}
+            runs += [r for r in TaskRun.query.filter_by(status='Running') if r.id not in seen]
+    else:
+        tasks = Task.query.all()
+        deleted = []
+        runs = TaskRun.query.filter_by(status='Running').all()
+    states = get_task_states()
+    return {
+        'version': version,
+        'full': since <= 0,
+        'tasks': [t.to_dict(states.get(t.id)) for t in tasks],
+        'deleted': deleted,
+        'runs': [r.to_dict() for r in runs]
+    }
 
 @app.route('/api/tasks/<int:task_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
@@ -365,60 +926,420 @@ def update_task(task_id):
     if not task: return jsonify({'error': 'Task not found'}), 404
     
     if request.method == 'GET':
-        return jsonify({
-            'id': task.id,
-            'name': task.name,
-            'script_path': task.script_path,
-            'cron_expression': task.cron_expression,
-            'enabled': task.enabled,
-            'last_run': task.last_run.isoformat() if task.last_run else None,
-            'last_status': task.last_status,
-            'schedule_type': getattr(task, 'schedule_type', 'cron'),
-            'random_start': getattr(task, 'random_start', ''),
-            'random_end': getattr(task, 'random_end', '')
-        })
+        return jsonify(task.to_dict(get_task_states().get(task_id)))
     
     if request.method == 'DELETE':
-        try: scheduler.remove_job(f'task_{task_id}')
-        except: pass
+        TaskRun.query.filter_by(task_id=task_id).delete(synchronize_session=False)
         db.session.delete(task)
         db.session.commit()
+        sync_task_schedule(task_id)
         return jsonify({'success': True})
     
     if request.method == 'PUT':
         data = request.json
         task.name = data.get('name', task.name)
         task.enabled = data.get('enabled', task.enabled)
-        
-        schedule_type = data.get('schedule_type', 'cron')
-        task.schedule_type = schedule_type
-        
-        if schedule_type == 'random':
-            task.random_start = data.get('random_start')
-            task.random_end = data.get('random_end')
-            if task.random_start:
-                try:
-                    hour, minute = task.random_start.split(':')
-                    task.cron_expression = f"{int(minute)} {int(hour)} * * *"
-                except: pass
-        else:
-            task.cron_expression = data.get('cron_expression', task.cron_expression)
-            task.random_start = None
-            task.random_end = None
+        apply_schedule_options(task, data)
+
+        try:
+            apply_execution_options(task, data)
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
 
         db.session.commit()
-        try: scheduler.remove_job(f'task_{task_id}')
-        except: pass
-        if task.enabled: schedule_task(task)
+        sync_task_schedule(task_id)
         return jsonify({'success': True})
 
+def apply_schedule_options(task, data):
+    """调度模式：cron 使用表达式；random 使用每天的时间窗口 (cron 表达式取窗口开始时间)"""
+    schedule_type = data.get('schedule_type', 'cron')
+    task.schedule_type = schedule_type
+
+    if schedule_type == 'random':
+        task.random_start = data.get('random_start')
+        task.random_end = data.get('random_end')
+        task.cron_expression = data.get('cron_expression', task.cron_expression)
+        if task.random_start:
+            try:
+                hour, minute = task.random_start.split(':')
+                task.cron_expression = f"{int(minute)} {int(hour)} * * *"
+            except: pass
+    else:
+        task.cron_expression = data.get('cron_expression', task.cron_expression)
+        task.random_start = None
+        task.random_end = None
+
+def apply_execution_options(task, data):
+    """解析任务的执行选项 (队列/资源相关)，非法值抛出 ValueError"""
+    if 'resource_class' in data:
+        resource_class = data.get('resource_class') or None
+        if resource_class and resource_class not in RESOURCE_CLASSES:
+            raise ValueError(f'resource_class must be one of {", ".join(RESOURCE_CLASSES)}')
+        task.resource_class = resource_class
+    if 'priority' in data:
+        task.priority = int(data.get('priority') or 0)
+    if 'max_concurrency' in data:
+        task.max_concurrency = max(1, int(data.get('max_concurrency') or 1))
+    if 'nice_level' in data:
+        nice_level = data.get('nice_level')
+        task.nice_level = None if nice_level in (None, '') else min(max(int(nice_level), 0), 19)
+    if 'speed_profile' in data:
+        speed_profile = data.get('speed_profile') or None
+        if speed_profile and speed_profile not in SPEED_PROFILES:
+            raise ValueError(f'speed_profile must be one of {", ".join(SPEED_PROFILES)}')
+        task.speed_profile = speed_profile
+    if 'headless' in data:
+        task.headless = bool(data.get('headless'))
+    if 'watch_live' in data:
+        task.watch_live = bool(data.get('watch_live'))
+    if 'timeout_seconds' in data:
+        timeout_seconds = data.get('timeout_seconds')
+        if timeout_seconds in (None, ''):
+            task.timeout_seconds = None
+        elif int(timeout_seconds) <= 0:
+            raise ValueError('timeout_seconds must be a positive number of seconds')
+        else:
+            task.timeout_seconds = int(timeout_seconds)
+    if 'warm_start' in data:
+        task.warm_start = bool(data.get('warm_start'))
+    if 'side_engine' in data:
+        side_engine = data.get('side_engine') or None
+        if side_engine and side_engine not in SIDE_ENGINES:
+            raise ValueError(f'side_engine must be one of {", ".join(SIDE_ENGINES)}')
+        task.side_engine = side_engine
+
+# --- 批量操作 / 导入导出 ---
+BULK_MAX_OPERATIONS = int(os.environ.get('BULK_MAX_OPERATIONS', '2000'))
+TASK_EXPORT_FIELDS = ('name', 'script_path', 'enabled', 'schedule_type', 'cron_expression', 'random_start', 'random_end',
+                      'resource_class', 'priority', 'max_concurrency', 'nice_level', 'speed_profile', 'headless',
+                      'watch_live', 'timeout_seconds', 'warm_start', 'side_engine')
+SCHEDULE_FIELDS = ('schedule_type', 'cron_expression', 'random_start', 'random_end')
+
+class BulkOperationError(ValueError):
+    def __init__(self, index, message):
+        super().__init__(f'operations[{index}]: {message}')
+        self.index = index
+
+def load_tasks(ids):
+    if not isinstance(ids, list) or not ids:
+        raise ValueError('ids must be a non-empty list')
+    ids = {int(task_id) for task_id in ids}
+    tasks = Task.query.filter(Task.id.in_(ids)).all()
+    missing = ids - {t.id for t in tasks}
+    if missing:
+        raise ValueError(f'Task not found: {", ".join(map(str, sorted(missing)))}')
+    return tasks
+
+def check_task_schedule(task):
+    if task.enabled:
+        build_task_trigger(task, quiet=True)
+
+def apply_bulk_operations(operations):
+    """
+    在当前事务中依次应用批量操作 (不提交)，任一条非法时抛出 BulkOperationError：
+    {"op": "create", "task": {...}} / {"op": "update", "id": 1, "task": {...}} /
+    {"op": "enable" | "disable" | "delete", "ids": [1, 2]}
+    """
+    result = {'created': [], 'updated': 0, 'enabled': 0, 'disabled': 0, 'deleted': 0}
+    created = []
+    for index, operation in enumerate(operations):
+        try:
+            kind = operation.get('op')
+            if kind == 'create':
+                data = operation.get('task') or {}
+                if not data.get('name') or not data.get('script_path'):
+                    raise ValueError('name and script_path are required')
+                task = Task(name=data['name'], script_path=data['script_path'], enabled=data.get('enabled', True))
+                apply_schedule_options(task, data)
+                apply_execution_options(task, data)
+                check_task_schedule(task)
+                db.session.add(task)
+                created.append(task)
+            elif kind == 'update':
+                task = load_tasks([operation.get('id')])[0]
+                data = operation.get('task') or {}
+                task.name = data.get('name', task.name)
+                task.script_path = data.get('script_path', task.script_path)
+                task.enabled = data.get('enabled', task.enabled)
+                if any(field in data for field in SCHEDULE_FIELDS):
+                    current = {'schedule_type': task.schedule_type or 'cron', 'random_start': task.random_start,
+                               'random_end': task.random_end}
+                    apply_schedule_options(task, dict(current, **data))
+                apply_execution_options(task, data)
+                check_task_schedule(task)
+                result['updated'] += 1
+            elif kind in ('enable', 'disable'):
+                tasks = load_tasks(operation.get('ids'))
+                for task in tasks:
+                    task.enabled = kind == 'enable'
+                    check_task_schedule(task)
+                result[kind + 'd'] += len(tasks)
+            elif kind == 'delete':
+                tasks = load_tasks(operation.get('ids'))
+                TaskRun.query.filter(TaskRun.task_id.in_([t.id for t in tasks])).delete(synchronize_session=False)
+                for task in tasks:
+                    db.session.delete(task)
+                result['deleted'] += len(tasks)
+            else:
+                raise ValueError(f'unknown op: {kind}')
+        except (ValueError, TypeError, AttributeError) as e:
+            raise BulkOperationError(index, str(e))
+    db.session.flush()
+    result['created'] = [task.id for task in created]
+    return result
+
+def commit_bulk_operations(operations):
+    """一个事务内应用全部操作，提交后一次性对齐调度"""
+    if not isinstance(operations, list):
+        return jsonify({'error': 'operations must be a list'}), 400
+    if len(operations) > BULK_MAX_OPERATIONS:
+        return jsonify({'error': f'Too many operations (max {BULK_MAX_OPERATIONS})'}), 400
+    try:
+        result = apply_bulk_operations(operations)
+        db.session.commit()
+    except BulkOperationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'index': e.index}), 400
+    result['schedule'] = reconcile_scheduler()
+    return jsonify(dict(result, success=True))
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+@login_required
+def bulk_tasks():
+    return commit_bulk_operations((request.json or {}).get('operations'))
+
+@app.route('/api/tasks/export', methods=['GET'])
+@login_required
+def export_tasks():
+    tasks = Task.query.order_by(Task.id).all()
+    payload = {
+        'format': 1,
+        'exported_at': datetime.now(SYSTEM_TZ).isoformat(),
+        'tasks': [{field: getattr(task, field) for field in TASK_EXPORT_FIELDS} for task in tasks]
+    }
+    response = jsonify(payload)
+    response.headers['Content-Disposition'] = 'attachment; filename=tasks.json'
+    return response
+
+@app.route('/api/tasks/import', methods=['POST'])
+@login_required
+def import_tasks():
+    """
+    导入 /api/tasks/export 的内容：按名称匹配，已存在的更新、不存在的新建；
+    mode=replace 时同时删除导入内容中没有的任务
+    """
+    data = request.json or {}
+    items = data.get('tasks')
+    mode = data.get('mode', 'merge')
+    if not isinstance(items, list) or mode not in ('merge', 'replace'):
+        return jsonify({'error': 'tasks must be a list and mode must be merge or replace'}), 400
+
+    task_ids, existing = [], {}
+    for task_id, name in db.session.query(Task.id, Task.name).order_by(Task.id):
+        task_ids.append(task_id)
+        existing.setdefault(name, task_id)
+    operations, matched = [], set()
+    for item in items:
+        fields = {field: item[field] for field in TASK_EXPORT_FIELDS if isinstance(item, dict) and field in item}
+        task_id = existing.get(fields.get('name'))
+        if task_id is not None and task_id not in matched:
+            operations.append({'op': 'update', 'id': task_id, 'task': fields})
+            matched.add(task_id)
+        else:
+            operations.append({'op': 'create', 'task': fields})
+    if mode == 'replace':
+        # 导入内容即完整任务集：未匹配到的 (含同名重复的) 任务全部删除
+        stale = [task_id for task_id in task_ids if task_id not in matched]
+        if stale:
+            operations.append({'op': 'delete', 'ids': stale})
+    return commit_bulk_operations(operations)
+
+@app.route('/api/queue', methods=['GET'])
+@login_required
+def queue_status():
+    """执行队列深度与等待时间"""
+    try:
+        stats = get_queue_stats()
+    except executor_ipc.ExecutorUnavailable as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(stats)
+
+@app.route('/api/tasks/<int:task_id>/runs', methods=['GET'])
+@login_required
+def list_task_runs(task_id):
+    """执行历史 (游标分页，按开始时间倒序)"""
+    if not db.session.get(Task, task_id): return jsonify({'error': 'Task not found'}), 404
+
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    include_output = request.args.get('include_output', 'false').lower() == 'true'
+
+    query = TaskRun.query.filter_by(task_id=task_id)
+    cursor = request.args.get('cursor')
+    if cursor:
+        before = db.session.get(TaskRun, int(cursor)) if cursor.isdigit() else None
+        if not before or before.task_id != task_id:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            TaskRun.started_at < before.started_at,
+            db.and_(TaskRun.started_at == before.started_at, TaskRun.id < before.id)
+        ))
+
+    runs = query.order_by(TaskRun.started_at.desc(), TaskRun.id.desc()).limit(limit + 1).all()
+    has_more = len(runs) > limit
+    runs = runs[:limit]
+    return jsonify({
+        'runs': [r.to_dict(include_output) for r in runs],
+        'next_cursor': str(runs[-1].id) if has_more else None
+    })
+
+@app.route('/api/tasks/<int:task_id>/runs/<int:run_id>', methods=['GET'])
+@login_required
+def get_task_run(task_id, run_id):
+    run = db.session.get(TaskRun, run_id)
+    if not run or run.task_id != task_id: return jsonify({'error': 'Run not found'}), 404
+    return jsonify(run.to_dict(include_output=True))
+
+RUN_USAGE_SORTS = {
+    'cpu': 'total_cpu',
+    'peak_rss': 'max_peak_rss_kb',
+    'duration': 'total_duration',
+    'runs': 'runs'
+}
+
+@app.route('/api/runs/usage', methods=['GET'])
+@login_required
+def run_usage_by_task():
+    """按任务汇总资源用量 (最近 days 天)，用于找出最耗资源的任务"""
+    try:
+        days = min(max(int(request.args.get('days', 7)), 1), 365)
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({'error': 'Invalid days/limit'}), 400
+    sort = request.args.get('sort', 'cpu')
+    if sort not in RUN_USAGE_SORTS:
+        return jsonify({'error': f"Invalid sort, expected one of {', '.join(RUN_USAGE_SORTS)}"}), 400
+
+    since = datetime.now(SYSTEM_TZ).replace(tzinfo=None) - timedelta(days=days)
+    cpu = db.func.coalesce(TaskRun.cpu_user, 0) + db.func.coalesce(TaskRun.cpu_sys, 0)
+    columns = {
+        'runs': db.func.count(TaskRun.id),
+        'total_duration': db.func.sum(TaskRun.duration),
+        'avg_duration': db.func.avg(TaskRun.duration),
+        'total_cpu': db.func.sum(cpu),
+        'avg_cpu': db.func.avg(cpu),
+        'avg_peak_rss_kb': db.func.avg(TaskRun.peak_rss_kb),
+        'max_peak_rss_kb': db.func.max(TaskRun.peak_rss_kb)
+    }
+    order = db.func.coalesce(columns[RUN_USAGE_SORTS[sort]], 0).desc()
+    rows = db.session.query(TaskRun.task_id, Task.name, *(c.label(k) for k, c in columns.items())) \
+        .join(Task, Task.id == TaskRun.task_id) \
+        .filter(TaskRun.started_at >= since, TaskRun.finished_at.isnot(None)) \
+        .group_by(TaskRun.task_id, Task.name) \
+        .order_by(order).limit(limit).all()
+
+    def rounded(value, digits=3):
+        return round(float(value), digits) if value is not None else None
+
+    return jsonify({
+        'days': days,
+        'sort': sort,
+        'tasks': [{
+            'task_id': row.task_id,
+            'name': row.name,
+            'runs': row.runs,
+            'total_duration': rounded(row.total_duration),
+            'avg_duration': rounded(row.avg_duration),
+            'total_cpu': rounded(row.total_cpu),
+            'avg_cpu': rounded(row.avg_cpu),
+            'avg_peak_rss_kb': int(row.avg_peak_rss_kb) if row.avg_peak_rss_kb is not None else None,
+            'max_peak_rss_kb': row.max_peak_rss_kb
+        } for row in rows]
+    })
+
+@app.route('/api/tasks/<int:task_id>/runs/<int:run_id>/stream', methods=['GET'])
+@login_required
+def stream_task_run(task_id, run_id):
+    """SSE: 实时推送运行输出，支持 Last-Event-ID 断线续传"""
+    run = db.session.get(TaskRun, run_id)
+    if not run or run.task_id != task_id: return jsonify({'error': 'Run not found'}), 404
+
+    stored_output, stored_status = run.output, run.status
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', '0'))
+    last_seq = int(last_id) if str(last_id).isdigit() else 0
+
+    def sse(data, event=None, event_id=None):
+        msg = ''
+        if event_id is not None: msg += f'id: {event_id}\n'
+        if event: msg += f'event: {event}\n'
+        for line in str(data).split('\n'):
+            msg += f'data: {line}\n'
+        return msg + '\n'
+
+    def generate():
+        # 运行中的输出跟随需占用一个名额；已满时让客户端按 retry 间隔带 Last-Event-ID 重连
+        following = stored_status == 'Running'
+        if following and not RUN_FOLLOWER_SLOTS.acquire(blocking=False):
+            yield f'retry: {STREAM_RETRY_MS}\n\n'
+            yield sse(f'实时跟随连接已满，{STREAM_RETRY_MS // 1000} 秒后重试', event='busy')
+            return
+        try:
+            yield from follow()
+        finally:
+            if following:
+                RUN_FOLLOWER_SLOTS.release()
+
+    def follow():
+        try:
+            if RUNS_EXECUTOR:
+                events = follow_run_output(run_id, last_seq)
+            else:
+                events = executor_ipc.stream('follow', run_id=run_id, after=last_seq)
+            live = next(events, {}).get('live')
+        except executor_ipc.ExecutorUnavailable:
+            live = False
+
+        if not live:
+            # 已结束的运行：直接回放数据库里保存的输出
+            if not last_seq and stored_output:
+                for i, line in enumerate(stored_output.split('\n'), 1):
+                    yield sse(line, event_id=i)
+            yield sse(stored_status or '', event='end')
+            return
+
+        try:
+            for event in events:
+                if 'seq' in event:
+                    yield sse(event['line'], event_id=event['seq'])
+                elif event.get('ping'):
+                    yield ': keep-alive\n\n'
+        except executor_ipc.ExecutorUnavailable:
+            pass
+        with app.app_context():
+            finished = db.session.get(TaskRun, run_id)
+            yield sse(finished.status if finished else '', event='end')
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/tasks/<int:task_id>/run', methods=['POST'])
 @login_required
 def run_task_now(task_id):
     task = db.session.get(Task, task_id)
     if not task: return jsonify({'error': 'Task not found'}), 404
     
-    task_executor_pool.submit(run_task_with_context, app, task_id)
+    try:
+        accepted = dispatch_run(task_id, 'manual')
+    except executor_ipc.ExecutorUnavailable as e:
+        logger.error(f"Run request for task {task_id} failed: {e}")
+        return jsonify({'error': '调度进程不可用，请稍后重试'}), 503
+    if not accepted:
+        return jsonify({'success': True, 'deduplicated': True, 'message': '任务已在队列中等待'})
     return jsonify({'success': True, 'message': '任务已加入执行队列'})
 
 @app.route('/api/tasks/<int:task_id>/toggle', methods=['POST'])
@@ -428,28 +1349,184 @@ def toggle_task(task_id):
     if not task: return jsonify({'error': 'Task not found'}), 404
     task.enabled = not task.enabled
     db.session.commit()
-    try:
-        if task.enabled: schedule_task(task)
-        else: scheduler.remove_job(f'task_{task.id}')
-    except: pass
+    sync_task_schedule(task.id)
     return jsonify({'success': True, 'enabled': task.enabled})
 
 # --- 执行逻辑 ---
 
-def run_task_with_context(app_instance, task_id):
+def follow_run_output(run_id, after=0):
+    """
+    跟随运行中任务的输出 (在执行进程内调用)。
+    首条消息为 {'live': bool}，随后为 {'seq', 'line'} 或心跳 {'ping': True}，输出结束即停止。
+    """
+    with RUN_STREAMS_LOCK:
+        buffer = RUN_STREAMS.get(run_id)
+    yield {'live': buffer is not None}
+    if buffer is None:
+        return
+
+    seq, idle = after, 0.0
+    while True:
+        lines, closed = buffer.read_since(seq, timeout=1.0)
+        for seq, line in lines:
+            yield {'seq': seq, 'line': line}
+        if closed:
+            return
+        idle = 0.0 if lines else idle + 1.0
+        if idle >= 15:
+            idle = 0.0
+            yield {'ping': True}
+
+def dispatch_run(task_id, trigger='manual'):
+    """
+    提交一次运行：本进程入队，或转交调度守护进程。
+    返回 False 表示同一任务已在排队 (去重)。
+    """
+    if not RUNS_EXECUTOR:
+        result = executor_ipc.call('run', task_id=task_id, trigger=trigger)
+        if result.get('error'):
+            raise executor_ipc.ExecutorUnavailable(result['error'])
+        return result.get('accepted', True)
+
+    with app.app_context():
+        task = db.session.get(Task, task_id)
+        if not task:
+            logger.error(f"dispatch_run: Task {task_id} not found")
+            return False
+        nice = 0
+        if trigger == 'schedule':
+            nice = task.nice_level if task.nice_level is not None else BACKGROUND_NICE
+        item = QueuedRun(
+            task_id=task.id,
+            trigger=trigger,
+            resource_class=task.resource_class or detect_resource_class(resolve_script_path(task.script_path)),
+            # 手动触发优先于定时触发
+            priority=(task.priority or 0) + (10 if trigger == 'manual' else 0),
+            max_concurrency=task.max_concurrency or 1,
+            nice=nice
+        )
+    return task_queue.submit(item)
+
+def get_queue_stats():
+    if RUNS_EXECUTOR:
+        return task_queue.stats()
+    return executor_ipc.call('queue_stats')
+
+def resolve_script_path(script_path):
+    """将 "[downloads] xxx" 形式的显示名解析为绝对路径"""
+    if script_path.startswith("[downloads] "): 
+        return str(BASE_DIRS['downloads'] / script_path.replace("[downloads] ", "", 1))
+    if script_path.startswith("[autokey] "): 
+        return str(BASE_DIRS['autokey'] / script_path.replace("[autokey] ", "", 1))
+    return script_path
+
+def is_autokey_path(script_path):
+    return 'autokey/data' in script_path or 'MyScripts' in script_path
+
+# 按脚本内容粗略判断资源类别
+BROWSER_HINTS = ('playwright', 'selenium', 'webdriver', 'undetected_chromedriver', 'pyppeteer')
+DISPLAY_HINTS = ('pyautogui', 'xdotool', 'pynput', 'tkinter', 'autopy', 'keyboard.send', 'mouse.click')
+
+def detect_resource_class(script_path):
+    if is_autokey_path(script_path):
+        return 'display'
+    lower = script_path.lower()
+    if lower.endswith('.side'):
+        return 'browser'
+    if lower.endswith('.py'):
+        try:
+            with open(script_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read(200000).lower()
+        except OSError:
+            return 'display'
+        if any(hint in content for hint in BROWSER_HINTS):
+            return 'browser'
+        if any(hint in content for hint in DISPLAY_HINTS):
+            return 'display'
+        return 'light'
+    return 'light'
+
+def sync_task_schedule(task_id):
+    """按数据库中的最新状态重新调度 (任务被删除或停用则移除 Job)"""
+    if not RUNS_EXECUTOR:
+        try:
+            executor_ipc.call('sync', task_id=task_id)
+        except executor_ipc.ExecutorUnavailable as e:
+            # 守护进程启动时会按数据库全量重建调度，这里只记录
+            logger.warning(f"Schedule sync for task {task_id} deferred: {e}")
+        return
+
+    try: scheduler.remove_job(f'task_{task_id}')
+    except: pass
+    task = db.session.get(Task, task_id)
+    if task is None:
+        TASK_STATE.forget(task_id)
+    elif task.enabled:
+        schedule_task(task)
+
+def reconcile_scheduler():
+    """
+    按数据库一次性对齐 APScheduler 中的任务 Job：只移除多余的、添加缺失的、替换触发器有变化的，
+    未变化的 Job 不写 Job Store；system_* 等非任务 Job 不受影响。返回各类数量。
+    """
+    if not RUNS_EXECUTOR:
+        try:
+            return executor_ipc.call('reconcile', timeout=60)
+        except executor_ipc.ExecutorUnavailable as e:
+            # 守护进程启动时会按数据库全量对齐调度，这里只记录
+            logger.warning(f"Schedule reconcile deferred: {e}")
+            return {'deferred': True}
+
+    tasks = Task.query.all()
+    wanted = {f'task_{t.id}': t for t in tasks if t.enabled}
+    jobs = {job.id: job for job in scheduler.get_jobs() if job.id.startswith('task_')}
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0}
+
+    for job_id in jobs.keys() - wanted.keys():
+        try:
+            scheduler.remove_job(job_id)
+            stats['removed'] += 1
+        except Exception as e:
+            logger.warning(f"Remove job {job_id} failed: {e}")
+
+    for job_id, task in wanted.items():
+        try:
+            trigger = build_task_trigger(task, quiet=True)
+        except Exception as e:
+            logger.error(f'Schedule failed for {task.name}: {e}')
+            stats['failed'] += 1
+            continue
+        job = jobs.get(job_id)
+        if job is not None and same_trigger(job.trigger, trigger):
+            stats['unchanged'] += 1
+            continue
+        scheduler.add_job(func=execute_script, trigger=trigger, id=job_id, args=[task.id], replace_existing=True)
+        stats['updated' if job is not None else 'added'] += 1
+
+    existing_ids = {t.id for t in tasks}
+    for task_id in TASK_STATE.snapshot():
+        if task_id not in existing_ids:
+            TASK_STATE.forget(task_id)
+
+    logger.info(f"🗓️ Scheduler reconciled: {stats['added']} added, {stats['updated']} updated, "
+                f"{stats['removed']} removed, {stats['unchanged']} unchanged, {stats['failed']} failed")
+    return stats
+
+def run_task_with_context(app_instance, task_id, trigger='manual', queued=None):
     print(f"🧵 Thread started for task {task_id}")
     try:
         with app_instance.app_context():
-            success = execute_script_core(task_id)
+            success = execute_script_core(task_id, trigger, queued)
             print(f"🧵 Thread finished for task {task_id}, Success: {success}")
     except Exception as e:
         print(f"❌ Thread error: {e}")
         import traceback
         traceback.print_exc()
 
-def execute_script_core(task_id):
+def execute_script_core(task_id, trigger='schedule', queued=None):
     """
     核心执行逻辑，需在 App Context 内调用
+    queued: 来自执行队列的 QueuedRun (记录资源类别、等待时间、nice 值)
     """
     task = db.session.get(Task, task_id)
     if not task:
@@ -458,68 +1535,146 @@ def execute_script_core(task_id):
     
     print(f"🚀 Executing task: {task.name} ({task.script_path})")
     
-    # 更新运行时间
-    task.last_run = datetime.now(SYSTEM_TZ).replace(tzinfo=None)
+    # 更新运行时间 (写回缓存，批量落库) + 创建运行记录
+    started_at = datetime.now(SYSTEM_TZ).replace(tzinfo=None)
+    TASK_STATE.update(task.id, last_run=started_at)
+    run = TaskRun(task_id=task.id, started_at=started_at, trigger=trigger, status='Running')
+    if queued is not None:
+        run.resource_class = queued.resource_class
+        run.wait_seconds = round(queued.wait_seconds, 3)
+        QUEUE_WAIT.observe(queued.wait_seconds, resource_class=queued.resource_class)
+        if queued.deferred_since is not None:
+            run.deferred_seconds = round(queued.deferred_seconds, 3)
+            run.defer_reason = queued.defer_reason
+    db.session.add(run)
     db.session.commit()
+    started = time.monotonic()
+    run_info = {'buffer': RunOutputBuffer(), 'nice': queued.nice if queued is not None else 0,
+                'speed_profile': task.speed_profile, 'headless': bool(task.headless),
+                'run_id': run.id, 'timeout': task.timeout_seconds, 'warm_start': bool(task.warm_start),
+                'side_engine': task.side_engine or SIDE_ENGINE}
+    with RUN_STREAMS_LOCK:
+        RUN_STREAMS[run.id] = run_info['buffer']
+    if run.deferred_seconds:
+        run_info['buffer'].write(f"⏸️ Deferred {run.deferred_seconds:.0f}s by memory admission control ({run.defer_reason})")
 
-    script_path = task.script_path
-    
-    # 路径清理
     # 路径清理与绝对路径解析
-    original_path = script_path
-    if script_path.startswith("[downloads] "): 
-        filename = script_path.replace("[downloads] ", "", 1)
-        script_path = str(BASE_DIRS['downloads'] / filename)
-    elif script_path.startswith("[autokey] "): 
-        filename = script_path.replace("[autokey] ", "", 1)
-        script_path = str(BASE_DIRS['autokey'] / filename)
+    original_path = task.script_path
+    script_path = resolve_script_path(original_path)
     
     # 检查文件是否存在
-    if not os.path.exists(script_path) and not ('autokey/data' in script_path or 'MyScripts' in script_path):
+    if not os.path.exists(script_path) and not is_autokey_path(script_path):
          # AutoKey 脚本可能只是目录或逻辑名，先不强制检查物理路径，但在 try block 里会处理
          # 这里主要拦截 Python/Side 脚本
          logger.error(f"❌ Script file not found: {script_path} (Original: {original_path})")
-         task.last_status = 'File Missing'
-         db.session.commit()
+         TASK_STATE.update(task.id, last_status='File Missing')
+         finish_task_run(run, started, 'File Missing', {'output': f'Script file not found: {script_path}'})
          return False
     
     success = False
+    display_pool = None
     
     try:
+        # GUI 任务租用独立的 Xvfb 显示器 (AutoKey 绑定在 :1，不参与)
+        if not is_autokey_path(script_path) and not task.headless and not task.watch_live:
+            display_pool = get_display_pool()
+            if display_pool is not None:
+                try:
+                    run_info['display'] = display_pool.lease(timeout=DISPLAY_LEASE_TIMEOUT)
+                except Exception as e:
+                    # Xvfb 缺失或启动失败：与租用超时一样退回共享桌面
+                    logger.warning(f"⚠️ Isolated display failed to start for {task.name}: {e}")
+                    run_info['buffer'].write(f"⚠️ Isolated display failed to start ({e}), falling back to shared display :1")
+                    run_info['display'] = None
+                else:
+                    if run_info['display'] is None:
+                        run_info['buffer'].write("⚠️ No isolated display free, falling back to shared display :1")
+                    else:
+                        run_info['buffer'].write(f"🖥️ Using isolated display {run_info['display'].display}")
+        if get_display_pool() is not None and run_info.get('display') is None and not task.headless \
+                and queued is not None and queued.resource_class == 'display':
+            if not SHARED_DESKTOP_LOCK.acquire(timeout=SHARED_DESKTOP_TIMEOUT):
+                raise TimeoutError(f"Shared display :1 still busy after {SHARED_DESKTOP_TIMEOUT}s")
+            run_info['desktop_lock'] = True
+
         # 优先识别 AutoKey (匹配 MyScripts 或 autokey/data)
-        if 'autokey/data' in script_path or 'MyScripts' in script_path:
+        if is_autokey_path(script_path):
              # === 关键修复：传递完整文件名 (含后缀) ===
              script_name = Path(script_path).name
              print(f"🔄 Detected AutoKey script by path: {script_name}")
-             success = execute_autokey_script(script_name, task.name)
+             run.executor = 'autokey'
+             with ACTIVE_RUNS.track(executor=run.executor):
+                 success = execute_autokey_script(script_name, task.name, run_info)
              
         elif script_path.lower().endswith('.py'):
             print(f"🐍 Running as standard Python script: {script_path}")
-            success = execute_python_script(task.name, script_path)
+            run.executor = 'python'
+            with ACTIVE_RUNS.track(executor=run.executor):
+                success = execute_python_script(task.name, script_path, run_info)
             
         elif script_path.lower().endswith('.side'):
-            success = execute_selenium_script(task.name, script_path)
+            run.executor = run_info['side_engine']
+            with ACTIVE_RUNS.track(executor=run.executor):
+                success = execute_selenium_script(task.name, script_path, run_info)
         else:
             logger.error(f"Unsupported script type: {script_path}")
             success = False
         
-        task.last_status = 'Success' if success else 'Failed'
-        db.session.commit()
+        status = 'Success' if success else 'Failed'
+        TASK_STATE.update(task.id, last_status=status)
+        finish_task_run(run, started, status, run_info)
         return success
 
     except Exception as e:
         logger.error(f"Execution Exception {task.name}: {e}")
-        task.last_status = 'Error'
-        db.session.commit()
+        db.session.rollback()
+        TASK_STATE.update(task.id, last_status='Error')
+        run_info.setdefault('output', str(e))
+        finish_task_run(run, started, 'Error', run_info)
         return False
+    finally:
+        if run_info.get('display') is not None:
+            display_pool.release(run_info['display'])
+        if run_info.pop('desktop_lock', False):
+            SHARED_DESKTOP_LOCK.release()
+
+def finish_task_run(run, started, status, run_info):
+    """写入运行结果并按保留策略裁剪历史"""
+    run.finished_at = datetime.now(SYSTEM_TZ).replace(tzinfo=None)
+    run.duration = round(time.monotonic() - started, 3)
+    run.status = status
+    RUN_DURATION.observe(run.duration, executor=run.executor or 'unknown', status=status)
+    run.exit_code = run_info.get('exit_code')
+    run.output = truncate_output(run_info.get('output'))
+    run.locator_hits = run_info.get('locator_hits')
+    run.locator_misses = run_info.get('locator_misses')
+    usage = run_info.get('usage') or {}
+    run.cpu_user = usage.get('cpu_user')
+    run.cpu_sys = usage.get('cpu_sys')
+    run.peak_rss_kb = usage.get('peak_rss_kb')
+    try:
+        db.session.commit()
+    finally:
+        # 提交失败也要结束输出流，否则跟随的 SSE 连接会一直挂起
+        buffer = run_info.get('buffer')
+        if buffer is not None:
+            buffer.close()
+            with RUN_STREAMS_LOCK:
+                RUN_STREAMS.pop(run.id, None)
+    try:
+        prune_task_runs(run.task_id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Prune runs failed for task {run.task_id}: {e}")
 
 def execute_script(task_id):
-    with app.app_context():
-        execute_script_core(task_id)
+    """APScheduler 触发入口：只负责入队，立即返回"""
+    dispatch_run(task_id, 'schedule')
 
 # --- 具体执行器 ---
 
-def get_desktop_env():
+def get_desktop_env(display=None):
+    """display: 显示器池租用的 VirtualDisplay；为空时使用 VNC 桌面 :1"""
     env = os.environ.copy()
     env['DISPLAY'] = ':1'
     env['HOME'] = '/home/headless'
@@ -542,49 +1697,112 @@ def get_desktop_env():
                         env[key] = value
         except Exception as e:
             logger.warning(f"Failed to parse .dbus-env: {e}")
+    if display is not None:
+        env.update(display.env())
     return env
 
-def get_telegram_config():
-    return os.environ.get('TELEGRAM_BOT_TOKEN'), os.environ.get('TELEGRAM_CHAT_ID')
-
-def execute_selenium_script(task_name, script_path):
-    from scripts.task_executor import SeleniumIDEExecutor, send_telegram_notification, send_email_notification
-    bot_token, chat_id = get_telegram_config()
-    os.environ.update(get_desktop_env())
+def execute_selenium_script(task_name, script_path, run_info=None):
+    if (run_info or {}).get('side_engine') == 'playwright':
+        return execute_playwright_side(task_name, script_path, run_info)
+    from scripts.task_executor import SeleniumIDEExecutor, get_driver_pool
+    headless = bool((run_info or {}).get('headless'))
+    display = (run_info or {}).get('display')
+    if not headless and display is None:
+        os.environ.update(get_desktop_env())
     try:
-        executor = SeleniumIDEExecutor(script_path)
+        buffer = run_info.get('buffer') if run_info is not None else None
+        profile = get_profile((run_info or {}).get('speed_profile'))
+        # 预热池中的会话绑定在 :1，独立显示器上的运行需新建 Chrome
+        driver_pool = get_driver_pool(headless) if display is None else None
+        executor = SeleniumIDEExecutor(script_path, driver_pool=driver_pool, output=buffer, profile=profile,
+                                       headless=headless, display_env=display.env() if display else None,
+                                       timeout=run_info.get('timeout') or MAX_SCRIPT_TIMEOUT, run_id=run_info.get('run_id'))
         success, message = executor.execute()
-        if bot_token and chat_id: send_telegram_notification(f"{task_name} (Selenium)", success, message, bot_token, chat_id)
-        send_email_notification(f"{task_name} (Selenium)", success, message)
+        if run_info is not None:
+            log_msg = f"{buffer.text()}\n{message}".strip() if buffer is not None else message
+            run_info.update(exit_code=0 if success else 1, output=log_msg,
+                            locator_hits=executor.locator_stats['hits'], locator_misses=executor.locator_stats['misses'],
+                            usage=executor.resource_usage)
+        notify(f"{task_name} (Selenium)", success, message)
         return success
     except Exception as e:
         logger.error(f"Selenium Error: {e}")
+        if run_info is not None: run_info['output'] = f"Selenium Error: {e}"
         return False
 
-def execute_python_script(task_name, script_path):
-    bot_token, chat_id = get_telegram_config()
-    env = get_desktop_env()
-    
-    # 健康检查：确保 X11 显示可用（对于需要 GUI 的脚本至关重要）
+def execute_playwright_side(task_name, script_path, run_info=None):
+    """.side 的 Playwright 引擎：共享浏览器进程，每次运行一个独立 context"""
+    from scripts.playwright_side import PlaywrightSideExecutor
+    display = (run_info or {}).get('display')
     try:
-        check = subprocess.run(['xdpyinfo'], env=env, capture_output=True, timeout=5)
-        if check.returncode != 0:
-            logger.warning(f"⚠️ X11 display not available, attempting to restart VNC...")
-            subprocess.run(['supervisorctl', 'restart', 'vncserver'], capture_output=True, timeout=30)
-            time.sleep(5)  # 等待 VNC 重启
+        buffer = run_info.get('buffer') if run_info is not None else None
+        executor = PlaywrightSideExecutor(script_path, output=buffer, profile=get_profile((run_info or {}).get('speed_profile')),
+                                          headless=bool((run_info or {}).get('headless')),
+                                          display_env=display.env() if display else None,
+                                          timeout=(run_info or {}).get('timeout') or MAX_SCRIPT_TIMEOUT,
+                                          run_id=(run_info or {}).get('run_id'))
+        success, message = executor.execute()
+        if run_info is not None:
+            log_msg = f"{buffer.text()}\n{message}".strip() if buffer is not None else message
+            run_info.update(exit_code=0 if success else 1, output=log_msg,
+                            locator_hits=executor.locator_stats['hits'], locator_misses=executor.locator_stats['misses'])
+        notify(f"{task_name} (Playwright)", success, message)
+        return success
     except Exception as e:
-        logger.warning(f"X11 check skipped: {e}")
+        logger.error(f"Playwright Error: {e}")
+        if run_info is not None: run_info['output'] = f"Playwright Error: {e}"
+        return False
+
+def execute_python_script(task_name, script_path, run_info=None):
+    display = (run_info or {}).get('display')
+    env = get_desktop_env(display)
+    
+    if (run_info or {}).get('headless'):
+        # 无头任务: 脚本通过 AUTOMATION_HEADLESS=1 自行启用 headless 浏览器，无需检查 X11
+        env['AUTOMATION_HEADLESS'] = '1'
+    elif display is None:
+        # 健康检查：确保 X11 显示可用（对于需要 GUI 的脚本至关重要）
+        try:
+            check = subprocess.run(['xdpyinfo'], env=env, capture_output=True, timeout=5)
+            if check.returncode != 0:
+                logger.warning(f"⚠️ X11 display not available, attempting to restart VNC...")
+                subprocess.run(['supervisorctl', 'restart', 'vncserver'], capture_output=True, timeout=30)
+                time.sleep(5)  # 等待 VNC 重启
+        except Exception as e:
+            logger.warning(f"X11 check skipped: {e}")
     
     try:
         cmd = [sys.executable, script_path]
         print(f"Running command: {cmd}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300, env=env)
+        env['PYTHONUNBUFFERED'] = '1'  # 逐行实时输出
+        if (run_info or {}).get('run_id') is not None:
+            # 标记脚本拉起的浏览器进程，运行结束后残留的可被回收
+            env[RUN_MARKER_ENV] = str(run_info['run_id'])
+        buffer = (run_info or {}).get('buffer') or RunOutputBuffer()
+        usage = {}
+        timeout = (run_info or {}).get('timeout') or MAX_SCRIPT_TIMEOUT
+        returncode = None
+        if (run_info or {}).get('warm_start') and warm_runner_available():
+            try:
+                returncode = run_warm(script_path, env=env, timeout=timeout, buffer=buffer, nice=(run_info or {}).get('nice'),
+                                      usage=usage, memory_limit_mb=SCRIPT_MEMORY_LIMIT_MB)
+            except WarmRunnerUnavailable as e:
+                # 预热进程不可用时退回冷启动，任务照常运行
+                logger.warning(f"⚠️ {e}, falling back to a fresh interpreter")
+                buffer.write(f"⚠️ {e}, falling back to a fresh interpreter")
+        if returncode is None:
+            returncode = run_streamed(cmd, env=env, timeout=timeout, buffer=buffer, nice=(run_info or {}).get('nice'),
+                                      usage=usage, memory_limit_mb=SCRIPT_MEMORY_LIMIT_MB)
+        if usage:
+            buffer.write(describe_usage(usage))
         
-        success = result.returncode == 0
-        log_msg = (result.stdout + "\n" + result.stderr).strip() or "No output"
+        success = returncode == 0
+        log_msg = buffer.text().strip() or "No output"
+        if run_info is not None:
+            run_info.update(exit_code=returncode, output=log_msg, usage=usage)
         
         if success: logger.info(f"Python {task_name} Success: {log_msg[:100]}...")
-        else: logger.error(f"Python {task_name} Failed: {result.stderr}")
+        else: logger.error(f"Python {task_name} Failed: {log_msg[-500:]}")
         
         script_type = "(Py)"
         try:
@@ -597,80 +1815,94 @@ def execute_python_script(task_name, script_path):
         except:
             pass
         
-        from scripts.task_executor import send_telegram_notification, send_email_notification
-        if bot_token and chat_id: send_telegram_notification(f"{task_name} {script_type}", success, log_msg, bot_token, chat_id)
-        send_email_notification(f"{task_name} {script_type}", success, log_msg)
+        notify(f"{task_name} {script_type}", success, log_msg)
         return success
     except Exception as e:
         logger.error(f"Python Exception: {e}")
+        if run_info is not None: run_info['output'] = f"Python Exception: {e}"
         return False
 
-def execute_autokey_script(script_name, task_name):
-    bot_token, chat_id = get_telegram_config()
+def execute_autokey_script(script_name, task_name, run_info=None):
     env = get_desktop_env()
-    log_msg = ""
+    buffer = (run_info or {}).get('buffer') or RunOutputBuffer()
+    client = get_autokey_client(get_desktop_env)
+    use_dbus = client.available()
+
+    # 服务健康检查与自动恢复
+    ensure_autokey_alive(client if use_dbus else None, env)
+    buffer.write("--- Console Output ---")
+
+    # 登记本次运行，包装脚本把本次运行的输出与 BEGIN / END 标记写入按令牌命名的文件，由 follower 转发过来
+    candidates = [script_name]
+    if script_name.endswith('.py'):
+        candidates.append(Path(script_name).stem)
+    tailer = get_autokey_tailer()
+    run = tailer.submit(candidates, buffer)
+
+    if use_dbus:
+        triggered = trigger_autokey_dbus(client, buffer)
+    else:
+        triggered = trigger_autokey_cli(env, buffer)
+
+    if not triggered:
+        tailer.cancel(run)
+        returncode = 1
+    else:
+        status = run.wait(start_timeout=AUTOKEY_START_TIMEOUT, timeout=(run_info or {}).get('timeout') or AUTOKEY_RUN_TIMEOUT)
+        if status == 'ok':
+            returncode = 0
+        elif status is None:
+            tailer.cancel(run)
+            phase = 'finish' if run.begun.is_set() else 'start'
+            buffer.write(f"⏱️ AutoKey script did not {phase} in time")
+            returncode = -9
+        else:
+            returncode = 1
+
+    success = returncode == 0
+    log_msg = buffer.text().strip() or "No output captured."
+    if run_info is not None:
+        run_info.update(exit_code=returncode, output=log_msg)
     
-    # === 日志捕获改进 (Start) ===
-    # 记录当前日志位置
-    start_pos = 0
-    try:
-        if os.path.exists('/app/logs/autokey.log'):
-            start_pos = os.path.getsize('/app/logs/autokey.log')
-    except: pass
+    if success: logger.info(f"AutoKey {script_name} Success")
+    else: logger.error(f"AutoKey Failed: {log_msg[-500:]}")
     
-    # === 增强逻辑：服务健康检查与自动恢复 ===
+    notify(f"{task_name} (AutoKey)", success, log_msg)
+    return success
+
+def ensure_autokey_alive(client, env):
+    """AutoKey 服务不在线时自动重启 (client 为 None 时用 autokey-run -l 探测)"""
+    if client is not None:
+        if not client.alive():
+            logger.warning("⚠️ AutoKey service is not on the session bus. Triggering self-healing...")
+            reload_autokey()
+        return
     try:
-        # 预检查：探测 AutoKey 服务是否存活
         check_res = subprocess.run(['autokey-run', '-l'], capture_output=True, env=env, timeout=5)
         if check_res.returncode != 0:
             logger.warning("⚠️ AutoKey service seems down (check failed). Triggering self-healing...")
             reload_autokey()
-            time.sleep(2) # 给一点额外缓冲
     except Exception as e:
         logger.error(f"AutoKey health check error: {e}")
         reload_autokey()
 
-    # 策略 1: 尝试完整文件名 (例如 test_browser.py)
-    cmd = ['autokey-run', '-s', script_name]
-    print(f"Running AutoKey (Try 1): {cmd}")
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300, env=env)
-    
-    # 策略 2: 如果失败，尝试去掉后缀 (例如 test_browser)
-    if result.returncode != 0 and script_name.endswith('.py'):
-        stem = Path(script_name).stem
-        cmd_retry = ['autokey-run', '-s', stem]
-        print(f"Running AutoKey (Try 2): {cmd_retry}")
-        result = subprocess.run(cmd_retry, capture_output=True, text=True, timeout=300, env=env)
-
-    success = result.returncode == 0
-    
-    # === 构建日志通知 ===
-    # 1. 控制台输出 (Stdout/Stderr)
-    console_out = (result.stdout + "\n" + result.stderr).strip()
-    if console_out:
-        log_msg += f"--- Console Output ---\n{console_out}\n\n"
-
-    # 2. AutoKey 日志文件 (Hack: 等待异步写入)
-    if success:
-        time.sleep(2) # 等待脚本可能的输出
-        try:
-            with open('/app/logs/autokey.log', 'r') as f:
-                f.seek(start_pos)
-                new_logs = f.read()
-                if new_logs.strip():
-                    log_msg += f"--- Script Log (autokey.log) ---\n{new_logs}"
-        except Exception as e:
-            logger.error(f"Failed to read autokey logs: {e}")
+def trigger_autokey_dbus(client, buffer):
+    """通过 D-Bus 长连接触发包装脚本"""
+    try:
+        _, error = client.run(AUTOKEY_RUNNER_NAME)
+    except AutoKeyUnavailable as e:
+        buffer.write(f"❌ {e}")
+        return False
+    if error:
+        buffer.write(f"❌ AutoKey could not run script: {error}")
+        return False
+    return True
 
-    log_msg = log_msg.strip() or "No output captured."
-    
-    if success: logger.info(f"AutoKey {script_name} Success")
-    else: logger.error(f"AutoKey Failed: {result.stderr}")
-    
-    from scripts.task_executor import send_telegram_notification, send_email_notification
-    if bot_token and chat_id: send_telegram_notification(f"{task_name} (AutoKey)", success, log_msg, bot_token, chat_id)
-    send_email_notification(f"{task_name} (AutoKey)", success, log_msg)
-    return success
+def trigger_autokey_cli(env, buffer):
+    """无 dbus-python 时的兼容路径：启动 autokey-run 触发包装脚本"""
+    cmd = ['autokey-run', '-s', AUTOKEY_RUNNER_NAME]
+    print(f"Running AutoKey: {cmd}")
+    return run_streamed(cmd, env=env, timeout=30, buffer=buffer) == 0
 
 def reload_autokey():
     """强制重启 AutoKey 以加载新脚本 (带健康检查)"""
@@ -695,6 +1927,18 @@ def reload_autokey():
         
         # 3. Wait for DBus service polling
         logger.info("⏳ Waiting for AutoKey DBus service...")
+        client = get_autokey_client(get_desktop_env)
+        if client.available():
+            # 直接查询总线上的服务名，无需反复启动 autokey-run
+            started = time.monotonic()
+            if client.wait_ready(timeout=10, process=pro):
+                logger.info(f"✅ AutoKey restarted and ready (waited {time.monotonic() - started:.1f}s)")
+            elif pro.poll() is not None:
+                logger.error("❌ AutoKey process died unexpectedly")
+            else:
+                logger.warning("⚠️ AutoKey restart timed out waiting for DBus (but process is running)")
+            return
+
         for i in range(20): # Max 10 seconds
             time.sleep(0.5)
             # 尝试列出脚本，如果成功则说明 DBus 服务已就绪
@@ -714,38 +1958,44 @@ def reload_autokey():
     except Exception as e:
         logger.error(f"❌ Failed to reload AutoKey: {e}")
 
+def build_task_trigger(task, quiet=False):
+    """任务的 CronTrigger (随机模式为开始时间 + 窗口期 jitter)，表达式非法时抛出 ValueError"""
+    if getattr(task, 'schedule_type', 'cron') == 'random' and task.random_start and task.random_end:
+        try:
+            start_h, start_m = map(int, task.random_start.split(':'))
+            end_h, end_m = map(int, task.random_end.split(':'))
+            
+            now = datetime.now(SYSTEM_TZ)
+            start_dt = now.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
+            end_dt = now.replace(hour=end_h, minute=end_m, second=0, microsecond=0)
+            
+            if end_dt < start_dt:
+                end_dt += timedelta(days=1)
+            
+            diff_seconds = int((end_dt - start_dt).total_seconds())
+            if diff_seconds < 60: diff_seconds = 60
+            
+            trigger = CronTrigger(
+                hour=start_h, 
+                minute=start_m, 
+                jitter=diff_seconds, 
+                timezone=SYSTEM_TZ
+            )
+            if not quiet:
+                logger.info(f"Task {task.name}: Random schedule {task.random_start}-{task.random_end} (window: {diff_seconds}s)")
+            return trigger
+        except Exception as e:
+            logger.error(f"Random schedule parse error for {task.name}: {e}")
+    return CronTrigger.from_crontab(task.cron_expression or '', timezone=SYSTEM_TZ)
+
+def same_trigger(a, b):
+    return (type(a) is type(b) and str(a) == str(b) and getattr(a, 'jitter', None) == getattr(b, 'jitter', None)
+            and str(getattr(a, 'timezone', '')) == str(getattr(b, 'timezone', '')))
+
 def schedule_task(task):
     if task.enabled:
         try:
-            trigger = None
-            if getattr(task, 'schedule_type', 'cron') == 'random' and task.random_start and task.random_end:
-                try:
-                    start_h, start_m = map(int, task.random_start.split(':'))
-                    end_h, end_m = map(int, task.random_end.split(':'))
-                    
-                    now = datetime.now(SYSTEM_TZ)
-                    start_dt = now.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
-                    end_dt = now.replace(hour=end_h, minute=end_m, second=0, microsecond=0)
-                    
-                    if end_dt < start_dt:
-                        end_dt += timedelta(days=1)
-                    
-                    diff_seconds = int((end_dt - start_dt).total_seconds())
-                    if diff_seconds < 60: diff_seconds = 60
-                    
-                    trigger = CronTrigger(
-                        hour=start_h, 
-                        minute=start_m, 
-                        jitter=diff_seconds, 
-                        timezone=SYSTEM_TZ
-                    )
-                    logger.info(f"Task {task.name}: Random schedule {task.random_start}-{task.random_end} (window: {diff_seconds}s)")
-                except Exception as e:
-                    logger.error(f"Random schedule parse error for {task.name}: {e}")
-                    trigger = CronTrigger.from_crontab(task.cron_expression, timezone=SYSTEM_TZ)
-            else:
-                trigger = CronTrigger.from_crontab(task.cron_expression, timezone=SYSTEM_TZ)
-            
+            trigger = build_task_trigger(task)
             if trigger:
                 job = scheduler.add_job(
                     func=execute_script,
@@ -760,6 +2010,7 @@ def schedule_task(task):
 
 def initialize_system():
     with app.app_context():
+        logger.info(f"🗄️ Database engine: {db_profiles.describe(db.engine)}")
         try:
             admin_user = os.environ.get('ADMIN_USERNAME', 'admin')
             admin_pass = os.environ.get('ADMIN_PASSWORD', 'admin123')
@@ -787,12 +2038,56 @@ def initialize_system():
                     print(f"Security: Removed stale user '{u.username}'")
             db.session.commit()
             
-            tasks = Task.query.filter_by(enabled=True).all()
-            for task in tasks:
-                schedule_task(task)
+            if not RUNS_EXECUTOR:
+                return
+
+            # 按数据库对齐持久化 Job Store：补齐缺失 / 清理已删除或停用任务的残留 Job，未变化的不重写
+            reconcile_scheduler()
+
+            # 启动通知派发线程 (补发重启前 Outbox 中未送达的消息)
+            get_dispatcher()
+            TASK_STATE.start()
+
+            # 安装 AutoKey 包装脚本并启动输出 follower；请求目录属主不对时在启动时报错，而不是每次运行失败
+            try:
+                ensure_autokey_request_dir()
+            except PermissionError as e:
+                logger.error(f"❌ AutoKey request directory unusable, AutoKey tasks will fail: {e}")
+            try:
+                if install_runner('/home/headless/.config/autokey/data'):
+                    reload_autokey()
+                get_autokey_tailer().start()
+            except Exception as e:
+                logger.warning(f"AutoKey runner setup skipped: {e}")
+
+            if ORPHAN_REAPER_INTERVAL > 0:
+                scheduler.add_job(
+                    func=reap_orphan_processes,
+                    trigger='interval',
+                    seconds=ORPHAN_REAPER_INTERVAL,
+                    id='system_reap_orphans',
+                    replace_existing=True
+                )
+
+            scheduler.add_job(
+                func=prune_run_history,
+                trigger='interval',
+                hours=6,
+                id='system_prune_runs',
+                replace_existing=True
+            )
         except Exception as e:
             print(f"Init error: {e}")
 
+        # 预热 Chrome 会话池 (CHROME_POOL_SIZE > 0 时生效)
+        if int(os.environ.get('CHROME_POOL_SIZE', '0') or 0) > 0:
+            try:
+                os.environ.update(get_desktop_env())
+                from scripts.task_executor import get_driver_pool
+                get_driver_pool()
+            except Exception as e:
+                logger.error(f"Chrome pool warmup failed: {e}")
+
 initialize_system()
 
 if __name__ == '__main__':
@@ -18,7 +18,7 @@ class Config:
     TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '')
     
     # 任务执行配置
-    MAX_SCRIPT_TIMEOUT = 300  # 脚本最大执行时间（秒）
+    MAX_SCRIPT_TIMEOUT = int(os.environ.get('MAX_SCRIPT_TIMEOUT', '300'))  # 脚本最大执行时间（秒），任务可单独设置
     RETRY_FAILED_TASKS = True
     MAX_RETRIES = 3
     
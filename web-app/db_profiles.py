@@ -0,0 +1,81 @@
+"""
+按数据库后端区分的引擎配置
+
+- SQLite: WAL (读不阻塞写) + synchronous=NORMAL + busy_timeout + mmap，在每个新连接上通过 PRAGMA 设置
+- MariaDB/MySQL: 固定大小的连接池，pool_pre_ping 检测被服务端断开的空闲连接，
+  pool_recycle 在服务端 wait_timeout 之前主动重建连接
+均可通过环境变量调整。
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# SQLite (数据目录位于不支持共享内存的网络文件系统时，将 SQLITE_JOURNAL_MODE 设为 DELETE)
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '10000'))
+SQLITE_MMAP_SIZE_MB = int(os.environ.get('SQLITE_MMAP_SIZE_MB', '64'))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '8192'))
+
+# MariaDB / MySQL 连接池
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '5'))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '280'))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+
+def sqlite_pragmas():
+    return [
+        f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}',
+        f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}',
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+        f'PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}',
+        f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS (create_engine 参数)"""
+    backend = make_url(uri).get_backend_name()
+    if backend == 'sqlite':
+        # pysqlite 自身的锁等待与 busy_timeout 保持一致
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if backend in ('mysql', 'mariadb'):
+        return {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+            'pool_pre_ping': DB_POOL_PRE_PING
+        }
+    return {}
+
+
+def configure_engine(engine):
+    """在引擎建立第一个连接之前调用：SQLite 新连接上执行 PRAGMA"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def describe(engine):
+    if engine.dialect.name == 'sqlite':
+        return (f"sqlite (journal_mode={SQLITE_JOURNAL_MODE}, synchronous={SQLITE_SYNCHRONOUS}, "
+                f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}ms, mmap={SQLITE_MMAP_SIZE_MB}MB)")
+    if engine.dialect.name in ('mysql', 'mariadb'):
+        return (f"{engine.dialect.name} (pool {DB_POOL_SIZE}+{DB_MAX_OVERFLOW}, recycle {DB_POOL_RECYCLE}s, "
+                f"pre_ping={'on' if DB_POOL_PRE_PING else 'off'})")
+    return engine.dialect.name
@@ -0,0 +1,115 @@
+"""
+Web 层与调度/执行守护进程之间的本地 IPC (Unix Socket)
+
+协议: 每行一个 JSON。客户端发送一行请求 {"op": ..., ...}，
+服务端回写一行或多行 JSON (流式操作会持续输出，直到连接关闭)。
+"""
+
+import os
+import json
+import socket
+import logging
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_SOCKET = os.environ.get('EXECUTOR_SOCKET', '/tmp/automation-executor.sock')
+
+
+class ExecutorUnavailable(Exception):
+    """守护进程未运行或无响应"""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            self._send({'error': 'Invalid request'})
+            return
+
+        handler = self.server.ops.get(request.get('op'))
+        if handler is None:
+            self._send({'error': f"Unknown op: {request.get('op')}"})
+            return
+
+        try:
+            result = handler(request)
+            # 生成器 = 流式响应
+            if hasattr(result, '__next__'):
+                for item in result:
+                    self._send(item)
+            else:
+                self._send(result if result is not None else {'success': True})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            logger.error(f"IPC op {request.get('op')} failed: {e}")
+            try:
+                self._send({'error': str(e)})
+            except OSError:
+                pass
+
+    def _send(self, obj):
+        self.wfile.write(json.dumps(obj, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class ExecutorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, ops, path=EXECUTOR_SOCKET):
+        self.ops = ops
+        self.path = path
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _connect(timeout):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(EXECUTOR_SOCKET)
+    except OSError as e:
+        sock.close()
+        raise ExecutorUnavailable(f'Executor daemon unavailable: {e}')
+    return sock
+
+
+def call(op, timeout=5, **payload):
+    """单次请求-响应"""
+    sock = _connect(timeout)
+    try:
+        sock.sendall(json.dumps(dict(payload, op=op)).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    except OSError as e:
+        raise ExecutorUnavailable(f'Executor daemon did not respond: {e}')
+    finally:
+        sock.close()
+    if not line:
+        raise ExecutorUnavailable('Executor daemon closed the connection')
+    return json.loads(line)
+
+
+def stream(op, timeout=30, **payload):
+    """流式请求，逐条产出服务端消息"""
+    sock = _connect(timeout)
+    try:
+        sock.sendall(json.dumps(dict(payload, op=op)).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            for line in f:
+                yield json.loads(line)
+    except OSError as e:
+        raise ExecutorUnavailable(f'Executor stream interrupted: {e}')
+    finally:
+        sock.close()
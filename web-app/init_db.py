@@ -1,6 +1,11 @@
 import os
 from sqlalchemy import text, inspect
-from app import app, db, User
+
+# 以 root 在 supervisord 之前运行：只作为 Web 角色导入 app，
+# 不启动调度器 / 执行队列 / AutoKey 等 (否则停机期间到期的 Job 会在这个短命进程里被触发并消耗掉)
+os.environ['AUTOMATION_ROLE'] = 'web'
+
+from app import app, db, User, SyncState
 
 def initialize_database():
     """
@@ -22,10 +27,63 @@ def initialize_database():
                         conn.execute(text('ALTER TABLE task ADD COLUMN random_start VARCHAR(10)'))
                     if 'random_end' not in columns:
                         conn.execute(text('ALTER TABLE task ADD COLUMN random_end VARCHAR(10)'))
+                    if 'resource_class' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN resource_class VARCHAR(20)'))
+                    if 'priority' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN priority INTEGER DEFAULT 0'))
+                    if 'max_concurrency' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN max_concurrency INTEGER DEFAULT 1'))
+                    if 'nice_level' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN nice_level INTEGER'))
+                    if 'speed_profile' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN speed_profile VARCHAR(20)'))
+                    if 'headless' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN headless BOOLEAN DEFAULT 0'))
+                    if 'watch_live' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN watch_live BOOLEAN DEFAULT 0'))
+                    if 'timeout_seconds' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN timeout_seconds INTEGER'))
+                    if 'warm_start' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN warm_start BOOLEAN DEFAULT 0'))
+                    if 'side_engine' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN side_engine VARCHAR(20)'))
+                    if 'version' not in columns:
+                        conn.execute(text('ALTER TABLE task ADD COLUMN version BIGINT DEFAULT 0'))
+                        conn.execute(text('CREATE INDEX ix_task_version ON task (version)'))
+                    conn.commit()
+            if inspector.has_table("task_run"):
+                columns = [c['name'] for c in inspector.get_columns('task_run')]
+                with db.engine.connect() as conn:
+                    if 'resource_class' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN resource_class VARCHAR(20)'))
+                    if 'wait_seconds' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN wait_seconds FLOAT'))
+                    if 'deferred_seconds' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN deferred_seconds FLOAT'))
+                    if 'defer_reason' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN defer_reason VARCHAR(200)'))
+                    if 'locator_hits' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN locator_hits INTEGER'))
+                    if 'locator_misses' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN locator_misses INTEGER'))
+                    if 'cpu_user' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN cpu_user FLOAT'))
+                    if 'cpu_sys' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN cpu_sys FLOAT'))
+                    if 'peak_rss_kb' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN peak_rss_kb INTEGER'))
+                    if 'version' not in columns:
+                        conn.execute(text('ALTER TABLE task_run ADD COLUMN version BIGINT DEFAULT 0'))
+                        conn.execute(text('CREATE INDEX ix_task_run_version ON task_run (version)'))
                     conn.commit()
         except Exception as e:
             print(f"Migration check skipped: {e}")
 
+        # 增量同步版本号 (单行)，预先创建避免并发首次写入时重复插入
+        if not db.session.get(SyncState, 1):
+            db.session.add(SyncState(id=1, version=0))
+            db.session.commit()
+
         # 初始化管理员
         admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
         admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+调度/执行守护进程
+
+独立于 gunicorn Web Worker 运行 APScheduler 与任务执行线程池，
+Web 层通过 Unix Socket (executor_ipc) 提交运行、同步调度、订阅输出、查询队列。
+Web Worker 扩容或被 --max-requests 回收都不会影响正在运行的任务。
+"""
+
+import os
+import sys
+import signal
+import threading
+
+os.environ.setdefault('AUTOMATION_ROLE', 'scheduler')
+
+from app import app, scheduler, task_queue, get_dispatcher, dispatch_run, sync_task_schedule, reconcile_scheduler, \
+    follow_run_output, get_queue_stats, scheduler_alive, collect_metrics, logger, RUNS_EXECUTOR, TASK_STATE
+from executor_ipc import ExecutorServer, EXECUTOR_SOCKET
+from scripts.display_pool import shutdown_display_pool
+
+
+def op_ping(request):
+    return {'success': True, 'scheduler_running': scheduler.running, 'scheduler_alive': scheduler_alive(),
+            'jobs': len(scheduler.get_jobs())}
+
+def op_run(request):
+    accepted = dispatch_run(int(request['task_id']), request.get('trigger', 'manual'))
+    return {'success': True, 'accepted': accepted}
+
+def op_sync(request):
+    with app.app_context():
+        sync_task_schedule(int(request['task_id']))
+    return {'success': True}
+
+def op_reconcile(request):
+    with app.app_context():
+        return dict(reconcile_scheduler(), success=True)
+
+def op_follow(request):
+    return follow_run_output(int(request['run_id']), int(request.get('after', 0)))
+
+def op_queue_stats(request):
+    return get_queue_stats()
+
+def op_metrics(request):
+    return {'families': collect_metrics()}
+
+def op_task_states(request):
+    states = {task_id: {'last_run': state['last_run'].isoformat() if state.get('last_run') else None,
+                        'last_status': state.get('last_status')}
+              for task_id, state in TASK_STATE.snapshot().items()}
+    return {'states': states}
+
+OPS = {
+    'ping': op_ping,
+    'run': op_run,
+    'sync': op_sync,
+    'reconcile': op_reconcile,
+    'follow': op_follow,
+    'queue_stats': op_queue_stats,
+    'metrics': op_metrics,
+    'task_states': op_task_states
+}
+
+
+def main():
+    if not RUNS_EXECUTOR:
+        print("❌ scheduler_daemon must run with AUTOMATION_ROLE=scheduler")
+        sys.exit(1)
+
+    server = ExecutorServer(OPS, EXECUTOR_SOCKET)
+
+    def stop(signum, frame):
+        logger.info(f"🛑 Scheduler daemon received signal {signum}, shutting down...")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"🗓️ Scheduler daemon listening on {EXECUTOR_SOCKET}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        scheduler.shutdown(wait=False)
+        # 等待运行中的任务结束，避免半途被杀
+        task_queue.shutdown(wait=True)
+        # 任务排空后写回最后的运行状态
+        TASK_STATE.stop()
+        get_dispatcher().stop()
+        try:
+            if 'scripts.task_executor' in sys.modules:
+                sys.modules['scripts.task_executor'].shutdown_driver_pool()
+        except Exception as e:
+            logger.warning(f"Driver pool shutdown skipped: {e}")
+        if 'scripts.playwright_side' in sys.modules:
+            sys.modules['scripts.playwright_side'].shutdown_browser_host()
+        shutdown_display_pool()
+        logger.info("👋 Scheduler daemon stopped")
+
+
+if __name__ == '__main__':
+    main()
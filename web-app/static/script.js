@@ -1,6 +1,7 @@
 let currentTaskId = null;
 let currentFolder = 'downloads'; // 'downloads' or 'autokey'
 let editorInstance = null; // CodeMirror instance
+let runStream = null; // EventSource for live run output
 
 // 切换调度模式输入的显示/隐藏
 function toggleScheduleInputs() {
@@ -92,6 +93,16 @@ function editTask(taskId) {
                 document.getElementById('randomEnd').value = '';
             }
 
+            document.getElementById('resourceClass').value = task.resource_class || '';
+            document.getElementById('taskPriority').value = task.priority || 0;
+            document.getElementById('maxConcurrency').value = task.max_concurrency || 1;
+            document.getElementById('speedProfile').value = task.speed_profile || '';
+            document.getElementById('taskHeadless').checked = !!task.headless;
+            document.getElementById('taskWatchLive').checked = !!task.watch_live;
+            document.getElementById('taskTimeout').value = task.timeout_seconds || '';
+            document.getElementById('taskWarmStart').checked = !!task.warm_start;
+            document.getElementById('sideEngine').value = task.side_engine || '';
+
             toggleScheduleInputs();
             document.getElementById('taskModal').style.display = 'block';
         })
@@ -111,7 +122,16 @@ function saveTask(event) {
         name: document.getElementById('taskName').value,
         script_path: document.getElementById('scriptPath').value,
         enabled: true,
-        schedule_type: scheduleType
+        schedule_type: scheduleType,
+        resource_class: document.getElementById('resourceClass').value,
+        priority: parseInt(document.getElementById('taskPriority').value, 10) || 0,
+        max_concurrency: parseInt(document.getElementById('maxConcurrency').value, 10) || 1,
+        speed_profile: document.getElementById('speedProfile').value,
+        headless: document.getElementById('taskHeadless').checked,
+        watch_live: document.getElementById('taskWatchLive').checked,
+        timeout_seconds: parseInt(document.getElementById('taskTimeout').value, 10) || null,
+        warm_start: document.getElementById('taskWarmStart').checked,
+        side_engine: document.getElementById('sideEngine').value
     };
 
     if (scheduleType === 'random') {
@@ -134,7 +154,7 @@ function saveTask(event) {
         .then(result => {
             if (result.success) {
                 closeModal('taskModal');
-                location.reload();
+                syncTasks();
             } else {
                 alert('保存失败: ' + (result.error || '未知错误'));
             }
@@ -148,7 +168,7 @@ function runTaskNow(taskId) {
     fetch(`/api/tasks/${taskId}/run`, { method: 'POST' })
         .then(r => r.json())
         .then(res => {
-            if (res.success) alert('任务已加入队列');
+            if (res.success) alert(res.deduplicated ? '任务已在队列中等待' : '任务已加入队列');
             else alert('执行失败: ' + res.error);
         });
 }
@@ -158,7 +178,7 @@ function deleteTask(taskId) {
     fetch(`/api/tasks/${taskId}`, { method: 'DELETE' })
         .then(r => r.json())
         .then(res => {
-            if (res.success) location.reload();
+            if (res.success) syncTasks();
             else alert('删除失败: ' + res.error);
         });
 }
@@ -167,11 +187,150 @@ function toggleTask(taskId) {
     fetch(`/api/tasks/${taskId}/toggle`, { method: 'POST' })
         .then(r => r.json())
         .then(res => {
-            if (res.success) location.reload();
+            if (res.success) syncTasks();
             else alert('操作失败: ' + res.error);
         });
 }
 
+// --- 看板增量同步 (长轮询 /api/tasks?since=<version>&wait=N) ---
+const SYNC_WAIT_SECONDS = 25;
+let syncVersion = 0;
+let syncPolling = false;
+let syncBackoff = 0;
+const runningRuns = {}; // task_id -> 运行中的 run id 集合
+
+function escapeHtml(value) {
+    return String(value == null ? '' : value).replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[c]);
+}
+
+function formatLastRun(iso) {
+    return iso ? `${iso.slice(5, 10)} ${iso.slice(11, 16)}` : '';
+}
+
+function renderTaskStatus(task) {
+    const running = runningRuns[task.id] && runningRuns[task.id].size > 0;
+    const status = running ? '⏳ 执行中' : escapeHtml(task.last_status || '等待中');
+    return `<strong>状态</strong> ${status} <span style="font-size:0.8em;opacity:0.7">${formatLastRun(task.last_run)}</span>`;
+}
+
+function renderTaskCard(task) {
+    const schedule = task.schedule_type === 'random'
+        ? `<span class="tag-random">🎲 随机</span> ${escapeHtml(task.random_start)} - ${escapeHtml(task.random_end)}`
+        : escapeHtml(task.cron_expression);
+    return `
+        <div class="task-card" id="task-${task.id}" data-task-id="${task.id}">
+            <div class="task-header">
+                <h3>${escapeHtml(task.name)}</h3>
+                <span class="status-badge ${task.enabled ? 'status-active' : 'status-inactive'}">
+                    ${task.enabled ? '● 运行中' : '○ 已暂停'}
+                </span>
+            </div>
+            <div class="task-info">
+                <p><strong>脚本</strong> ${escapeHtml(task.script_path)}</p>
+                <p><strong>调度</strong> ${schedule}</p>
+                <p class="task-status">${renderTaskStatus(task)}</p>
+            </div>
+            <div class="task-actions">
+                <button class="btn-success" onclick="runTaskNow(${task.id})">▶ 运行</button>
+                <button class="btn-secondary" onclick="toggleTask(${task.id})">${task.enabled ? '暂停' : '启用'}</button>
+                <button class="btn-secondary" onclick="editTask(${task.id})">✎ 编辑</button>
+                <button class="btn-secondary" onclick="openRunsModal(${task.id})">📜 日志</button>
+                <button class="btn-danger" onclick="deleteTask(${task.id})">🗑 删除</button>
+            </div>
+        </div>`;
+}
+
+// 先删除再更新：同一批次中删除后重建的任务以最新数据为准
+function applyDelta(data) {
+    const grid = document.getElementById('tasksGrid');
+    if (!grid) return;
+    const seen = new Set(data.tasks.map(task => task.id));
+
+    data.deleted.forEach(taskId => {
+        if (seen.has(taskId)) return;
+        const card = document.getElementById(`task-${taskId}`);
+        if (card) card.remove();
+        delete runningRuns[taskId];
+    });
+    if (data.full) {
+        // 全量同步：移除服务端已不存在的卡片
+        grid.querySelectorAll('.task-card').forEach(card => {
+            if (!seen.has(parseInt(card.dataset.taskId, 10))) card.remove();
+        });
+        Object.keys(runningRuns).forEach(taskId => delete runningRuns[taskId]);
+    }
+
+    data.runs.forEach(run => {
+        const runs = runningRuns[run.task_id] || (runningRuns[run.task_id] = new Set());
+        if (run.status === 'Running') runs.add(run.id);
+        else runs.delete(run.id);
+    });
+
+    data.tasks.forEach(task => {
+        const card = document.getElementById(`task-${task.id}`);
+        if (card) card.outerHTML = renderTaskCard(task);
+        else grid.insertAdjacentHTML('beforeend', renderTaskCard(task));
+    });
+
+    // 只有运行记录变化的任务：刷新状态行
+    data.runs.forEach(run => {
+        if (seen.has(run.task_id)) return;
+        const line = document.querySelector(`#task-${run.task_id} .task-status`);
+        if (line && runningRuns[run.task_id].size > 0) {
+            line.innerHTML = `<strong>状态</strong> ⏳ 执行中`;
+        }
+    });
+
+    syncVersion = Math.max(syncVersion, data.version);
+}
+
+function fetchTaskChanges(wait, running = false) {
+    const params = new URLSearchParams({ since: syncVersion });
+    if (wait) params.set('wait', wait);
+    if (running) params.set('running', '1');
+    return fetch(`/api/tasks?${params}`).then(r => {
+        if (!r.ok) throw new Error(`HTTP ${r.status}`);
+        return r.json();
+    });
+}
+
+// 立即拉取一次变更 (保存 / 删除 / 切换之后)，不打断长轮询
+function syncTasks() {
+    return fetchTaskChanges(0).then(applyDelta).catch(e => console.error('Task sync failed:', e));
+}
+
+function pollTasks() {
+    if (syncPolling || document.hidden || !document.getElementById('tasksGrid')) return;
+    syncPolling = true;
+    fetchTaskChanges(SYNC_WAIT_SECONDS)
+        .then(data => {
+            applyDelta(data);
+            syncBackoff = data.busy ? Math.min((syncBackoff || 2000) * 2, 30000) : 0;
+        })
+        .catch(e => {
+            console.error('Task poll failed:', e);
+            syncBackoff = Math.min((syncBackoff || 2000) * 2, 30000);
+        })
+        .finally(() => {
+            syncPolling = false;
+            setTimeout(pollTasks, syncBackoff);
+        });
+}
+
+function startTaskSync() {
+    const grid = document.getElementById('tasksGrid');
+    if (!grid) return;
+    syncVersion = parseInt(grid.dataset.syncVersion, 10) || 0;
+    // 运行中的记录不在页面数据里：首次同步附带当前所有运行中的记录 (running=1)
+    fetchTaskChanges(0, true).then(applyDelta).catch(() => {}).finally(pollTasks);
+    // 页面隐藏时暂停长轮询，恢复可见时立即补拉
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden) pollTasks();
+    });
+}
+
 // --- Cron Helper ---
 function setCron(expression) {
     const input = document.getElementById('cronExpression');
@@ -217,21 +376,11 @@ function switchFolder(folder) {
     loadFiles(folder);
 }
 
-function loadFiles(folder) {
-    const container = document.getElementById('fileListContainer');
-    container.innerHTML = '<div style="padding:20px;text-align:center;">加载中...</div>';
+let fileListState = { folder: 'downloads', cursor: null, shown: 0 };
+let fileSearchTimer = null;
 
-    fetch(`/api/files?folder=${folder}`)
-        .then(r => r.json())
-        .then(data => {
-            if (!data.files || data.files.length === 0) {
-                container.innerHTML = '<div style="padding:20px;text-align:center;color:#666;">暂无文件</div>';
-                return;
-            }
-
-            let html = '';
-            data.files.forEach(file => {
-                html += `
+function renderFileItem(file, folder) {
+    return `
                 <div class="file-item">
                     <div class="file-info">
                         <span class="file-name">${file.name}</span>
@@ -242,8 +391,50 @@ function loadFiles(folder) {
                         <button class="btn-danger" style="padding:4px 10px;font-size:0.8em;" onclick="deleteScript('${file.name}', '${folder}')">🗑 删除</button>
                     </div>
                 </div>`;
-            });
-            container.innerHTML = html;
+}
+
+function searchFiles() {
+    clearTimeout(fileSearchTimer);
+    fileSearchTimer = setTimeout(() => loadFiles(currentFolder), 300);
+}
+
+// 分页加载；服务端带 ETag，目录未变化时浏览器直接复用缓存 (304)
+function loadFiles(folder, append = false) {
+    const container = document.getElementById('fileListContainer');
+    if (!append) {
+        fileListState = { folder: folder, cursor: null, shown: 0 };
+        container.innerHTML = '<div style="padding:20px;text-align:center;">加载中...</div>';
+    }
+
+    const params = new URLSearchParams({ folder: folder, limit: 100 });
+    const keyword = document.getElementById('fileSearch').value.trim();
+    if (keyword) params.set('q', keyword);
+    if (append && fileListState.cursor) params.set('cursor', fileListState.cursor);
+
+    fetch(`/api/files?${params}`)
+        .then(r => r.json())
+        .then(data => {
+            if (fileListState.folder !== folder) return;  // 已切换目录
+            const moreBtn = document.getElementById('loadMoreFiles');
+            if (moreBtn) moreBtn.remove();
+
+            if (!append && (!data.files || data.files.length === 0)) {
+                container.innerHTML = '<div style="padding:20px;text-align:center;color:#666;">暂无文件</div>';
+                return;
+            }
+
+            const html = data.files.map(file => renderFileItem(file, folder)).join('');
+            if (append) container.insertAdjacentHTML('beforeend', html);
+            else container.innerHTML = html;
+
+            fileListState.cursor = data.next_cursor;
+            fileListState.shown += data.files.length;
+            if (data.next_cursor) {
+                container.insertAdjacentHTML('beforeend',
+                    `<div id="loadMoreFiles" style="padding:12px;text-align:center;">
+                        <button class="btn-secondary" onclick="loadFiles('${folder}', true)">加载更多 (${fileListState.shown} / ${data.total})</button>
+                    </div>`);
+            }
         })
         .catch(e => {
             container.innerHTML = `<div style="padding:20px;color:red;">加载失败: ${e}</div>`;
@@ -349,14 +540,79 @@ function saveScriptContent() {
         .catch(e => alert('请求错误: ' + e));
 }
 
+// --- 运行日志 ---
+function openRunsModal(taskId) {
+    const container = document.getElementById('runListContainer');
+    container.innerHTML = '<div style="padding:20px;text-align:center;">加载中...</div>';
+    document.getElementById('runOutput').textContent = '';
+    document.getElementById('runsModal').style.display = 'block';
+
+    fetch(`/api/tasks/${taskId}/runs?limit=20`)
+        .then(r => r.json())
+        .then(data => {
+            if (!data.runs || data.runs.length === 0) {
+                container.innerHTML = '<div style="padding:20px;text-align:center;color:#666;">暂无运行记录</div>';
+                return;
+            }
+            container.innerHTML = data.runs.map(run => `
+                <div class="file-item run-item" id="run-${run.id}" onclick="showRunOutput(${taskId}, ${run.id})">
+                    <div class="file-info">
+                        <span class="file-name">#${run.id} · ${run.status || ''}</span>
+                        <span class="file-meta">${run.started_at.replace('T', ' ').slice(0, 19)} · ${run.executor || '-'} · ${run.trigger || '-'}${run.duration != null ? ' · ' + run.duration.toFixed(1) + 's' : ''}</span>
+                    </div>
+                </div>`).join('');
+            showRunOutput(taskId, data.runs[0].id);
+        })
+        .catch(e => {
+            container.innerHTML = `<div style="padding:20px;color:red;">加载失败: ${e}</div>`;
+        });
+}
+
+function stopRunStream() {
+    if (runStream) {
+        runStream.close();
+        runStream = null;
+    }
+}
+
+function showRunOutput(taskId, runId) {
+    stopRunStream();
+    document.querySelectorAll('.run-item').forEach(el => el.classList.remove('active'));
+    const item = document.getElementById(`run-${runId}`);
+    if (item) item.classList.add('active');
+
+    const output = document.getElementById('runOutput');
+    output.textContent = '';
+    // 同一个接口：运行中实时推送，已结束则回放保存的输出
+    runStream = new EventSource(`/api/tasks/${taskId}/runs/${runId}/stream`);
+    runStream.onmessage = event => {
+        const stick = output.scrollTop + output.clientHeight >= output.scrollHeight - 20;
+        output.textContent += event.data + '\n';
+        if (stick) output.scrollTop = output.scrollHeight;
+    };
+    runStream.addEventListener('end', event => {
+        if (event.data) output.textContent += `\n[${event.data}]`;
+        stopRunStream();
+    });
+    runStream.addEventListener('busy', event => {
+        if (!output.textContent) output.textContent = `[${event.data}]\n`;
+    });
+    // 服务端正常断开时 EventSource 会按 retry 自动重连并带上 Last-Event-ID，只在彻底失败时关闭
+    runStream.onerror = () => {
+        if (runStream && runStream.readyState === EventSource.CLOSED) stopRunStream();
+    };
+}
+
 function closeModal(modalId) {
     document.getElementById(modalId).style.display = 'none';
     if (modalId === 'taskModal') currentTaskId = null;
+    if (modalId === 'runsModal') stopRunStream();
 }
 
 window.onclick = function (event) {
     if (event.target.classList.contains('modal')) {
         event.target.style.display = 'none';
+        if (event.target.id === 'runsModal') stopRunStream();
     }
 }
 
@@ -368,4 +624,5 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
     toggleScheduleInputs();
+    startTaskSync();
 });